@@ -0,0 +1,71 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import inspect, pool, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.core.config import settings
+from src.db.session import Base
+import src.models.domain  # noqa: F401 - registers the models on Base.metadata
+
+config = context.config
+# Skipped when the API runs migrations on startup, so alembic doesn't reconfigure uvicorn's logging
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Databases created by the old `create_all` on startup have the tables but no alembic_version;
+# they are stamped at this revision (the schema create_all produced) before upgrading.
+BASELINE_REVISION = "0001_baseline"
+
+# Serializes concurrent boots (several API replicas starting at once) on one Postgres advisory lock
+MIGRATION_LOCK_ID = 7_215_043_001
+
+
+def run_migrations_offline():
+    """Emits SQL to stdout instead of running it (`alembic upgrade head --sql`)."""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _is_unversioned_legacy_schema(connection) -> bool:
+    tables = set(inspect(connection).get_table_names())
+    return "agents" in tables and "alembic_version" not in tables
+
+
+def do_run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata, compare_type=True)
+    if _is_unversioned_legacy_schema(connection):
+        print(f"Existing schema without migration history found, stamping {BASELINE_REVISION}")
+        context.get_context().stamp(context.script, BASELINE_REVISION)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online():
+    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    async with engine.connect() as connection:
+        # Session-level lock: held across the migration transactions below, released explicitly
+        await connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        await connection.commit()
+        try:
+            await connection.run_sync(do_run_migrations)
+            await connection.commit()
+        finally:
+            await connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            await connection.commit()
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,88 @@
+"""Baseline: the schema the original `create_all` produced
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "agents",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("persona", sa.String(), nullable=False),
+        sa.Column("personality", sa.Text(), nullable=False),
+        sa.Column("system_prompt", sa.Text(), nullable=False),
+        sa.Column("memory", sa.Text(), nullable=True),
+        sa.Column("opening_moves", sa.JSON(), nullable=True),
+        sa.Column("matching_preferences", sa.JSON(), nullable=True),
+        sa.Column("conversation_style", sa.JSON(), nullable=True),
+        sa.Column("creator_id", sa.String(), nullable=True),
+        sa.Column("provider_api_key", sa.String(), nullable=True),
+        sa.Column("provider", sa.String(), nullable=True),
+        sa.Column("model", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_agents_name", "agents", ["name"])
+    op.create_index("ix_agents_creator_id", "agents", ["creator_id"])
+
+    op.create_table(
+        "matches",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("agent1_id", sa.String(), sa.ForeignKey("agents.id"), nullable=True),
+        sa.Column("agent2_id", sa.String(), sa.ForeignKey("agents.id"), nullable=True),
+        sa.Column("compatibility_score", sa.Float(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("conversation_stage", sa.String(), nullable=True),
+        sa.Column("interest_level", sa.Float(), nullable=True),
+        sa.Column("messages_count", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.create_table(
+        "likes",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("sender_id", sa.String(), sa.ForeignKey("agents.id"), nullable=True),
+        sa.Column("receiver_id", sa.String(), sa.ForeignKey("agents.id"), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("reason", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.create_table(
+        "agent_memories",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("agent_id", sa.String(), sa.ForeignKey("agents.id"), nullable=True),
+        sa.Column("memory_type", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("confidence", sa.Float(), nullable=True),
+        sa.Column("created_from_match", sa.String(), sa.ForeignKey("matches.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("match_id", sa.String(), sa.ForeignKey("matches.id"), nullable=True),
+        sa.Column("sender_agent_id", sa.String(), sa.ForeignKey("agents.id"), nullable=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("messages")
+    op.drop_table("agent_memories")
+    op.drop_table("likes")
+    op.drop_table("matches")
+    op.drop_index("ix_agents_creator_id", table_name="agents")
+    op.drop_index("ix_agents_name", table_name="agents")
+    op.drop_table("agents")
@@ -0,0 +1,26 @@
+"""Rolling match summary columns and the per-match message index
+
+Revision ID: 0002_match_summary
+Revises: 0001_baseline
+Create Date: 2026-10-18
+
+IF NOT EXISTS because databases stamped at the baseline may already have these from `create_all`.
+"""
+from alembic import op
+
+revision = "0002_match_summary"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS summary TEXT")
+    op.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS summary_message_count INTEGER DEFAULT 0")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_messages_match_created ON messages (match_id, created_at)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_messages_match_created")
+    op.execute("ALTER TABLE matches DROP COLUMN IF EXISTS summary_message_count")
+    op.execute("ALTER TABLE matches DROP COLUMN IF EXISTS summary")
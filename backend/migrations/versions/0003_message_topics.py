@@ -0,0 +1,24 @@
+"""Topic tags on messages
+
+Revision ID: 0003_message_topics
+Revises: 0002_match_summary
+Create Date: 2026-10-18
+
+IF NOT EXISTS because databases stamped at the baseline may already have it from `create_all`.
+Existing rows stay NULL and are tagged on the fly by the metrics rebuild; run
+`scripts/rebuild_metrics.py --retag` to store their tags.
+"""
+from alembic import op
+
+revision = "0003_message_topics"
+down_revision = "0002_match_summary"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE messages ADD COLUMN IF NOT EXISTS topics JSON")
+
+
+def downgrade():
+    op.execute("ALTER TABLE messages DROP COLUMN IF EXISTS topics")
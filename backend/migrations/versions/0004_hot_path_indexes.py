@@ -0,0 +1,54 @@
+"""Composite/partial indexes for the hot queries
+
+Revision ID: 0004_hot_path_indexes
+Revises: 0003_message_topics
+Create Date: 2026-10-18
+
+Written with IF NOT EXISTS because databases stamped at the baseline may already have some of
+these from `create_all` runs after the indexes were added to the models.
+"""
+from alembic import op
+
+revision = "0004_hot_path_indexes"
+down_revision = "0003_message_topics"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # Pair lookups from either side (discovery exclusion, duplicate match/like checks)
+    "CREATE INDEX IF NOT EXISTS ix_matches_agent1_agent2 ON matches (agent1_id, agent2_id)",
+    "CREATE INDEX IF NOT EXISTS ix_matches_agent2_agent1 ON matches (agent2_id, agent1_id)",
+    "CREATE INDEX IF NOT EXISTS ix_likes_sender_receiver ON likes (sender_id, receiver_id)",
+    "CREATE INDEX IF NOT EXISTS ix_likes_receiver_sender ON likes (receiver_id, sender_id)",
+    # An agent's matches by status, from either side
+    "CREATE INDEX IF NOT EXISTS ix_matches_agent1_status ON matches (agent1_id, status)",
+    "CREATE INDEX IF NOT EXISTS ix_matches_agent2_status ON matches (agent2_id, status)",
+    # Active-match sweep
+    "CREATE INDEX IF NOT EXISTS ix_matches_active ON matches (id) WHERE status = 'active'",
+    # Pending inbox per receiver, oldest first
+    "CREATE INDEX IF NOT EXISTS ix_likes_receiver_pending ON likes (receiver_id, created_at, id) WHERE status = 'pending'",
+    # An agent's memories in creation order
+    "CREATE INDEX IF NOT EXISTS ix_agent_memories_agent_created ON agent_memories (agent_id, created_at, id)",
+    # Chat context tail, history pages and per-match counts
+    "CREATE INDEX IF NOT EXISTS ix_messages_match_created ON messages (match_id, created_at, id)",
+    # Messages sent per agent
+    "CREATE INDEX IF NOT EXISTS ix_messages_sender ON messages (sender_agent_id)",
+]
+
+
+def _index_name(statement: str) -> str:
+    return statement.split("IF NOT EXISTS ")[1].split(" ")[0]
+
+
+def upgrade():
+    # 0002 (or create_all) built this one as (match_id, created_at); rebuild it with the id tiebreaker
+    op.execute("DROP INDEX IF EXISTS ix_messages_match_created")
+    for statement in INDEXES:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in reversed(INDEXES):
+        op.execute(f"DROP INDEX IF EXISTS {_index_name(statement)}")
+    # Back to the index 0002 created
+    op.execute("CREATE INDEX IF NOT EXISTS ix_messages_match_created ON messages (match_id, created_at)")
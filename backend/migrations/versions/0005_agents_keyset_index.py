@@ -0,0 +1,20 @@
+"""Index for keyset pages of GET /agents/
+
+Revision ID: 0005_agents_keyset_index
+Revises: 0004_hot_path_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0005_agents_keyset_index"
+down_revision = "0004_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS ix_agents_created ON agents (created_at, id)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_agents_created")
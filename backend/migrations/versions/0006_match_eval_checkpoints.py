@@ -0,0 +1,23 @@
+"""Per-agent evaluation checkpoints on matches
+
+Revision ID: 0006_match_eval_checkpoints
+Revises: 0005_agents_keyset_index
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_match_eval_checkpoints"
+down_revision = "0005_agents_keyset_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("matches", sa.Column("agent1_last_evaluated_count", sa.Integer(), nullable=True, server_default="0"))
+    op.add_column("matches", sa.Column("agent2_last_evaluated_count", sa.Integer(), nullable=True, server_default="0"))
+
+
+def downgrade():
+    op.drop_column("matches", "agent2_last_evaluated_count")
+    op.drop_column("matches", "agent1_last_evaluated_count")
@@ -0,0 +1,38 @@
+"""created_at NOT NULL on the keyset-paginated tables
+
+Revision ID: 0007_created_at_not_null
+Revises: 0006_match_eval_checkpoints
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_created_at_not_null"
+down_revision = "0006_match_eval_checkpoints"
+branch_labels = None
+depends_on = None
+
+# Keyset pagination orders by (created_at, id); a NULL created_at can neither be compared nor put in a cursor
+TABLES = ("agents", "matches", "likes", "agent_memories", "messages")
+
+
+def upgrade():
+    for table in TABLES:
+        # Rows that never got a timestamp are treated as the oldest, so they come first when paging
+        op.execute(f"UPDATE {table} SET created_at = to_timestamp(0) WHERE created_at IS NULL")
+        op.alter_column(
+            table, "created_at",
+            existing_type=sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+        )
+
+
+def downgrade():
+    for table in TABLES:
+        op.alter_column(
+            table, "created_at",
+            existing_type=sa.DateTime(timezone=True),
+            nullable=True,
+            server_default=None,
+        )
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add the backend directory to sys.path so we can import src modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, or_, pool, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.core.config import settings
+from src.api.pagination import encode_cursor, keyset_page
+from src.models.domain import Agent, AgentMemory, Like, Match, Message
+from src.worker.scheduler import _active_match_state_stmt
+from src.worker.tasks.discovery import _unseen_candidates_stmt
+
+PROBE_AGENT = "plan-check-agent"
+PROBE_MATCH = "plan-check-match"
+PROBE_CURSOR = encode_cursor(datetime(2024, 1, 1, tzinfo=timezone.utc), "plan-check-row")
+
+
+def hot_queries():
+    """The per-request / per-task queries that must stay on an index as the tables grow."""
+    return {
+        "chat context tail": select(Message)
+            .where(Message.match_id == PROBE_MATCH)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(22),
+        "messages per match": select(func.count()).select_from(Message).where(Message.match_id == PROBE_MATCH),
+        "match history": select(Message).where(Message.match_id == PROBE_MATCH).order_by(Message.created_at),
+        "messages sent per agent": select(func.count(Message.id)).where(Message.sender_agent_id == PROBE_AGENT),
+        "pending likes inbox": select(Like)
+            .where(Like.receiver_id == PROBE_AGENT, Like.status == "pending")
+            .order_by(Like.created_at),
+        "likes sent": select(func.count(Like.id)).where(Like.sender_id == PROBE_AGENT),
+        "likes received": select(func.count(Like.id)).where(Like.receiver_id == PROBE_AGENT),
+        "pending like receivers (sweep)": select(Like.receiver_id).where(Like.status == "pending").distinct(),
+        "active matches for agent": select(Match).where(
+            or_(Match.agent1_id == PROBE_AGENT, Match.agent2_id == PROBE_AGENT),
+            Match.status == "active",
+        ),
+        "active match state (sweep)": _active_match_state_stmt(),
+        "memories per agent": select(AgentMemory)
+            .where(AgentMemory.agent_id == PROBE_AGENT)
+            .order_by(AgentMemory.created_at),
+        "discovery candidates": _unseen_candidates_stmt(PROBE_AGENT, "", 20),
+        "agents page": keyset_page(select(Agent), Agent, 100, PROBE_CURSOR),
+        "messages page": keyset_page(select(Message).where(Message.match_id == PROBE_MATCH), Message, 100, PROBE_CURSOR),
+        "messages page (newest first)": keyset_page(
+            select(Message).where(Message.match_id == PROBE_MATCH), Message, 100, PROBE_CURSOR, newest_first=True
+        ),
+        "agents by id": keyset_page(select(Agent).where(Agent.id.in_([PROBE_AGENT])), Agent, 100),
+        "memories page": keyset_page(
+            select(AgentMemory).where(AgentMemory.agent_id == PROBE_AGENT), AgentMemory, 100, PROBE_CURSOR
+        ),
+        "pending likes page": keyset_page(
+            select(Like).where(Like.receiver_id == PROBE_AGENT, Like.status == "pending"), Like, 100, PROBE_CURSOR
+        ),
+    }
+
+
+def _seq_scans(plan: dict):
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan.get("Relation Name", "?")
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+async def main() -> int:
+    """
+    EXPLAINs each hot query with sequential scans disabled. Postgres still picks a Seq Scan when no
+    index can serve a table access, so any Seq Scan left in a plan means a missing index.
+    Exits non-zero if one is found (run after `alembic upgrade head`).
+    """
+    print(f"Connecting to database at: {settings.DATABASE_URL}")
+    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    failures = 0
+
+    try:
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("ANALYZE")
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+
+            for name, stmt in hot_queries().items():
+                sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                res = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+                plan = res.scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+
+                scans = list(_seq_scans(plan[0]["Plan"]))
+                if scans:
+                    failures += 1
+                    print(f"FAIL  {name}: Seq Scan on {', '.join(scans)}")
+                else:
+                    print(f"ok    {name}")
+    finally:
+        await engine.dispose()
+
+    print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} without an index path")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,27 @@
+import asyncio
+import os
+import sys
+
+# Add the backend directory to sys.path so we can import src modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import pool
+
+from src.core.config import settings
+from src.services.activity_feed import rebuild_activity_stream
+
+async def main():
+    """Seeds the activity feed stream from the database (first deploy, or after Redis data loss)."""
+    print(f"Connecting to database at: {settings.DATABASE_URL}")
+    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    LocalSession = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    try:
+        async with LocalSession() as session:
+            await rebuild_activity_stream(session)
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
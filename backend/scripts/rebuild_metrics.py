@@ -0,0 +1,37 @@
+import asyncio
+import os
+import sys
+
+# Add the backend directory to sys.path so we can import src modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import pool
+
+from src.core.config import settings
+from src.services.metrics_rollup import rebuild_agent_stats, rebuild_platform_rollup, replace_topic_counters
+from src.services.topics import retag_messages
+
+async def main(retag: bool):
+    """
+    Rebuilds the /metrics/platform rollups and the per-agent stats counters from scratch
+    (first deploy, or after Redis data loss).
+    With --retag, first re-tags every message with the current TOPIC_LEXICON.
+    """
+    print(f"Connecting to database at: {settings.DATABASE_URL}")
+    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    LocalSession = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    try:
+        async with LocalSession() as session:
+            if retag:
+                counts = await retag_messages(session)
+                replace_topic_counters(counts)
+                print(f"Re-tagged messages: {counts}")
+            await rebuild_platform_rollup(session)
+            await rebuild_agent_stats(session)
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main(retag="--retag" in sys.argv))
@@ -162,9 +162,8 @@ async def main():
         except:
             pass
 
-        for agent_data in AGENTS:
-            await create_agent(client, agent_data)
-            await asyncio.sleep(0.5)
+        # Created concurrently so their profile embeddings go out in one batch
+        await asyncio.gather(*(create_agent(client, agent_data) for agent_data in AGENTS))
             
         print("\nDB Seed Complete!")
 
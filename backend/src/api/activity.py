@@ -1,68 +1,25 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import desc
+from typing import Optional
 
 from src.db.session import get_db
-from src.models.domain import Match, Message, Like, Agent
+from src.services.activity_feed import ensure_activity_stream, read_activity_page
 
 router = APIRouter()
 
 @router.get("/")
-async def get_activity_feed(limit: int = 50, db: AsyncSession = Depends(get_db)):
-    # Fetch agents to create a lookup map
-    agents_stmt = select(Agent.id, Agent.name)
-    agents_res = await db.execute(agents_stmt)
-    agent_map = {row.id: row.name for row in agents_res}
-    
-    activities = []
+async def get_activity_feed(response: Response, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Newest-first activity feed read straight from the activity stream.
+    Pass the X-Next-Cursor header of one page as `cursor` to get the next one (absent on the last page).
+    The first read on a deployment without a seeded stream backfills it from the database.
+    """
+    await ensure_activity_stream(db)
+    try:
+        activities, next_cursor = await read_activity_page(limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    # Fetch recent messages
-    msgs_stmt = select(Message).order_by(desc(Message.created_at)).limit(limit)
-    msgs_res = await db.execute(msgs_stmt)
-    for msg in msgs_res.scalars():
-        activities.append({
-            "type": "message",
-            "id": msg.id,
-            "agent_name": agent_map.get(msg.sender_agent_id, "Unknown"),
-            "agent_id": msg.sender_agent_id,
-            "match_id": msg.match_id,
-            "content": msg.content,
-            "timestamp": msg.created_at.isoformat() if msg.created_at else None
-        })
-
-    # Fetch recent matches
-    matches_stmt = select(Match).order_by(desc(Match.created_at)).limit(limit)
-    matches_res = await db.execute(matches_stmt)
-    for match in matches_res.scalars():
-        activities.append({
-            "type": "match",
-            "id": match.id,
-            "agent1_name": agent_map.get(match.agent1_id, "Unknown"),
-            "agent2_name": agent_map.get(match.agent2_id, "Unknown"),
-            "agent1_id": match.agent1_id,
-            "agent2_id": match.agent2_id,
-            "compatibility_score": match.compatibility_score,
-            "status": match.status,
-            "timestamp": match.created_at.isoformat() if match.created_at else None
-        })
-        
-    # Fetch recent likes
-    likes_stmt = select(Like).order_by(desc(Like.created_at)).limit(limit)
-    likes_res = await db.execute(likes_stmt)
-    for like in likes_res.scalars():
-        activities.append({
-            "type": "like",
-            "id": like.id,
-            "sender_name": agent_map.get(like.sender_id, "Unknown"),
-            "receiver_name": agent_map.get(like.receiver_id, "Unknown"),
-            "sender_id": like.sender_id,
-            "receiver_id": like.receiver_id,
-            "status": like.status,
-            "timestamp": like.created_at.isoformat() if like.created_at else None
-        })
-
-    # Sort activities by timestamp descending
-    activities.sort(key=lambda x: x["timestamp"] if x["timestamp"] else "", reverse=True)
-    
-    return activities[:limit]
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return activities
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
 
+from src.api.pagination import keyset_page, paginated_response
+from src.core.config import settings
 from src.db.session import get_db
 from src.models.domain import Agent
+from src.services.agent_cache import invalidate_agent_profile
 from src.services.vector_db import upsert_agent_embedding, query_compatible_agents_by_id
 from typing import Optional, Dict, List, Any
 
@@ -29,22 +32,32 @@ async def create_agent(agent_data: AgentCreate, db: AsyncSession = Depends(get_d
     db.add(new_agent)
     await db.commit()
     await db.refresh(new_agent)
+    await invalidate_agent_profile(new_agent.id)
     
-    # Send raw text to Pinecone native inference model
+    # Send raw text to Pinecone native inference model. Not awaited: the write joins the next
+    # embedding batch (shared with concurrent requests) and failures are logged by the writer.
     combined_text = f"Persona: {agent_data.persona}. Personality: {agent_data.personality}. Instructions: {agent_data.system_prompt}"
-    
-    try:
-        upsert_agent_embedding(new_agent.id, combined_text)
-    except Exception as e:
-        print(f"Failed to upsert embedding: {e}")
+    upsert_agent_embedding(new_agent.id, combined_text)
 
     return {"id": new_agent.id, "name": new_agent.name}
 
 @router.get("/")
-async def list_agents(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Agent))
-    agents = result.scalars().all()
-    return agents
+async def list_agents(
+    request: Request,
+    limit: int = Query(settings.API_PAGE_SIZE, ge=1, le=settings.API_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ids: Optional[List[str]] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Agents in creation order, one page at a time (follow X-Next-Cursor / Link for the next page).
+    Repeat `ids` to fetch just those agents, e.g. the names behind a list of matches.
+    """
+    stmt = select(Agent)
+    if ids:
+        stmt = stmt.where(Agent.id.in_(ids))
+    result = await db.execute(keyset_page(stmt, Agent, limit, cursor))
+    return paginated_response(request, result.scalars().all(), limit)
 
 @router.get("/{agent_id}/discover")
 async def discover_compatible_agents(agent_id: str, limit: int = 5):
@@ -55,50 +68,42 @@ async def discover_compatible_agents(agent_id: str, limit: int = 5):
 @router.get("/{agent_id}/stats")
 async def get_agent_stats(agent_id: str, db: AsyncSession = Depends(get_db)):
     """Returns comprehensive dating statistics for this agent."""
-    from src.models.domain import Match, Like, Message, Agent
-    from sqlalchemy import func, or_, desc
-    
-    # Matches
-    stmt_matches = select(Match).where(
-        or_(Match.agent1_id == agent_id, Match.agent2_id == agent_id)
-    ).order_by(desc(Match.created_at))
-    
-    res_matches = await db.execute(stmt_matches)
-    matches = res_matches.scalars().all()
-    active_matches = [m for m in matches if getattr(m, 'status', None) == 'active']
-    
-    # Likes Sent
-    stmt_likes_sent = select(func.count(Like.id)).where(Like.sender_id == agent_id)
-    likes_sent = (await db.execute(stmt_likes_sent)).scalar() or 0
-    
-    # Likes Received
-    stmt_likes_recv = select(func.count(Like.id)).where(Like.receiver_id == agent_id)
-    likes_recv = (await db.execute(stmt_likes_recv)).scalar() or 0
-    
-    # Messages Sent
-    stmt_msgs_sent = select(func.count(Message.id)).where(Message.sender_agent_id == agent_id)
-    msgs_sent = (await db.execute(stmt_msgs_sent)).scalar() or 0
-
-    # Enrich latest 5 matches with basic info
-    enriched_latest = []
-    for m in matches[:5]:
-        other_agent_id = m.agent1_id if m.agent2_id == agent_id else m.agent2_id
-        res_other = await db.execute(select(Agent.name, Agent.persona).where(Agent.id == other_agent_id))
-        other_agent = res_other.fetchone()
-        
-        enriched_latest.append({
-            "id": m.id,
-            "status": m.status,
-            "other_agent_name": other_agent[0] if other_agent else "Unknown",
-            "other_agent_persona": other_agent[1] if other_agent else ""
-        })
+    from src.models.domain import Match
+    from src.services.metrics_rollup import ensure_agent_stats, read_agent_stats
+    from sqlalchemy import case, or_, desc
+    import asyncio
+
+    # Counters are maintained at write time (services.metrics_rollup), so this is one HGETALL
+    # (after a one-off rebuild on the first read of a fresh deployment)
+    await ensure_agent_stats(db)
+    stats = await asyncio.to_thread(read_agent_stats, agent_id)
+
+    # Latest 5 matches with the other agent's name and persona, in one join
+    other_agent_id = case((Match.agent2_id == agent_id, Match.agent1_id), else_=Match.agent2_id)
+    res_latest = await db.execute(
+        select(Match.id, Match.status, Agent.name, Agent.persona)
+        .select_from(Match)
+        .outerjoin(Agent, Agent.id == other_agent_id)
+        .where(or_(Match.agent1_id == agent_id, Match.agent2_id == agent_id))
+        .order_by(desc(Match.created_at))
+        .limit(5)
+    )
+    enriched_latest = [
+        {
+            "id": row.id,
+            "status": row.status,
+            "other_agent_name": row.name or "Unknown",
+            "other_agent_persona": row.persona or ""
+        }
+        for row in res_latest
+    ]
     
     return {
-        "active_matches_count": len(active_matches),
-        "total_matches_count": len(matches),
-        "likes_sent": likes_sent,
-        "likes_received": likes_recv,
-        "messages_sent": msgs_sent,
+        "active_matches_count": stats["active_matches"],
+        "total_matches_count": stats["matches"],
+        "likes_sent": stats["likes_sent"],
+        "likes_received": stats["likes_received"],
+        "messages_sent": stats["messages_sent"],
         "recent_matches": enriched_latest
     }
 
@@ -122,20 +127,25 @@ async def add_memory(agent_id: str, memory_data: MemoryCreate, db: AsyncSession
     await db.commit()
     await db.refresh(new_memory)
     
-    try:
-        from src.services.vector_db import upsert_memory_embedding
-        memory_text = f"[{memory_data.memory_type.upper()}] {memory_data.content}"
-        await upsert_memory_embedding(new_memory.id, agent_id, memory_text)
-    except Exception as e:
-        print(f"Failed to upsert memory embedding: {e}")
-        
+    # Joins the next memory embedding batch in the background, like the profile in create_agent
+    from src.services.vector_db import upsert_memory_embedding
+    memory_text = f"[{memory_data.memory_type.upper()}] {memory_data.content}"
+    upsert_memory_embedding(new_memory.id, agent_id, memory_text)
+
     return {"id": new_memory.id, "status": "added"}
 
 @router.get("/{agent_id}/memories")
-async def get_memories(agent_id: str, db: AsyncSession = Depends(get_db)):
+async def get_memories(
+    agent_id: str,
+    request: Request,
+    limit: int = Query(settings.API_PAGE_SIZE, ge=1, le=settings.API_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
     from src.models.domain import AgentMemory
-    result = await db.execute(select(AgentMemory).where(AgentMemory.agent_id == agent_id).order_by(AgentMemory.created_at))
-    return result.scalars().all()
+    stmt = keyset_page(select(AgentMemory).where(AgentMemory.agent_id == agent_id), AgentMemory, limit, cursor)
+    result = await db.execute(stmt)
+    return paginated_response(request, result.scalars().all(), limit)
 
 @router.get("/{agent_id}/memories/search")
 async def search_memories(agent_id: str, query: str, limit: int = 3, db: AsyncSession = Depends(get_db)):
@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
 from typing import Optional
 
+from src.api.pagination import keyset_page, paginated_response
+from src.core.config import settings
 from src.db.session import get_db
-from src.models.domain import Match, Message, Like
-from src.worker.tasks.chat import generate_next_message_task
+from src.models.domain import Agent, Match, Message, Like
+from src.services import metrics_rollup
+from src.services.activity_feed import like_activity, match_activity, message_activity, record_activity
+from src.services.topics import tag_topics
+from src.worker.tasks.chat import schedule_turn
 
 router = APIRouter()
 
+async def _agent_names(db: AsyncSession, *agent_ids: str) -> dict:
+    """Names for the activity feed entries, which carry them denormalized."""
+    res = await db.execute(select(Agent.id, Agent.name).where(Agent.id.in_(agent_ids)))
+    names = {row.id: row.name for row in res}
+    return {agent_id: names.get(agent_id, "Unknown") for agent_id in agent_ids}
+
 class LikeCreate(BaseModel):
     sender_id: str
     receiver_id: str
@@ -34,12 +45,22 @@ async def send_like(like_data: LikeCreate, db: AsyncSession = Depends(get_db)):
     new_like = Like(sender_id=like_data.sender_id, receiver_id=like_data.receiver_id, reason=like_data.reason)
     db.add(new_like)
     await db.commit()
+    metrics_rollup.record_like(new_like.sender_id, new_like.receiver_id)
+    names = await _agent_names(db, new_like.sender_id, new_like.receiver_id)
+    record_activity(like_activity(new_like, names[new_like.sender_id], names[new_like.receiver_id]))
     return {"id": new_like.id, "status": "pending"}
 
 @router.get("/likes/pending/{agent_id}")
-async def get_pending_likes(agent_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Like).where((Like.receiver_id == agent_id) & (Like.status == "pending")).order_by(Like.created_at))
-    return result.scalars().all()
+async def get_pending_likes(
+    agent_id: str,
+    request: Request,
+    limit: int = Query(settings.API_PAGE_SIZE, ge=1, le=settings.API_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    stmt = keyset_page(select(Like).where((Like.receiver_id == agent_id) & (Like.status == "pending")), Like, limit, cursor)
+    result = await db.execute(stmt)
+    return paginated_response(request, result.scalars().all(), limit)
 
 @router.put("/likes/{like_id}/accept")
 async def accept_like(like_id: str, db: AsyncSession = Depends(get_db)):
@@ -54,18 +75,25 @@ async def accept_like(like_id: str, db: AsyncSession = Depends(get_db)):
     db.add(new_match)
     await db.commit()
     await db.refresh(new_match)
+    metrics_rollup.record_match_created(new_match.interest_level, agent_ids=(new_match.agent1_id, new_match.agent2_id))
+    names = await _agent_names(db, new_match.agent1_id, new_match.agent2_id)
+    activity = [match_activity(new_match, names[new_match.agent1_id], names[new_match.agent2_id])]
 
     if like.reason:
         first_msg = Message(
             match_id=new_match.id,
             sender_agent_id=like.sender_id,
-            content=like.reason
+            content=like.reason,
+            topics=tag_topics(like.reason)
         )
         db.add(first_msg)
         await db.commit()
+        metrics_rollup.record_message(like.reason, 1, topics=first_msg.topics, sender_id=like.sender_id)
+        activity.append(message_activity(first_msg, names[like.sender_id]))
+    record_activity(*activity)
 
     # Trigger agent2 to reply
-    generate_next_message_task.apply_async(args=[new_match.id, new_match.agent2_id], countdown=2)
+    schedule_turn(new_match.id, new_match.agent2_id, countdown=2)
     return {"status": "active", "match_id": new_match.id}
 
 @router.put("/likes/{like_id}/reject")
@@ -93,9 +121,22 @@ async def get_active_matches(agent_id: str, db: AsyncSession = Depends(get_db)):
     return result.scalars().all()
 
 @router.get("/{match_id}/messages")
-async def get_match_messages(match_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Message).where(Message.match_id == match_id).order_by(Message.created_at))
-    return result.scalars().all()
+async def get_match_messages(
+    match_id: str,
+    request: Request,
+    limit: int = Query(settings.API_PAGE_SIZE, ge=1, le=settings.API_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    newest_first: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Chat history oldest first, one page at a time. Messages are never edited, so full pages also answer
+    If-Modified-Since. `newest_first` pages backwards from the latest message (what the chat view opens on).
+    """
+    stmt = keyset_page(select(Message).where(Message.match_id == match_id), Message, limit, cursor, newest_first=newest_first)
+    result = await db.execute(stmt)
+    # Newest-first pages gain rows at the front, so only the oldest-first ones are append-only
+    return paginated_response(request, result.scalars().all(), limit, append_only=not newest_first)
 
 @router.get("/{match_id}")
 async def get_match(match_id: str, db: AsyncSession = Depends(get_db)):
@@ -110,6 +151,8 @@ async def unmatch(match_id: str, repenting_agent_id: str, db: AsyncSession = Dep
     match = result.scalar_one_or_none()
     if not match: return {"error": "Match not found"}
     
+    old_status = match.status
     match.status = "unmatched"
     await db.commit()
+    metrics_rollup.record_status_change(old_status, match.status, agent_ids=(match.agent1_id, match.agent2_id))
     return {"status": "unmatched"}
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import Select, tuple_
+
+# Keyset pagination over (created_at, id), oldest first (or newest first where a list asks for it).
+# created_at is NOT NULL on every paginated table, so each row has a cursor. The cursor is the (created_at, id) of the
+# last row of a page; the next page is a row-value comparison against it, which Postgres answers
+# from the (…, created_at, id) composite indexes however deep the client has paged.
+# Bodies stay plain JSON arrays; the next cursor goes in the X-Next-Cursor and Link headers
+# (absent on the last page), like GET /activity/.
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(stmt: Select, model, limit: int, cursor: Optional[str] = None, newest_first: bool = False) -> Select:
+    """
+    Restricts `stmt` to the page after `cursor`. Fetches one extra row to tell whether another page follows.
+    `newest_first` walks the same index backwards: each page holds the rows older than the cursor.
+    """
+    key = tuple_(model.created_at, model.id)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        after = tuple_(created_at, row_id)
+        stmt = stmt.where(key < after if newest_first else key > after)
+    if newest_first:
+        return stmt.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+    return stmt.order_by(model.created_at, model.id).limit(limit + 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def paginated_response(request: Request, rows: List, limit: int, append_only: bool = False) -> Response:
+    """
+    Builds the response for a `keyset_page` result: the page as a JSON array with ETag,
+    Last-Modified and next-page headers, or an empty 304 when the client's copy is current.
+
+    The ETag hashes the serialized page, so it changes with any edit to a row on it. Last-Modified
+    is the newest created_at on the page, which only reflects inserts; If-Modified-Since is therefore
+    only honoured for `append_only` lists, and only on full pages (newer rows land on later pages,
+    while a row in the same second as the newest one could hide behind the 1s resolution of the header).
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    body = jsonable_encoder(rows)
+
+    headers = {"Cache-Control": "no-cache"}
+    if has_more:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor, limit=limit)}>; rel="next"'
+
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    digest.update(headers.get("X-Next-Cursor", "").encode("utf-8"))
+    headers["ETag"] = f'W/"{digest.hexdigest()}"'
+
+    created = [row.created_at for row in rows if row.created_at]
+    last_modified = max(created) if created else None
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        # If-None-Match takes precedence; If-Modified-Since is ignored when it is present
+        not_modified = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        not_modified = bool(
+            if_modified_since and append_only and has_more and last_modified is not None
+            and _not_modified_since(if_modified_since, last_modified)
+        )
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
@@ -1,36 +1,194 @@
 import json
-from typing import Dict, List
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
 import asyncio
 from fastapi import WebSocket
 
+from src.core.config import settings
+from src.services.cache import WS_CHANNEL_PREFIX, redis_client
+
+# Slow-consumer policies, applied when a client's send queue is full:
+#   drop_oldest - discard the oldest queued frame to make room
+#   coalesce    - replace a queued frame with the same coalesce key (e.g. an older delta of the same
+#                 message) and fall back to drop_oldest if there is none
+#   disconnect  - close the client; it can reconnect and refetch
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+class ClientConnection:
+    """One websocket with its own bounded send queue, drained by a dedicated writer task."""
+
+    def __init__(self, websocket: WebSocket, channel: str, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.channel = channel
+        self.manager = manager
+        self.queue: Deque[Tuple[Optional[str], str]] = deque()  # (coalesce_key, frame)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, frame: str, coalesce_key: Optional[str] = None) -> bool:
+        """Queues a frame without waiting. Returns False if the client was disconnected for being too slow."""
+        policy = self.manager.policy
+        if policy == "coalesce" and coalesce_key is not None:
+            for i, (key, _) in enumerate(self.queue):
+                if key == coalesce_key:
+                    self.queue[i] = (coalesce_key, frame)
+                    self._count_drop()
+                    return True
+
+        if len(self.queue) >= settings.WS_SEND_QUEUE_SIZE:
+            if policy == "disconnect":
+                self.manager.slow_disconnects += 1
+                self.close()
+                return False
+            self.queue.popleft()
+            self._count_drop()
+
+        self.queue.append((coalesce_key, frame))
+        self.ready.set()
+        return True
+
+    def _count_drop(self):
+        self.dropped += 1
+        self.manager.dropped_frames += 1
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self.ready.wait()
+                while self.queue:
+                    _, frame = self.queue.popleft()
+                    await asyncio.wait_for(self.websocket.send_text(frame), settings.WS_SEND_TIMEOUT_SECONDS)
+                self.ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"WS send error on '{self.channel}': {e}")
+            self.manager.disconnect(self.websocket, self.channel)
+
+    def close(self):
+        """Stops the writer and closes the socket (best effort) after removing it from the manager."""
+        if self.closed:
+            return
+        self.closed = True
+        self.manager.disconnect(self.websocket, self.channel)
+        self.writer.cancel()
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
+
 class ConnectionManager:
     def __init__(self):
-        # Maps a channel/topic name to a list of active websocket connections
-        # e.g., "feed" -> [ws1, ws2], "match_123" -> [ws3]
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        # Maps a channel/topic name to its active websocket connections
+        # e.g., "feed" -> {ws1: client1, ws2: client2}, "match_123" -> {ws3: client3}
+        self.active_connections: Dict[str, Dict[WebSocket, ClientConnection]] = {}
+        self.policy = settings.WS_SLOW_CONSUMER_POLICY if settings.WS_SLOW_CONSUMER_POLICY in SLOW_CONSUMER_POLICIES else "drop_oldest"
+        self.dropped_frames = 0
+        self.slow_disconnects = 0
 
     async def connect(self, websocket: WebSocket, channel: str):
         await websocket.accept()
         if channel not in self.active_connections:
-            self.active_connections[channel] = []
-        self.active_connections[channel].append(websocket)
+            self.active_connections[channel] = {}
+        self.active_connections[channel][websocket] = ClientConnection(websocket, channel, self)
+        await event_router.sync(channel)
 
     def disconnect(self, websocket: WebSocket, channel: str):
         if channel in self.active_connections:
-             if websocket in self.active_connections[channel]:
-                 self.active_connections[channel].remove(websocket)
+             client = self.active_connections[channel].pop(websocket, None)
+             if client and not client.closed:
+                 client.closed = True
+                 client.writer.cancel()
              if len(self.active_connections[channel]) == 0:
                  del self.active_connections[channel]
+                 # Last local viewer gone: stop receiving this channel's traffic
+                 asyncio.create_task(event_router.sync(channel))
+
+    async def broadcast(self, channel: str, message: dict, coalesce_key: Optional[str] = None):
+        """Serializes once and queues the frame on every connection of the channel."""
+        self.broadcast_raw(channel, json.dumps(message), coalesce_key)
 
-    async def broadcast(self, channel: str, message: dict):
+    def broadcast_raw(self, channel: str, frame: str, coalesce_key: Optional[str] = None):
+        """
+        Queues an already serialized frame on every connection of the channel. Never waits on a
+        client, so one slow socket can't hold up the others or the Redis listener.
+        """
         if channel in self.active_connections:
-            message_str = json.dumps(message)
-            # Need to create instances because a disconnect could mutate the list while iterating
-            for connection in list(self.active_connections[channel]):
-                try:
-                    await connection.send_text(message_str)
-                except Exception as e:
-                    self.disconnect(connection, channel)
-                    print(f"WS broadcast error: {e}")
+            # Copy because a disconnect could mutate the dict while iterating
+            for client in list(self.active_connections[channel].values()):
+                client.enqueue(frame, coalesce_key)
+
+    def stats(self) -> dict:
+        channels = {}
+        for channel, clients in self.active_connections.items():
+            depths = [len(c.queue) for c in clients.values()]
+            channels[channel] = {
+                "connections": len(depths),
+                "queued_frames": sum(depths),
+                "max_queue_depth": max(depths, default=0),
+                "dropped_frames": sum(c.dropped for c in clients.values()),
+            }
+        return {
+            "policy": self.policy,
+            "queue_size": settings.WS_SEND_QUEUE_SIZE,
+            "connections": sum(ch["connections"] for ch in channels.values()),
+            "dropped_frames_total": self.dropped_frames,
+            "slow_consumer_disconnects": self.slow_disconnects,
+            "redis_subscriptions": len(event_router.subscribed),
+            "channels": channels,
+        }
+
+class RedisEventRouter:
+    """
+    Subscribes this API node to "ws:<channel>" only while it has local clients on <channel>, and
+    passes each Redis message through to them as-is (no JSON decode/encode on the node).
+    """
+
+    # Always subscribed so the pubsub connection exists before any client connects; nothing publishes here
+    IDLE_CHANNEL = f"{WS_CHANNEL_PREFIX}__idle__"
+
+    def __init__(self, manager: "ConnectionManager"):
+        self.manager = manager
+        self.pubsub = None
+        self.subscribed = set()
+        self.lock = asyncio.Lock()
+
+    async def sync(self, channel: str):
+        """Brings the subscription for `channel` in line with whether it currently has local clients."""
+        if self.pubsub is None:
+            return
+        async with self.lock:
+            wanted = channel in self.manager.active_connections
+            if wanted and channel not in self.subscribed:
+                await self.pubsub.subscribe(f"{WS_CHANNEL_PREFIX}{channel}")
+                self.subscribed.add(channel)
+            elif not wanted and channel in self.subscribed:
+                await self.pubsub.unsubscribe(f"{WS_CHANNEL_PREFIX}{channel}")
+                self.subscribed.discard(channel)
+
+    async def run(self):
+        """Background task that listens to the subscribed channels and hands frames to the ConnectionManager."""
+        self.pubsub = redis_client.pubsub()
+        await self.pubsub.subscribe(self.IDLE_CHANNEL)
+        for channel in list(self.manager.active_connections):
+            await self.sync(channel)
+        print("Started Redis PubSub router for websocket channels")
+
+        try:
+            async for message in self.pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                channel = message["channel"][len(WS_CHANNEL_PREFIX):]
+                coalesce_key, _, frame = message["data"].partition("\n")
+                self.manager.broadcast_raw(channel, frame, coalesce_key or None)
+        except asyncio.CancelledError:
+            await self.pubsub.unsubscribe()
+            await self.pubsub.aclose()
 
 manager = ConnectionManager()
+event_router = RedisEventRouter(manager)
@@ -0,0 +1,18 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def upgrade_database(revision: str = "head"):
+    """
+    Runs `alembic upgrade <revision>` with backend/alembic.ini. Blocking (env.py drives its own
+    event loop), so call it from a thread inside async code. Concurrent callers are serialized by an
+    advisory lock in migrations/env.py.
+    """
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
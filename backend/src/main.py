@@ -1,16 +1,16 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
-import json
 
 from src.core.config import settings
-from src.db.session import engine, Base
+from src.db.migrations import upgrade_database
 from src.api.agents import router as agents_router
 from src.api.matches import router as matches_router
 from src.api.metrics import router as metrics_router
 from src.api.activity import router as activity_router
-from src.core.websockets import manager
-from src.services.cache import redis_client
+from src.core.websockets import event_router, manager
+from src.services.agent_cache import start_invalidation_listener
+from src.services.llm.client_registry import client_registry
 
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION)
 
@@ -20,41 +20,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "ETag", "Last-Modified"],
 )
 
-async def redis_listener():
-    """Background task that listens to Redis PubSub and broadcasts to WebSockets"""
-    pubsub = redis_client.pubsub()
-    await pubsub.subscribe("agentic_hinge_events")
-    print("Started Redis PubSub listener for 'agentic_hinge_events'")
-    
-    try:
-        async for message in pubsub.listen():
-            if message["type"] == "message":
-                try:
-                    payload = json.loads(message["data"])
-                    event_type = payload.get("type")
-                    data = payload.get("data", {})
-                    
-                    if event_type == "new_message":
-                        # Route specifically to the match chatroom
-                        match_id = data.get("match_id")
-                        if match_id:
-                            await manager.broadcast(f"match_{match_id}", payload)
-                    elif event_type == "new_activity":
-                        # Route specifically to the global activity feed
-                        await manager.broadcast("feed", payload)
-                except json.JSONDecodeError:
-                    pass
-    except asyncio.CancelledError:
-        await pubsub.unsubscribe("agentic_hinge_events")
-
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    # Spawn the Redis pubsub listener
-    asyncio.create_task(redis_listener())
+    # Schema changes go through Alembic (backend/migrations) instead of create_all
+    await asyncio.to_thread(upgrade_database)
+    start_invalidation_listener()
+    # Spawn the Redis pubsub router (subscribes per channel as websocket clients come and go)
+    asyncio.create_task(event_router.run())
+
+@app.on_event("shutdown")
+async def shutdown():
+    await client_registry.aclose()
 
 app.include_router(agents_router, prefix="/agents", tags=["agents"])
 app.include_router(matches_router, prefix="/matches", tags=["matches"])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Float, JSON, Integer
+from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Float, JSON, Integer, Index, func, text
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 import uuid
@@ -24,7 +24,12 @@ class Agent(Base):
     provider_api_key = Column(String, nullable=True) # Custom key for parallel scaling
     provider = Column(String, default="groq") # The LLM provider (e.g., groq, gemini)
     model = Column(String, default="llama-3.1-8b-instant") # The specific model to use
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), server_default=func.now())
+
+    __table_args__ = (
+        # Keyset pages of GET /agents/
+        Index("ix_agents_created", "created_at", "id"),
+    )
 
 class Match(Base):
     __tablename__ = "matches"
@@ -37,11 +42,26 @@ class Match(Base):
     conversation_stage = Column(String, default="ice_breaker") # ice_breaker, building_rapport, escalation, planning
     interest_level = Column(Float, default=1.0) # 0.0 to 1.0. Drops over bad msgs.
     messages_count = Column(Integer, default=0) # Track how many messages sent total
+    summary = Column(Text, nullable=True) # Rolling summary of the messages older than the chat context window
+    summary_message_count = Column(Integer, default=0) # How many of the oldest messages the summary covers
+    agent1_last_evaluated_count = Column(Integer, default=0, server_default="0") # Message count when agent1 last scored this match
+    agent2_last_evaluated_count = Column(Integer, default=0, server_default="0") # Same for agent2
     
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), server_default=func.now())
 
     messages = relationship("Message", back_populates="match", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Pair lookups from either side (discovery exclusion, duplicate-match checks)
+        Index("ix_matches_agent1_agent2", "agent1_id", "agent2_id"),
+        Index("ix_matches_agent2_agent1", "agent2_id", "agent1_id"),
+        # An agent's matches by status, from either side (active match counts, evaluation)
+        Index("ix_matches_agent1_status", "agent1_id", "status"),
+        Index("ix_matches_agent2_status", "agent2_id", "status"),
+        # Active-match sweep
+        Index("ix_matches_active", "id", postgresql_where=text("status = 'active'")),
+    )
+
 class Like(Base):
     __tablename__ = "likes"
 
@@ -51,7 +71,15 @@ class Like(Base):
     status = Column(String, default="pending") # pending, accepted, rejected
     reason = Column(Text, nullable=True) # E.g., "Love your energy!"
     
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), server_default=func.now())
+
+    __table_args__ = (
+        # Pair lookups from either side (discovery exclusion, duplicate-like checks)
+        Index("ix_likes_sender_receiver", "sender_id", "receiver_id"),
+        Index("ix_likes_receiver_sender", "receiver_id", "sender_id"),
+        # Pending inbox per receiver, oldest first (like evaluation, pending likes API, like sweep)
+        Index("ix_likes_receiver_pending", "receiver_id", "created_at", "id", postgresql_where=text("status = 'pending'")),
+    )
 
 class AgentMemory(Base):
     __tablename__ = "agent_memories"
@@ -63,7 +91,12 @@ class AgentMemory(Base):
     confidence = Column(Float, default=0.5) # 0.0 to 1.0
     created_from_match = Column(String, ForeignKey("matches.id"), nullable=True)
     
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), server_default=func.now())
+
+    __table_args__ = (
+        # An agent's memories in creation order (memories API, consolidation)
+        Index("ix_agent_memories_agent_created", "agent_id", "created_at", "id"),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
@@ -72,7 +105,15 @@ class Message(Base):
     match_id = Column(String, ForeignKey("matches.id"))
     sender_agent_id = Column(String, ForeignKey("agents.id"))
     content = Column(Text, nullable=False)
+    topics = Column(JSON, nullable=True) # Topic tags from TOPIC_LEXICON, set when the message is written
     
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), server_default=func.now())
 
     match = relationship("Match", back_populates="messages")
+
+    __table_args__ = (
+        # Chat context tail, history pages and per-match counts
+        Index("ix_messages_match_created", "match_id", "created_at", "id"),
+        # Messages sent per agent
+        Index("ix_messages_sender", "sender_agent_id"),
+    )
@@ -0,0 +1,191 @@
+import asyncio
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.models.domain import Agent, Like, Match, Message
+from src.services.cache import publish_event, redis_client, redis_sync_client
+
+# Likes, matches and messages are appended to one capped Redis Stream when they are written,
+# with agent names denormalized into each entry, so the feed is a single XREVRANGE per page.
+ACTIVITY_STREAM_KEY = "activity_feed"
+# Set once the stream has been seeded from the database. Checked instead of the stream itself,
+# which doesn't exist while there is no activity yet.
+ACTIVITY_SEEDED_KEY = "activity_feed:seeded"
+ACTIVITY_REBUILD_LOCK_KEY = "activity_feed:rebuild_lock"
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def message_activity(msg: Message, agent_name: str) -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "id": msg.id,
+        "agent_name": agent_name,
+        "agent_id": msg.sender_agent_id,
+        "match_id": msg.match_id,
+        "content": msg.content,
+        "timestamp": _isoformat(msg.created_at)
+    }
+
+
+def match_activity(match: Match, agent1_name: str, agent2_name: str) -> Dict[str, Any]:
+    return {
+        "type": "match",
+        "id": match.id,
+        "agent1_name": agent1_name,
+        "agent2_name": agent2_name,
+        "agent1_id": match.agent1_id,
+        "agent2_id": match.agent2_id,
+        "compatibility_score": match.compatibility_score,
+        "status": match.status,
+        "timestamp": _isoformat(match.created_at)
+    }
+
+
+def like_activity(like: Like, sender_name: str, receiver_name: str) -> Dict[str, Any]:
+    return {
+        "type": "like",
+        "id": like.id,
+        "sender_name": sender_name,
+        "receiver_name": receiver_name,
+        "sender_id": like.sender_id,
+        "receiver_id": like.receiver_id,
+        "status": like.status,
+        "timestamp": _isoformat(like.created_at)
+    }
+
+
+def record_activity(*items: Dict[str, Any]):
+    """
+    Appends feed items to the activity stream (trimmed to ~ACTIVITY_STREAM_MAXLEN) and pushes each
+    one to live `feed` subscribers. Best effort: the feed is never worth failing a write over.
+    """
+    if not items:
+        return
+    try:
+        pipe = redis_sync_client.pipeline(transaction=False)
+        for item in items:
+            pipe.xadd(ACTIVITY_STREAM_KEY, {"data": json.dumps(item)}, maxlen=settings.ACTIVITY_STREAM_MAXLEN, approximate=True)
+        pipe.execute()
+        for item in items:
+            publish_event("agentic_hinge_events", "new_activity", item)
+    except redis.RedisError as e:
+        print(f"Failed to record activity: {e}")
+
+
+def encode_cursor(entry_id: str) -> str:
+    return base64.urlsafe_b64encode(entry_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[str]:
+    try:
+        entry_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    ms, _, seq = entry_id.partition("-")
+    return entry_id if ms.isdigit() and seq.isdigit() else None
+
+
+async def read_activity_page(limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Newest-first page of feed items older than `cursor`. Returns (items, cursor for the next page or None)."""
+    start = "+"
+    if cursor:
+        entry_id = decode_cursor(cursor)
+        if entry_id is None:
+            raise ValueError("Invalid cursor")
+        start = f"({entry_id}"  # Exclusive: continue strictly after the last item of the previous page
+
+    # One extra entry tells us whether an older page exists, so an exactly-full last page gets no cursor
+    entries = await redis_client.xrevrange(ACTIVITY_STREAM_KEY, max=start, min="-", count=limit + 1)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    items = [json.loads(fields["data"]) for _, fields in entries]
+    next_cursor = encode_cursor(entries[-1][0]) if has_more else None
+    return items, next_cursor
+
+
+async def ensure_activity_stream(session: AsyncSession):
+    """
+    Seeds the stream from the database if it never has been (first read after deploy, or a flushed
+    Redis). One caller rebuilds under a lock; concurrent readers wait briefly for it to finish.
+    """
+    if await redis_client.exists(ACTIVITY_SEEDED_KEY):
+        return
+    if not await redis_client.set(ACTIVITY_REBUILD_LOCK_KEY, "1", nx=True, ex=300):
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            if await redis_client.exists(ACTIVITY_SEEDED_KEY):
+                return
+        return
+    try:
+        await rebuild_activity_stream(session)
+    finally:
+        await redis_client.delete(ACTIVITY_REBUILD_LOCK_KEY)
+
+
+async def rebuild_activity_stream(session: AsyncSession):
+    """
+    Seeds the stream from the database: the latest ACTIVITY_STREAM_MAXLEN likes, matches and messages,
+    merged by time. Entry ids are derived from the rows' timestamps so the order matches the old feed.
+    The new stream is built under a temporary key and renamed over the live one.
+    """
+    limit = settings.ACTIVITY_STREAM_MAXLEN
+    agent_ids = set()
+    rows = []
+
+    msgs_res = await session.execute(select(Message).order_by(desc(Message.created_at)).limit(limit))
+    for msg in msgs_res.scalars():
+        rows.append(("message", msg))
+        agent_ids.add(msg.sender_agent_id)
+    matches_res = await session.execute(select(Match).order_by(desc(Match.created_at)).limit(limit))
+    for match in matches_res.scalars():
+        rows.append(("match", match))
+        agent_ids.update((match.agent1_id, match.agent2_id))
+    likes_res = await session.execute(select(Like).order_by(desc(Like.created_at)).limit(limit))
+    for like in likes_res.scalars():
+        rows.append(("like", like))
+        agent_ids.update((like.sender_id, like.receiver_id))
+
+    # Only the agents that actually appear in the feed
+    names_res = await session.execute(select(Agent.id, Agent.name).where(Agent.id.in_(agent_ids - {None})))
+    names = {row.id: row.name for row in names_res}
+
+    def name(agent_id):
+        return names.get(agent_id, "Unknown")
+
+    rows = [r for r in rows if r[1].created_at]
+    rows.sort(key=lambda r: r[1].created_at)
+    rows = rows[-limit:]
+
+    tmp = f"{ACTIVITY_STREAM_KEY}:rebuild"
+    pipe = redis_sync_client.pipeline(transaction=False)
+    pipe.delete(tmp)
+    last_ms, seq = -1, 0
+    for kind, row in rows:
+        if kind == "message":
+            item = message_activity(row, name(row.sender_agent_id))
+        elif kind == "match":
+            item = match_activity(row, name(row.agent1_id), name(row.agent2_id))
+        else:
+            item = like_activity(row, name(row.sender_id), name(row.receiver_id))
+
+        ms = max(int(row.created_at.timestamp() * 1000), last_ms)
+        seq = seq + 1 if ms == last_ms else 0
+        last_ms = ms
+        pipe.xadd(tmp, {"data": json.dumps(item)}, id=f"{ms}-{seq}")
+    pipe.execute()
+
+    if rows:
+        redis_sync_client.rename(tmp, ACTIVITY_STREAM_KEY)
+    else:
+        redis_sync_client.delete(ACTIVITY_STREAM_KEY)
+    redis_sync_client.set(ACTIVITY_SEEDED_KEY, "1")
+    print(f"Rebuilt activity stream with {len(rows)} entries")
@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.models.domain import Agent
+from src.services.cache import get_cached_agents, invalidate_cached_agent, redis_client, redis_sync_client, set_cached_agent
+
+# Read-through agent profile cache: in-process TTL LRU -> Redis (agent_profile:<id>) -> Postgres.
+# Profiles are read-only snapshots with the same attributes as an Agent row; code that modifies an
+# agent must load the ORM row itself and call `invalidate_agent_profile` after committing, which
+# clears Redis and tells every process (via pub/sub) to drop its local copy.
+
+INVALIDATION_CHANNEL = "agent_profile_invalidations"
+_COLUMNS = [c.name for c in Agent.__table__.columns]
+
+
+class AgentProfile(SimpleNamespace):
+    """Detached, read-only view of an Agent row."""
+
+    @classmethod
+    def from_row(cls, agent: Agent) -> "AgentProfile":
+        return cls(**{name: getattr(agent, name) for name in _COLUMNS})
+
+    @classmethod
+    def from_cached(cls, data: Dict[str, Any]) -> "AgentProfile":
+        values = {name: data.get(name) for name in _COLUMNS}
+        if values.get("created_at"):
+            values["created_at"] = datetime.fromisoformat(values["created_at"])
+        return cls(**values)
+
+    def to_cached(self) -> Dict[str, Any]:
+        data = dict(vars(self))
+        if isinstance(data.get("created_at"), datetime):
+            data["created_at"] = data["created_at"].isoformat()
+        return data
+
+
+class _LocalProfileCache:
+    """Bounded LRU with per-entry expiry. Locked because the invalidation listener runs in a thread."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, AgentProfile]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, agent_id: str) -> Optional[AgentProfile]:
+        with self._lock:
+            entry = self._entries.get(agent_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[agent_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(agent_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, agent_id: str, profile: AgentProfile):
+        with self._lock:
+            self._entries[agent_id] = (time.monotonic() + self.ttl_seconds, profile)
+            self._entries.move_to_end(agent_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, agent_id: str):
+        with self._lock:
+            self._entries.pop(agent_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+local_profiles = _LocalProfileCache(settings.AGENT_CACHE_MAX_ENTRIES, settings.AGENT_CACHE_LOCAL_TTL_SECONDS)
+
+
+def _generation_key(agent_id: str) -> str:
+    return f"agent_profile_gen:{agent_id}"
+
+
+async def get_agent_profiles(session: AsyncSession, agent_ids: Iterable[str]) -> Dict[str, AgentProfile]:
+    """Profiles for the given ids (missing agents are left out): local LRU, then one MGET, then one IN query."""
+    wanted = [a for a in dict.fromkeys(agent_ids) if a]
+    profiles: Dict[str, AgentProfile] = {}
+
+    for agent_id in wanted:
+        profile = local_profiles.get(agent_id)
+        if profile is not None:
+            profiles[agent_id] = profile
+
+    missing = [a for a in wanted if a not in profiles]
+    if missing:
+        try:
+            cached = await get_cached_agents(missing)
+        except redis.RedisError:
+            cached = {}
+        for agent_id, data in cached.items():
+            profiles[agent_id] = AgentProfile.from_cached(data)
+            local_profiles.put(agent_id, profiles[agent_id])
+
+    missing = [a for a in wanted if a not in profiles]
+    if missing:
+        try:
+            generations = await redis_client.mget([_generation_key(a) for a in missing])
+        except redis.RedisError:
+            generations = None
+
+        res = await session.execute(select(Agent).where(Agent.id.in_(missing)))
+        loaded = {agent.id: AgentProfile.from_row(agent) for agent in res.scalars().all()}
+
+        for agent_id, profile in loaded.items():
+            profiles[agent_id] = profile
+            local_profiles.put(agent_id, profile)
+        if loaded and generations is not None:
+            await _populate_redis(loaded, dict(zip(missing, generations)))
+
+    return profiles
+
+
+async def get_agent_profile(session: AsyncSession, agent_id: str) -> Optional[AgentProfile]:
+    return (await get_agent_profiles(session, [agent_id])).get(agent_id)
+
+
+async def _populate_redis(loaded: Dict[str, AgentProfile], generations_before: Dict[str, Optional[str]]):
+    # Skip agents invalidated while we were reading the database, so a stale row can't be cached
+    try:
+        generations_after = await redis_client.mget([_generation_key(a) for a in loaded])
+        for (agent_id, profile), after in zip(loaded.items(), generations_after):
+            if after == generations_before.get(agent_id):
+                await set_cached_agent(agent_id, profile.to_cached(), expire_seconds=settings.AGENT_CACHE_TTL_SECONDS)
+    except redis.RedisError:
+        pass
+
+
+async def invalidate_agent_profile(agent_id: str):
+    """Call after committing a change to an agent: clears Redis and every process's local copy."""
+    local_profiles.discard(agent_id)
+    try:
+        await redis_client.incr(_generation_key(agent_id))
+        await invalidate_cached_agent(agent_id)
+        await redis_client.publish(INVALIDATION_CHANNEL, agent_id)
+    except redis.RedisError as e:
+        print(f"Failed to invalidate cached profile for {agent_id}: {e}")
+
+
+_listener: Optional[threading.Thread] = None
+
+
+def _listen_for_invalidations():
+    while True:
+        try:
+            pubsub = redis_sync_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything cached before (re)subscribing may have missed an invalidation
+            local_profiles.clear()
+            for message in pubsub.listen():
+                if message["type"] == "message":
+                    local_profiles.discard(message["data"])
+        except redis.RedisError as e:
+            print(f"Agent profile invalidation listener lost Redis, reconnecting: {e}")
+            local_profiles.clear()
+            time.sleep(1)
+
+
+def start_invalidation_listener():
+    """Starts (once per process) the daemon thread that evicts local profiles on invalidation messages."""
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return
+    _listener = threading.Thread(target=_listen_for_invalidations, name="agent-profile-invalidations", daemon=True)
+    _listener.start()
+
+
+def get_agent_cache_stats() -> Dict[str, Any]:
+    total = local_profiles.hits + local_profiles.misses
+    return {
+        "local_entries": len(local_profiles),
+        "local_hits": local_profiles.hits,
+        "local_misses": local_profiles.misses,
+        "local_hit_rate": round(local_profiles.hits / total, 4) if total else 0.0,
+    }
@@ -1,5 +1,5 @@
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import redis
 import redis.asyncio as redis_async
 from src.core.config import settings
@@ -10,14 +10,36 @@ redis_client = redis_async.from_url(settings.REDIS_URL, decode_responses=True)
 # Sync client for Celery workers to publish events
 redis_sync_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
+# Events that WebSocket clients consume are published straight to the channel of the viewers
+# that want them ("ws:match_<id>", "ws:feed"), so an API node only receives traffic for the
+# channels it has clients on. The Redis message is "<coalesce key>\n<frame>": the frame is the exact
+# text sent to the browser, and the key lets the node coalesce queued frames without parsing JSON.
+WS_CHANNEL_PREFIX = "ws:"
+_MATCH_EVENTS = ("new_message", "message_delta")
+
+def ws_route(event_type: str, data: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """(websocket channel, coalesce key) for an event, or None if no viewer consumes it."""
+    if event_type in _MATCH_EVENTS and data.get("match_id"):
+        return f"match_{data['match_id']}", f"msg:{data.get('id', '')}"
+    if event_type == "new_activity":
+        return "feed", ""
+    return None
+
 def publish_event(channel: str, event_type: str, data: Dict[str, Any]):
     """Synchronously publishes a payload to a Redis PubSub channel. 
-       Usually called from blocking Celery tasks."""
+       Usually called from blocking Celery tasks. Viewer-facing events are routed to their
+       per-viewer channel (see `ws_route`); anything else goes to `channel`."""
     payload = {
         "type": event_type,
         "data": data
     }
-    redis_sync_client.publish(channel, json.dumps(payload))
+    frame = json.dumps(payload)
+    route = ws_route(event_type, data)
+    if route:
+        ws_channel, coalesce_key = route
+        redis_sync_client.publish(f"{WS_CHANNEL_PREFIX}{ws_channel}", f"{coalesce_key}\n{frame}")
+    else:
+        redis_sync_client.publish(channel, frame)
 
 
 async def set_cached_agent(agent_id: str, agent_data: Dict[str, Any], expire_seconds: int = 3600):
@@ -35,6 +57,22 @@ async def get_cached_agent(agent_id: str) -> Optional[Dict[str, Any]]:
         return json.loads(data)
     return None
 
+async def get_cached_agents(agent_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Batch `get_cached_agent`: one MGET, returns {agent_id: profile data} for the hits."""
+    if not agent_ids:
+        return {}
+    values = await redis_client.mget([f"agent_profile:{agent_id}" for agent_id in agent_ids])
+    return {agent_id: json.loads(v) for agent_id, v in zip(agent_ids, values) if v}
+
 async def invalidate_cached_agent(agent_id: str):
     """Deletes an agent's profile from the Redis cache."""
     await redis_client.delete(f"agent_profile:{agent_id}")
+
+
+async def get_discovery_cursor(agent_id: str) -> str:
+    """Returns the last candidate id the agent's discovery has paged past ("" = start of the population)."""
+    return await redis_client.get(f"discovery_cursor:{agent_id}") or ""
+
+async def set_discovery_cursor(agent_id: str, last_seen_id: str, expire_seconds: int = 7 * 24 * 3600):
+    """Persists the agent's discovery position so the next run continues where this one stopped."""
+    await redis_client.setex(f"discovery_cursor:{agent_id}", expire_seconds, last_seen_id)
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.models.domain import Match, Message
+from src.services.agent_cache import get_agent_profiles
+from src.services.cache import redis_sync_client
+from src.services.llm_service import Priority, generate_reply, is_error_reply
+
+# A match's prompt is its rolling summary plus the messages the summary doesn't cover yet.
+# That tail is kept between CHAT_CONTEXT_TURNS and CHAT_CONTEXT_TURNS + CHAT_SUMMARY_INTERVAL
+# messages: once it reaches the upper bound, everything but the last CHAT_CONTEXT_TURNS is
+# folded into the summary in the background.
+
+
+@dataclass
+class ChatContext:
+    summary: Optional[str]
+    messages: List[Message]  # Oldest first
+    total: int  # Messages in the match, including the summarized ones
+
+
+def _tail_limit() -> int:
+    return settings.CHAT_CONTEXT_TURNS + settings.CHAT_SUMMARY_INTERVAL
+
+
+async def load_chat_context(session: AsyncSession, match: Match) -> ChatContext:
+    """Loads the summary and the unsummarized tail of a match, never more than `_tail_limit()` messages."""
+    total = await session.scalar(select(func.count()).select_from(Message).where(Message.match_id == match.id)) or 0
+    start = max(match.summary_message_count or 0, total - _tail_limit())
+
+    res = await session.execute(
+        select(Message)
+        .where(Message.match_id == match.id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(max(total - start, 0))
+    )
+    return ChatContext(summary=match.summary, messages=list(reversed(res.scalars().all())), total=total)
+
+
+def needs_summary(match: Match, total: int) -> bool:
+    return total - (match.summary_message_count or 0) >= _tail_limit()
+
+
+def _summary_slot_key(match_id: str) -> str:
+    return f"match_summary_pending:{match_id}"
+
+
+def claim_summary_slot(match_id: str) -> bool:
+    """Only one summary refresh per match may be queued at a time."""
+    return bool(redis_sync_client.set(_summary_slot_key(match_id), 1, nx=True, ex=settings.CHAT_TURN_LEASE_SECONDS))
+
+
+def release_summary_slot(match_id: str):
+    redis_sync_client.delete(_summary_slot_key(match_id))
+
+
+async def refresh_match_summary(session: AsyncSession, match_id: str) -> bool:
+    """
+    Folds the messages that fell out of the verbatim window into the match summary.
+    The write is conditional on summary_message_count being unchanged, so a concurrent refresh
+    can't overwrite a newer summary with an older one. Returns True if the summary moved forward.
+    """
+    match = await session.scalar(select(Match).where(Match.id == match_id).execution_options(populate_existing=True))
+    if not match: return False
+
+    covered = match.summary_message_count or 0
+    total = await session.scalar(select(func.count()).select_from(Message).where(Message.match_id == match_id)) or 0
+    target = min(total - settings.CHAT_CONTEXT_TURNS, covered + settings.CHAT_SUMMARY_MAX_FOLD)
+    if target <= covered:
+        return False
+
+    res = await session.execute(
+        select(Message)
+        .where(Message.match_id == match_id)
+        .order_by(Message.created_at, Message.id)
+        .offset(covered)
+        .limit(target - covered)
+    )
+    messages = res.scalars().all()
+
+    agents = await get_agent_profiles(session, [match.agent1_id, match.agent2_id])
+    owner = agents.get(match.agent1_id) or agents.get(match.agent2_id)
+    if not owner: return False
+
+    transcript = "\n".join(
+        f"{agents[m.sender_agent_id].name if m.sender_agent_id in agents else 'Unknown'}: {m.content}" for m in messages
+    )
+    prompt = f"""You maintain the running summary of a dating-app conversation between {' and '.join(a.name for a in agents.values())}.
+    Summary so far:
+    {match.summary or "None yet, this is the start of the conversation."}
+
+    New messages since that summary:
+    {transcript}
+
+    Rewrite the summary so it also covers the new messages. Keep names, facts they shared about themselves,
+    running jokes, plans and how the vibe is developing. Write in third person, under 150 words.
+    Output ONLY the summary."""
+
+    provider = owner.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
+    model_name = owner.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
+    summary = await generate_reply(
+        provider, prompt, [],
+        model_name=model_name,
+        override_api_key=owner.provider_api_key,
+        max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS,
+        priority=Priority.CONSOLIDATION
+    )
+    if is_error_reply(summary):
+        return False
+
+    res = await session.execute(
+        update(Match)
+        .where(Match.id == match_id, func.coalesce(Match.summary_message_count, 0) == covered)
+        .values(summary=summary.strip(), summary_message_count=covered + len(messages))
+    )
+    await session.commit()
+    return res.rowcount == 1
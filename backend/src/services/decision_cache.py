@@ -0,0 +1,87 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable
+
+import redis
+
+from src.core.config import settings
+from src.services.cache import redis_client
+
+# Profile fields that influence how an agent judges, or is judged by, others
+_PROFILE_FIELDS = ("persona", "personality", "system_prompt", "matching_preferences", "conversation_style", "opening_moves")
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def profile_version(agent) -> str:
+    """Content version of an agent's profile; changes whenever a field the prompts use changes."""
+    return _digest([getattr(agent, f, None) for f in _PROFILE_FIELDS])
+
+
+def memory_set_hash(memories: Iterable[str]) -> str:
+    """Order-insensitive hash of the memories that were put in front of the LLM."""
+    return _digest(sorted(memories))
+
+
+async def _generation(agent_id: str) -> str:
+    return await redis_client.get(f"decision_gen:{agent_id}") or "0"
+
+
+def _key(kind: str, generation: str, agent_version: str, counterpart_id: str, meta: Dict[str, str],
+         template_version: str, model: str) -> str:
+    parts = _digest([agent_version, meta["version"], meta["memory_hash"], meta.get("context", ""), template_version, model])
+    return f"decision:{kind}:{generation}:{counterpart_id}:{parts}"
+
+
+async def get_cached_decisions(
+    kind: str, agent, counterparts: Dict[str, Dict[str, str]], template_version: str, model: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Looks up earlier LLM decisions made by `agent` about each counterpart.
+    `counterparts` maps counterpart_id -> {"version": ..., "memory_hash": ..., "context": optional extra input
+    such as a like's opening message}. Returns {counterpart_id: decision} for the hits only.
+    Redis errors are treated as misses.
+    """
+    if not counterparts:
+        return {}
+    try:
+        generation = await _generation(agent.id)
+        agent_version = profile_version(agent)
+        ids = list(counterparts)
+        keys = [
+            _key(kind, generation, agent_version, cid, counterparts[cid], template_version, model)
+            for cid in ids
+        ]
+        raw = await redis_client.mget(keys)
+    except redis.RedisError:
+        return {}
+    return {cid: json.loads(value) for cid, value in zip(ids, raw) if value}
+
+
+async def cache_decisions(
+    kind: str, agent, counterparts: Dict[str, Dict[str, str]], decisions: Dict[str, Dict[str, Any]],
+    template_version: str, model: str
+):
+    """Stores `decisions` ({counterpart_id: decision}) under the same keys `get_cached_decisions` reads."""
+    if not decisions:
+        return
+    try:
+        generation = await _generation(agent.id)
+        agent_version = profile_version(agent)
+        pipe = redis_client.pipeline(transaction=False)
+        for cid, decision in decisions.items():
+            key = _key(kind, generation, agent_version, cid, counterparts[cid], template_version, model)
+            pipe.setex(key, settings.DECISION_CACHE_TTL_SECONDS, json.dumps(decision))
+        await pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+async def invalidate_agent_decisions(agent_id: str):
+    """Orphans every cached decision made by this agent (they expire via TTL)."""
+    try:
+        await redis_client.incr(f"decision_gen:{agent_id}")
+    except redis.RedisError:
+        pass
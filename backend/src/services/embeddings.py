@@ -0,0 +1,211 @@
+import hashlib
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import redis
+
+from src.core.config import settings
+
+# Binary client: vectors are stored as packed float32, not JSON
+_redis_bin = redis.from_url(settings.REDIS_URL)
+
+_STATS_KEY = "embedding_cache:stats"
+
+
+def embedding_cache_key(model: str, input_type: str, text: str) -> str:
+    """Content address of an embedding: identical (model, input_type, text) always maps to the same key."""
+    digest = hashlib.sha256(f"{model}\x00{input_type}\x00{text}".encode("utf-8")).hexdigest()
+    return f"embedding:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: a thread-safe in-process LRU in front of Redis.
+    Lookups are batched so a list of texts costs one Redis MGET for the LRU misses.
+    Hit/miss counters are kept in process and added to the cluster-wide totals in Redis at most
+    every `stats_flush_seconds`, so lookups don't pay a round trip for them.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, stats_flush_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats_flush_seconds = stats_flush_seconds
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"lru_hits": 0, "redis_hits": 0, "misses": 0}
+        self._unflushed = dict.fromkeys(self.stats, 0)
+        self._last_flush = time.monotonic()
+
+    def _lru_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+            return vector
+
+    def _lru_put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _record(self, lru_hits: int, redis_hits: int, misses: int):
+        with self._lock:
+            for field, n in (("lru_hits", lru_hits), ("redis_hits", redis_hits), ("misses", misses)):
+                self.stats[field] += n
+                self._unflushed[field] += n
+            due = time.monotonic() - self._last_flush >= self.stats_flush_seconds
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Adds the counts recorded since the last flush to the Redis totals (one pipelined round trip)."""
+        with self._lock:
+            deltas, self._unflushed = self._unflushed, dict.fromkeys(self.stats, 0)
+            self._last_flush = time.monotonic()
+        if not any(deltas.values()):
+            return
+        try:
+            pipe = _redis_bin.pipeline(transaction=False)
+            for field, n in deltas.items():
+                if n: pipe.hincrby(_STATS_KEY, field, n)
+            pipe.execute()
+        except redis.RedisError:
+            # Put them back for the next flush
+            with self._lock:
+                for field, n in deltas.items():
+                    self._unflushed[field] += n
+
+    def get_or_embed(
+        self,
+        model: str,
+        input_type: str,
+        texts: List[str],
+        embed_fn: Callable[[List[str]], List[List[float]]],
+    ) -> List[List[float]]:
+        """
+        Returns one vector per text. Only texts missing from both tiers are passed to `embed_fn`,
+        in a single call, and the results are written back to both tiers.
+        """
+        keys = [embedding_cache_key(model, input_type, t) for t in texts]
+        vectors: Dict[str, List[float]] = {}
+
+        for key in keys:
+            vector = self._lru_get(key)
+            if vector is not None:
+                vectors[key] = vector
+        lru_hits = len(vectors)
+
+        redis_keys = list(dict.fromkeys(k for k in keys if k not in vectors))
+        redis_hits = 0
+        if redis_keys:
+            try:
+                for key, raw in zip(redis_keys, _redis_bin.mget(redis_keys)):
+                    if raw is not None:
+                        vector = array("f", raw).tolist()
+                        vectors[key] = vector
+                        self._lru_put(key, vector)
+                        redis_hits += 1
+            except redis.RedisError:
+                pass
+
+        missing = [(k, t) for k, t in dict(zip(keys, texts)).items() if k not in vectors]
+        if missing:
+            fresh = embed_fn([t for _, t in missing])
+            try:
+                pipe = _redis_bin.pipeline(transaction=False)
+                for (key, _), vector in zip(missing, fresh):
+                    pipe.setex(key, self.ttl_seconds, array("f", vector).tobytes())
+                pipe.execute()
+            except redis.RedisError:
+                pass
+            for (key, _), vector in zip(missing, fresh):
+                vectors[key] = list(vector)
+                self._lru_put(key, vectors[key])
+
+        self._record(lru_hits, redis_hits, len(missing))
+        return [vectors[k] for k in keys]
+
+    def snapshot(self) -> Dict[str, int]:
+        """This process's counters and LRU occupancy."""
+        with self._lock:
+            return {**self.stats, "lru_entries": len(self._lru), "lru_capacity": self.max_entries}
+
+
+embedding_cache = EmbeddingCache(
+    settings.EMBEDDING_CACHE_MAX_ENTRIES, settings.EMBEDDING_CACHE_TTL_SECONDS, settings.EMBEDDING_CACHE_STATS_FLUSH_SECONDS
+)
+
+
+def get_embedding_cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Cluster-wide hit/miss counters (aggregated in Redis, each process's share up to one flush interval
+    behind) alongside this process's counters and LRU state.
+    """
+    embedding_cache.flush_stats()
+    try:
+        raw = _redis_bin.hgetall(_STATS_KEY)
+        cluster = {k.decode(): int(v) for k, v in raw.items()}
+    except redis.RedisError:
+        cluster = {}
+    return {"cluster": cluster, "process": embedding_cache.snapshot()}
+
+
+def text_fingerprint(text: str) -> str:
+    """Short content hash used to detect unchanged re-embed requests."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def has_embedded_text(namespace: str, record_id: str, text: str) -> bool:
+    """True if `record_id` in `namespace` was last embedded from exactly this text."""
+    try:
+        stored = _redis_bin.get(f"embedding_source:{namespace}:{record_id}")
+    except redis.RedisError:
+        return False
+    return stored is not None and stored.decode() == text_fingerprint(text)
+
+
+def remember_embedded_text(namespace: str, record_id: str, text: str):
+    try:
+        _redis_bin.set(f"embedding_source:{namespace}:{record_id}", text_fingerprint(text))
+    except redis.RedisError:
+        pass
+
+
+def forget_embedded_texts(namespace: str):
+    """Drops the fingerprints for a namespace, e.g. after its vectors were wiped."""
+    try:
+        keys = list(_redis_bin.scan_iter(match=f"embedding_source:{namespace}:*", count=1000))
+        if keys:
+            _redis_bin.delete(*keys)
+    except redis.RedisError:
+        pass
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def hashing_embed(texts: List[str], dim: int) -> List[List[float]]:
+    """
+    Dependency-free local embedder (signed feature hashing of unigrams and bigrams).
+    Used when Pinecone inference is unavailable so single-node deployments and tests still get
+    meaningful lexical similarity instead of empty retrieval.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            matrix[row, h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+
+    # Sublinear term frequency, then L2 normalisation
+    matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).tolist()
@@ -1,19 +1,17 @@
+from typing import AsyncIterator
 import anthropic
-import asyncio
 from src.core.config import settings
+from src.services.llm.client_registry import get_llm_client, shared_http_client
 
-anthropic_client = None
-if hasattr(settings, 'ANTHROPIC_API_KEY') and settings.ANTHROPIC_API_KEY:
-    anthropic_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+def _build_client(api_key: str) -> anthropic.AsyncAnthropic:
+    return anthropic.AsyncAnthropic(api_key=api_key, http_client=shared_http_client("anthropic"))
 
-async def generate_message_anthropic(system_prompt: str, chat_history: list[dict], model_name: str = "claude-3-5-sonnet-latest", override_api_key: str = None) -> str:
+async def generate_message_anthropic(system_prompt: str, chat_history: list[dict], model_name: str = "claude-3-5-sonnet-latest", override_api_key: str = None, max_tokens: int = 200) -> str:
     key_to_use = override_api_key or getattr(settings, 'ANTHROPIC_API_KEY', None)
     if not key_to_use:
         return "Error: ANTHROPIC_API_KEY not configured and no override provided."
         
-    client = anthropic.AsyncAnthropic(api_key=key_to_use) if override_api_key else anthropic_client
-    if not client:
-        client = anthropic.AsyncAnthropic(api_key=key_to_use)
+    client = get_llm_client("anthropic", key_to_use, _build_client)
     
     messages = chat_history
     # If the first message isn't from the user due to edge cases, we might need to handle it, 
@@ -24,9 +22,26 @@ async def generate_message_anthropic(system_prompt: str, chat_history: list[dict
             model=model_name,
             system=system_prompt,
             messages=messages,
-            max_tokens=200,
+            max_tokens=max_tokens,
             temperature=0.7
         )
         return response.content[0].text
     except Exception as e:
         return f"Anthropic Error: {str(e)}"
+
+async def stream_message_anthropic(system_prompt: str, chat_history: list[dict], model_name: str = "claude-3-5-sonnet-latest", override_api_key: str = None, max_tokens: int = 200) -> AsyncIterator[str]:
+    key_to_use = override_api_key or getattr(settings, 'ANTHROPIC_API_KEY', None)
+    if not key_to_use:
+        raise RuntimeError("ANTHROPIC_API_KEY not configured and no override provided.")
+
+    client = get_llm_client("anthropic", key_to_use, _build_client)
+
+    async with client.messages.stream(
+        model=model_name,
+        system=system_prompt,
+        messages=chat_history,
+        max_tokens=max_tokens,
+        temperature=0.7
+    ) as stream:
+        async for text in stream.text_stream:
+            yield text
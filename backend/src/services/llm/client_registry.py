@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import importlib.util
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from src.core.config import settings
+
+# HTTP/2 needs `h2` (installed through httpx[http2] in requirements.txt); fall back to keep-alive HTTP/1.1 without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class SharedTransport(httpx.AsyncHTTPTransport):
+    """
+    A connection pool shared by every SDK client of a provider. Closing one SDK client
+    (e.g. on LRU eviction) must not tear down connections the other clients are using,
+    so `aclose` is a no-op; the pool is closed once by `ClientRegistry.aclose()`.
+    """
+
+    async def aclose(self) -> None:
+        pass
+
+    async def really_aclose(self) -> None:
+        await super().aclose()
+
+
+_transports: Dict[str, SharedTransport] = {}
+
+
+def shared_transport(provider: str) -> SharedTransport:
+    transport = _transports.get(provider)
+    if transport is None:
+        transport = _transports[provider] = SharedTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            retries=1,
+        )
+    return transport
+
+
+def shared_http_client(provider: str) -> httpx.AsyncClient:
+    """A thin httpx client per SDK instance, all multiplexed over the provider's shared transport."""
+    return httpx.AsyncClient(
+        transport=shared_transport(provider),
+        timeout=httpx.Timeout(settings.LLM_HTTP_TIMEOUT, connect=10.0),
+    )
+
+
+async def close_client(client: Any):
+    """Closes an SDK client whichever close methods its SDK exposes (google-genai keeps its async half under `.aio`)."""
+    aio = getattr(client, "aio", None)
+    if aio is not None and hasattr(aio, "aclose"):
+        await aio.aclose()
+
+    close = getattr(client, "close", None) or getattr(client, "aclose", None)
+    if close is not None:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+class ClientRegistry:
+    """
+    LRU of SDK clients keyed by (provider, sha256(api_key)). Raw keys are never held as dict keys.
+    Evicted clients are closed asynchronously on the running loop.
+    """
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._closing: set = set()
+
+    @staticmethod
+    def _key(provider: str, api_key: str) -> Tuple[str, str]:
+        return provider, hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def get(self, provider: str, api_key: str, factory: Callable[[str], Any]) -> Any:
+        key = self._key(provider, api_key)
+        client = self._clients.get(key)
+        if client is not None:
+            self._clients.move_to_end(key)
+            return client
+
+        client = self._clients[key] = factory(api_key)
+        while len(self._clients) > self.max_clients:
+            _, evicted = self._clients.popitem(last=False)
+            self._close_later(evicted)
+        return client
+
+    def _close_later(self, client: Any):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop to close on; the client's sockets belong to the shared transport anyway
+        task = loop.create_task(close_client(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def aclose(self):
+        clients, self._clients = list(self._clients.values()), OrderedDict()
+        for client in clients:
+            await close_client(client)
+        for transport in list(_transports.values()):
+            await transport.really_aclose()
+        _transports.clear()
+
+
+client_registry = ClientRegistry(settings.LLM_CLIENT_REGISTRY_SIZE)
+
+
+def get_llm_client(provider: str, api_key: str, factory: Callable[[str], Any]) -> Optional[Any]:
+    """Returns the pooled SDK client for this provider/key, building it with `factory(api_key)` on first use."""
+    if not api_key:
+        return None
+    return client_registry.get(provider, api_key, factory)
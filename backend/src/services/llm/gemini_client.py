@@ -1,32 +1,83 @@
+from typing import AsyncIterator
 from google import genai
+from google.genai import types
 import asyncio
 from src.core.config import settings
+from src.services.llm.client_registry import get_llm_client, shared_transport
 
-gemini_client = None
-if settings.GEMINI_API_KEY:
-    gemini_client = genai.Client(api_key=settings.GEMINI_API_KEY)
+_semaphore: asyncio.Semaphore = None
+_semaphore_loop: asyncio.AbstractEventLoop = None
 
-async def generate_message_gemini(system_prompt: str, chat_history: list[dict], model_name: str = "gemini-1.5-flash", override_api_key: str = None) -> str:
+def _build_client(api_key: str) -> genai.Client:
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(async_client_args={"transport": shared_transport("gemini")})
+    )
+
+def _concurrency_limit() -> asyncio.Semaphore:
+    # Bound in-flight Gemini requests per process; recreated if the process switches event loops
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+def build_contents(chat_history: list[dict]) -> list[types.Content]:
+    """
+    Maps our OpenAI-style history onto Gemini roles ("assistant" -> "model").
+    Consecutive turns from the same side are merged, and an empty history becomes a single
+    user turn, since Gemini expects the conversation to contain at least one user message.
+    """
+    contents: list[types.Content] = []
+    for msg in chat_history:
+        role = "model" if msg["role"] == "assistant" else "user"
+        if contents and contents[-1].role == role:
+            contents[-1].parts.append(types.Part(text=msg["content"]))
+        else:
+            contents.append(types.Content(role=role, parts=[types.Part(text=msg["content"])]))
+
+    if not contents or contents[-1].role == "model":
+        contents.append(types.Content(role="user", parts=[types.Part(text="Your reply:")]))
+    return contents
+
+async def generate_message_gemini(system_prompt: str, chat_history: list[dict], model_name: str = "gemini-1.5-flash", override_api_key: str = None, max_tokens: int = 200) -> str:
     key_to_use = override_api_key or settings.GEMINI_API_KEY
     if not key_to_use:
         return "Error: GEMINI_API_KEY not configured."
-        
-    client = genai.Client(api_key=key_to_use) if override_api_key else gemini_client
-    if not client:
-        client = genai.Client(api_key=key_to_use)
-    
-    prompt = f"System Instructions: {system_prompt}\n\nChat History:\n"
-    for msg in chat_history:
-        prompt += f"{msg['role']}: {msg['content']}\n"
-        
-    prompt += "\nYour reply:"
 
-    def _generate():
-        return client.models.generate_content(
+    client = get_llm_client("gemini", key_to_use, _build_client)
+
+    async with _concurrency_limit():
+        response = await client.aio.models.generate_content(
             model=model_name,
-            contents=prompt,
+            contents=build_contents(chat_history),
+            config=types.GenerateContentConfig(
+                system_instruction=system_prompt,
+                max_output_tokens=max_tokens,
+                temperature=0.7,
+            ),
         )
-        
-    response = await asyncio.to_thread(_generate)
     return response.text
 
+async def stream_message_gemini(system_prompt: str, chat_history: list[dict], model_name: str = "gemini-1.5-flash", override_api_key: str = None, max_tokens: int = 200) -> AsyncIterator[str]:
+    key_to_use = override_api_key or settings.GEMINI_API_KEY
+    if not key_to_use:
+        raise RuntimeError("GEMINI_API_KEY not configured.")
+
+    client = get_llm_client("gemini", key_to_use, _build_client)
+
+    # The semaphore slot is held until the stream is fully consumed
+    async with _concurrency_limit():
+        stream = await client.aio.models.generate_content_stream(
+            model=model_name,
+            contents=build_contents(chat_history),
+            config=types.GenerateContentConfig(
+                system_instruction=system_prompt,
+                max_output_tokens=max_tokens,
+                temperature=0.7,
+            ),
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
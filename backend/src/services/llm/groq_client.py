@@ -1,17 +1,18 @@
+from typing import AsyncIterator
 from groq import AsyncGroq
 from src.core.config import settings
+from src.services.llm.client_registry import get_llm_client, shared_http_client
 
-groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
+def _build_client(api_key: str) -> AsyncGroq:
+    return AsyncGroq(api_key=api_key, http_client=shared_http_client("groq"))
 
-async def generate_message_groq(system_prompt: str, chat_history: list[dict], model_name: str = "llama-3.1-8b-instant", override_api_key: str = None) -> str:
+async def generate_message_groq(system_prompt: str, chat_history: list[dict], model_name: str = "llama-3.1-8b-instant", override_api_key: str = None, max_tokens: int = 200) -> str:
     key_to_use = override_api_key or settings.GROQ_API_KEY
     if not key_to_use:
         return "Error: GROQ_API_KEY not configured and no override provided."
     
-    # Instantiate client per-request if an override is provided, otherwise use global
-    client = AsyncGroq(api_key=key_to_use) if override_api_key else groq_client
-    if not client:
-        client = AsyncGroq(api_key=key_to_use)
+    # One pooled client per distinct key (global or per-agent override), reused across calls
+    client = get_llm_client("groq", key_to_use, _build_client)
     
     messages = [{"role": "system", "content": system_prompt}] + chat_history
     
@@ -19,6 +20,26 @@ async def generate_message_groq(system_prompt: str, chat_history: list[dict], mo
         messages=messages,
         model=model_name, 
         temperature=0.7,
-        max_tokens=200
+        max_tokens=max_tokens
     )
     return response.choices[0].message.content
+
+async def stream_message_groq(system_prompt: str, chat_history: list[dict], model_name: str = "llama-3.1-8b-instant", override_api_key: str = None, max_tokens: int = 200) -> AsyncIterator[str]:
+    key_to_use = override_api_key or settings.GROQ_API_KEY
+    if not key_to_use:
+        raise RuntimeError("GROQ_API_KEY not configured and no override provided.")
+
+    client = get_llm_client("groq", key_to_use, _build_client)
+    messages = [{"role": "system", "content": system_prompt}] + chat_history
+
+    stream = await client.chat.completions.create(
+        messages=messages,
+        model=model_name,
+        temperature=0.7,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
@@ -1,19 +1,17 @@
+from typing import AsyncIterator
 import openai
-import asyncio
 from src.core.config import settings
+from src.services.llm.client_registry import get_llm_client, shared_http_client
 
-openai_client = None
-if hasattr(settings, 'OPENAI_API_KEY') and settings.OPENAI_API_KEY:
-    openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+def _build_client(api_key: str) -> openai.AsyncOpenAI:
+    return openai.AsyncOpenAI(api_key=api_key, http_client=shared_http_client("openai"))
 
-async def generate_message_openai(system_prompt: str, chat_history: list[dict], model_name: str = "gpt-4o-mini", override_api_key: str = None) -> str:
+async def generate_message_openai(system_prompt: str, chat_history: list[dict], model_name: str = "gpt-4o-mini", override_api_key: str = None, max_tokens: int = 200) -> str:
     key_to_use = override_api_key or getattr(settings, 'OPENAI_API_KEY', None)
     if not key_to_use:
         return "Error: OPENAI_API_KEY not configured and no override provided."
         
-    client = openai.AsyncOpenAI(api_key=key_to_use) if override_api_key else openai_client
-    if not client:
-        client = openai.AsyncOpenAI(api_key=key_to_use)
+    client = get_llm_client("openai", key_to_use, _build_client)
     
     # We map "assistant" -> "assistant" and "user" -> "user". OpenAI's Response API is recommended.
     # The documentation notes `client.responses.create` as the new path, but AsyncOpenAI doesn't always have it exposed seamlessly in all package versions.
@@ -26,9 +24,29 @@ async def generate_message_openai(system_prompt: str, chat_history: list[dict],
         response = await client.chat.completions.create(
             model=model_name,
             messages=messages,
-            max_tokens=200,
+            max_tokens=max_tokens,
             temperature=0.7
         )
         return response.choices[0].message.content
     except Exception as e:
         return f"OpenAI Error: {str(e)}"
+
+async def stream_message_openai(system_prompt: str, chat_history: list[dict], model_name: str = "gpt-4o-mini", override_api_key: str = None, max_tokens: int = 200) -> AsyncIterator[str]:
+    key_to_use = override_api_key or getattr(settings, 'OPENAI_API_KEY', None)
+    if not key_to_use:
+        raise RuntimeError("OPENAI_API_KEY not configured and no override provided.")
+
+    client = get_llm_client("openai", key_to_use, _build_client)
+    messages = [{"role": "developer", "content": system_prompt}] + chat_history
+
+    stream = await client.chat.completions.create(
+        model=model_name,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=0.7,
+        stream=True
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
@@ -1,33 +1,176 @@
 import asyncio
-from src.services.llm.groq_client import generate_message_groq
-from src.services.llm.gemini_client import generate_message_gemini
-from src.services.llm.openai_client import generate_message_openai
-from src.services.llm.anthropic_client import generate_message_anthropic
+import hashlib
+import time
+from enum import IntEnum
+from typing import AsyncIterator
 
-async def generate_reply(provider: str, system_prompt: str, chat_history: list[dict], model_name: str = None, override_api_key: str = None) -> str:
+import redis
+
+from src.core.config import settings
+from src.services.cache import redis_client
+from src.services.llm.groq_client import generate_message_groq, stream_message_groq
+from src.services.llm.gemini_client import generate_message_gemini, stream_message_gemini
+from src.services.llm.openai_client import generate_message_openai, stream_message_openai
+from src.services.llm.anthropic_client import generate_message_anthropic, stream_message_anthropic
+
+DEFAULT_MODELS = {
+    "groq": "llama-3.1-8b-instant",
+    "gemini": "gemini-2.5-flash-lite",
+    "openai": "gpt-4o-mini",
+    "anthropic": "claude-3-5-sonnet-latest",
+}
+
+PROVIDER_KEYS = {
+    "groq": lambda: settings.GROQ_API_KEY,
+    "gemini": lambda: settings.GEMINI_API_KEY,
+    "openai": lambda: settings.OPENAI_API_KEY,
+    "anthropic": lambda: settings.ANTHROPIC_API_KEY,
+}
+
+
+class Priority(IntEnum):
+    """Admission order when a provider bucket runs low. Lower value = more important."""
+    CHAT = 0
+    EVALUATION = 1
+    DISCOVERY = 2
+    CONSOLIDATION = 3
+
+
+class LLMDeferred(Exception):
+    """Raised instead of calling the provider when the rate limiter can't admit the request in time."""
+
+    def __init__(self, provider: str, model: str, priority: Priority, retry_after: float):
+        super().__init__(f"{provider}/{model} rate limited for {priority.name} work, retry in {retry_after:.1f}s")
+        self.provider = provider
+        self.model = model
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+# Non-streaming provider clients report failures as text rather than raising
+ERROR_REPLY_PREFIXES = ("Error:", "OpenAI Error:", "Anthropic Error:")
+
+
+def is_error_reply(reply: str) -> bool:
+    """True when `generate_reply` produced no text or a provider failure message instead of a real reply."""
+    return not reply or reply.startswith(ERROR_REPLY_PREFIXES)
+
+
+# Token bucket shared by every worker via Redis. A request of priority p may only take a token
+# if at least `reserve` tokens would remain afterwards, so lower-priority work backs off first
+# and the last tokens in the bucket are kept for live chat.
+# Returns {granted, milliseconds until this priority could be admitted}.
+_TOKEN_BUCKET = redis_client.register_script("""
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local now_parts = redis.call("TIME")
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local needed = 1 + reserve
+local granted = 0
+local wait_ms = 0
+if tokens >= needed then
+    tokens = tokens - 1
+    granted = 1
+else
+    wait_ms = math.ceil((needed - tokens) / rate * 1000)
+end
+
+redis.call("HSET", KEYS[1], "tokens", tokens, "ts", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {granted, wait_ms}
+""")
+
+
+def _bucket_key(provider: str, model: str, api_key: str) -> str:
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return f"llm_bucket:{provider}:{model}:{key_hash}"
+
+
+async def acquire_llm_slot(provider: str, model: str, api_key: str, priority: Priority):
+    """
+    Waits for a token from the (provider, model, api_key) bucket, up to the priority's max wait.
+    Raises LLMDeferred if that wait would be exceeded. Fails open if Redis is unreachable.
+    """
+    rate = settings.LLM_RATE_LIMITS.get(provider)
+    if not rate:
+        return
+
+    capacity = settings.LLM_RATE_BURST.get(provider, 5)
+    reserve = capacity * settings.LLM_PRIORITY_RESERVE_FRACTION * int(priority)
+    max_wait = settings.LLM_MAX_WAIT_SECONDS.get(priority.name.lower(), 0)
+    key = _bucket_key(provider, model, api_key)
+    deadline = time.monotonic() + max_wait
+
+    while True:
+        try:
+            granted, wait_ms = await _TOKEN_BUCKET(keys=[key], args=[rate, capacity, reserve])
+        except redis.RedisError:
+            return
+        if granted:
+            return
+
+        wait = wait_ms / 1000
+        if time.monotonic() + wait > deadline:
+            raise LLMDeferred(provider, model, priority, wait)
+        await asyncio.sleep(wait)
+
+
+async def generate_reply(provider: str, system_prompt: str, chat_history: list[dict], model_name: str = None, override_api_key: str = None, max_tokens: int = 200, priority: Priority = Priority.CHAT) -> str:
     """
     Router that delegates text generation requests to specific provider clients based on the agent's preferred configuration.
+    Every call is admitted through the shared per-provider/model/key rate limiter at the given priority.
     """
     provider_name = provider.lower() if provider else "groq"
-    
+    if provider_name not in DEFAULT_MODELS:
+        # Fallback
+        provider_name = "groq"
+    model = model_name or DEFAULT_MODELS[provider_name]
+
+    api_key = override_api_key or PROVIDER_KEYS[provider_name]()
+    await acquire_llm_slot(provider_name, model, api_key, priority)
+
     if provider_name == "groq":
-        model = model_name or "llama-3.1-8b-instant"
-        return await generate_message_groq(system_prompt, chat_history, model, override_api_key)
-        
+        return await generate_message_groq(system_prompt, chat_history, model, override_api_key, max_tokens)
+
     elif provider_name == "gemini":
-        model = model_name or "gemini-2.5-flash-lite"
-        return await generate_message_gemini(system_prompt, chat_history, model, override_api_key)
-        
+        return await generate_message_gemini(system_prompt, chat_history, model, override_api_key, max_tokens)
+
     elif provider_name == "openai":
-        model = model_name or "gpt-4o-mini"
-        return await generate_message_openai(system_prompt, chat_history, model, override_api_key)
-        
+        return await generate_message_openai(system_prompt, chat_history, model, override_api_key, max_tokens)
+
     elif provider_name == "anthropic":
-        model = model_name or "claude-3-5-sonnet-latest"
-        return await generate_message_anthropic(system_prompt, chat_history, model, override_api_key)
-        
-    else:
-        # Fallback
-        model = model_name or "llama-3.1-8b-instant"
-        return await generate_message_groq(system_prompt, chat_history, model, override_api_key)
+        return await generate_message_anthropic(system_prompt, chat_history, model, override_api_key, max_tokens)
+
+
+STREAMERS = {
+    "groq": stream_message_groq,
+    "gemini": stream_message_gemini,
+    "openai": stream_message_openai,
+    "anthropic": stream_message_anthropic,
+}
+
+
+async def generate_reply_stream(provider: str, system_prompt: str, chat_history: list[dict], model_name: str = None, override_api_key: str = None, max_tokens: int = 200, priority: Priority = Priority.CHAT) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of `generate_reply`: yields text deltas as the provider produces them.
+    Admission through the rate limiter happens before the first delta, so LLMDeferred is raised
+    on the first iteration rather than mid-stream. Provider failures raise instead of yielding
+    error text, so a failed stream never ends up saved as a reply.
+    """
+    provider_name = provider.lower() if provider else "groq"
+    if provider_name not in DEFAULT_MODELS:
+        provider_name = "groq"
+    model = model_name or DEFAULT_MODELS[provider_name]
+
+    api_key = override_api_key or PROVIDER_KEYS[provider_name]()
+    await acquire_llm_slot(provider_name, model, api_key, priority)
 
+    async for delta in STREAMERS[provider_name](system_prompt, chat_history, model, override_api_key, max_tokens):
+        yield delta
@@ -0,0 +1,336 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+import redis
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.core.config import settings
+from src.models.domain import Agent, Like, Match, Message
+from src.services.cache import redis_client, redis_sync_client
+from src.services.topics import tag_topics, topic_names
+
+# Platform metrics are maintained incrementally at write time so /metrics/platform never scans
+# messages or matches. All counters live in Redis:
+#   metrics:platform              hash of scalar counters (matches, messages, questions, sums, status:<s>)
+#   metrics:conversation_lengths  hash of message count -> number of matches with that many messages
+#   metrics:topics                hash of topic -> messages mentioning it
+#   metrics:pairings              hash of "persona1 x persona2" -> matches that got past PAIRING_MIN_MESSAGES
+#   agent_stats:<agent id>        per-agent counters behind /agents/{id}/stats and /metrics/agent/{id}
+#                                 (AGENT_STAT_FIELDS; interest_sum is summed over the agent's matches)
+# Updates are best effort: a Redis hiccup loses increments, and `rebuild_platform_rollup` /
+# `rebuild_agent_stats` recompute everything from the database.
+# Increments create the hashes on their own, so a separate marker records that a rebuild has seeded
+# them; the first read on a deployment (or after Redis lost its data) without one rebuilds first.
+
+PLATFORM_KEY = "metrics:platform"
+LENGTHS_KEY = "metrics:conversation_lengths"
+TOPICS_KEY = "metrics:topics"
+PAIRINGS_KEY = "metrics:pairings"
+ROLLUP_KEYS = (PLATFORM_KEY, LENGTHS_KEY, TOPICS_KEY, PAIRINGS_KEY)
+
+PLATFORM_SEEDED_KEY = "metrics:platform_seeded"
+AGENT_STATS_SEEDED_KEY = "metrics:agent_stats_seeded"  # Outside AGENT_STATS_PREFIX, so the stale-key sweep skips it
+PAIRING_MIN_MESSAGES = 5  # A pairing counts as successful once the conversation goes past this
+
+AGENT_STATS_PREFIX = "agent_stats:"
+AGENT_STAT_FIELDS = ("matches", "active_matches", "ghosted_matches", "interest_sum",
+                     "likes_sent", "likes_received", "messages_sent")
+# Match statuses that have their own per-agent counter
+_AGENT_STATUS_FIELDS = {"active": "active_matches", "ghosted": "ghosted_matches"}
+
+
+def agent_stats_key(agent_id: str) -> str:
+    return f"{AGENT_STATS_PREFIX}{agent_id}"
+
+
+def pairing_label(persona1: str, persona2: str) -> str:
+    return f"{persona1} x {persona2}"
+
+
+def _apply(build):
+    try:
+        pipe = redis_sync_client.pipeline(transaction=False)
+        build(pipe)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Metrics rollup update failed (run the rebuild to resync): {e}")
+
+
+def record_like(sender_id: str, receiver_id: str):
+    def build(pipe):
+        pipe.hincrby(agent_stats_key(sender_id), "likes_sent", 1)
+        pipe.hincrby(agent_stats_key(receiver_id), "likes_received", 1)
+    _apply(build)
+
+
+def record_match_created(interest_level: Optional[float] = 1.0, status: str = "active", agent_ids: Iterable[str] = ()):
+    """A new match starts with zero messages; opening messages are recorded with `record_message`."""
+    def build(pipe):
+        pipe.hincrby(PLATFORM_KEY, "matches", 1)
+        pipe.hincrby(PLATFORM_KEY, f"status:{status}", 1)
+        pipe.hincrbyfloat(PLATFORM_KEY, "interest_sum", interest_level or 0.0)
+        pipe.hincrby(LENGTHS_KEY, "0", 1)
+        for agent_id in agent_ids:
+            key = agent_stats_key(agent_id)
+            pipe.hincrby(key, "matches", 1)
+            if status in _AGENT_STATUS_FIELDS:
+                pipe.hincrby(key, _AGENT_STATUS_FIELDS[status], 1)
+            pipe.hincrbyfloat(key, "interest_sum", interest_level or 0.0)
+    _apply(build)
+
+
+def record_message(content: str, match_length: int, topics: Iterable[str] = (), response_seconds: Optional[float] = None,
+                   pairing: Optional[str] = None, sender_id: Optional[str] = None):
+    """
+    Records one persisted message. `match_length` is the match's message count including this one,
+    `topics` its tags (Message.topics), `response_seconds` the gap since the other agent's previous
+    message (None if there was none).
+    """
+    def build(pipe):
+        pipe.hincrby(PLATFORM_KEY, "messages", 1)
+        if sender_id:
+            pipe.hincrby(agent_stats_key(sender_id), "messages_sent", 1)
+        if "?" in (content or ""):
+            pipe.hincrby(PLATFORM_KEY, "questions", 1)
+        if response_seconds is not None:
+            pipe.hincrbyfloat(PLATFORM_KEY, "response_time_sum", response_seconds)
+            pipe.hincrby(PLATFORM_KEY, "response_time_count", 1)
+        for topic in topics:
+            pipe.hincrby(TOPICS_KEY, topic, 1)
+
+        # Move the match from one conversation-length bucket to the next
+        pipe.hincrby(LENGTHS_KEY, str(match_length - 1), -1)
+        pipe.hincrby(LENGTHS_KEY, str(match_length), 1)
+        if pairing and match_length == PAIRING_MIN_MESSAGES + 1:
+            pipe.hincrby(PAIRINGS_KEY, pairing, 1)
+    _apply(build)
+
+
+def record_status_change(old_status: str, new_status: str, agent_ids: Iterable[str] = ()):
+    if old_status == new_status:
+        return
+    def build(pipe):
+        pipe.hincrby(PLATFORM_KEY, f"status:{old_status}", -1)
+        pipe.hincrby(PLATFORM_KEY, f"status:{new_status}", 1)
+        for agent_id in agent_ids:
+            if old_status in _AGENT_STATUS_FIELDS:
+                pipe.hincrby(agent_stats_key(agent_id), _AGENT_STATUS_FIELDS[old_status], -1)
+            if new_status in _AGENT_STATUS_FIELDS:
+                pipe.hincrby(agent_stats_key(agent_id), _AGENT_STATUS_FIELDS[new_status], 1)
+    _apply(build)
+
+
+def record_interest_change(old_level: Optional[float], new_level: Optional[float], agent_ids: Iterable[str] = ()):
+    delta = (new_level or 0.0) - (old_level or 0.0)
+    if not delta:
+        return
+    def build(pipe):
+        pipe.hincrbyfloat(PLATFORM_KEY, "interest_sum", delta)
+        for agent_id in agent_ids:
+            pipe.hincrbyfloat(agent_stats_key(agent_id), "interest_sum", delta)
+    _apply(build)
+
+
+def _median_from_histogram(histogram: Dict[str, str]) -> int:
+    # Same element the old sorted-list lookup picked: counts[len(counts) // 2]
+    buckets = sorted((int(length), int(n)) for length, n in histogram.items() if int(n) > 0)
+    total = sum(n for _, n in buckets)
+    if not total:
+        return 0
+    index = total // 2
+    for length, n in buckets:
+        if index < n:
+            return length
+        index -= n
+    return buckets[-1][0]
+
+
+async def _ensure_seeded(session: AsyncSession, marker: str, rebuild):
+    """
+    Runs `rebuild(session)` unless `marker` is set. One caller rebuilds under a lock; concurrent
+    readers wait briefly for it and then read whatever is there.
+    """
+    if await redis_client.exists(marker):
+        return
+    lock = f"{marker}:lock"
+    if not await redis_client.set(lock, "1", nx=True, ex=300):
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            if await redis_client.exists(marker):
+                return
+        return
+    try:
+        await rebuild(session)
+    finally:
+        await redis_client.delete(lock)
+
+
+async def ensure_platform_rollup(session: AsyncSession):
+    """Seeds the platform rollup from the database if no rebuild has run yet."""
+    await _ensure_seeded(session, PLATFORM_SEEDED_KEY, rebuild_platform_rollup)
+
+
+async def ensure_agent_stats(session: AsyncSession):
+    """Seeds every agent_stats hash from the database if no rebuild has run yet."""
+    await _ensure_seeded(session, AGENT_STATS_SEEDED_KEY, rebuild_agent_stats)
+
+
+def read_platform_metrics() -> Dict:
+    """Builds the /metrics/platform payload from the rollup hashes (four HGETALLs)."""
+    pipe = redis_sync_client.pipeline(transaction=False)
+    for key in ROLLUP_KEYS:
+        pipe.hgetall(key)
+    platform, lengths, topics, pairings = pipe.execute()
+
+    matches = int(platform.get("matches", 0))
+    messages = int(platform.get("messages", 0))
+    response_count = int(platform.get("response_time_count", 0))
+
+    return {
+        "engagement": {
+            "avg_messages_per_match": round(messages / matches, 2) if matches else 0.0,
+            "median_conversation_length": _median_from_histogram(lengths),
+            "ghost_rate": round(int(platform.get("status:ghosted", 0)) / (matches or 1), 4)
+        },
+        "quality": {
+            "avg_response_time_seconds": round(float(platform.get("response_time_sum", 0)) / response_count, 2) if response_count else 0.0,
+            "question_asking_rate": round(int(platform.get("questions", 0)) / (messages or 1), 4),
+            "avg_interest_level": round(float(platform.get("interest_sum", 0)) / matches, 4) if matches else 0.0
+        },
+        "diversity": {
+            "conversation_topics_distribution": {t: int(topics.get(t, 0)) for t in topic_names()},
+            "personality_pairing_success": {label: int(n) for label, n in pairings.items() if int(n) > 0}
+        }
+    }
+
+
+def read_agent_stats(agent_id: str) -> Dict[str, float]:
+    """The agent's counters (one HGETALL); zero for anything not recorded yet."""
+    raw = redis_sync_client.hgetall(agent_stats_key(agent_id))
+    return {field: float(raw.get(field, 0.0)) if field == "interest_sum" else int(raw.get(field, 0))
+            for field in AGENT_STAT_FIELDS}
+
+
+async def rebuild_platform_rollup(session: AsyncSession):
+    """
+    Recomputes every rollup hash from the database and swaps them in atomically.
+    Messages are streamed in SWEEP_CHUNK_SIZE chunks; increments that land while the rebuild runs are lost.
+    """
+    platform: Dict[str, float] = {"matches": 0, "messages": 0, "questions": 0, "interest_sum": 0.0,
+                                  "response_time_sum": 0.0, "response_time_count": 0}
+    lengths: Dict[str, int] = {}
+    topics: Dict[str, int] = {}
+    pairings: Dict[str, int] = {}
+
+    status_res = await session.execute(
+        select(Match.status, func.count(Match.id), func.coalesce(func.sum(Match.interest_level), 0.0)).group_by(Match.status)
+    )
+    for status, count, interest_sum in status_res.all():
+        platform["matches"] += count
+        platform["interest_sum"] += float(interest_sum)
+        platform[f"status:{status}"] = count
+
+    # Conversation lengths and persona pairings, aggregated in SQL over per-match message counts
+    counts = select(Message.match_id, func.count(Message.id).label("n")).group_by(Message.match_id).subquery()
+    Agent1 = aliased(Agent)
+    Agent2 = aliased(Agent)
+    n = func.coalesce(counts.c.n, 0)
+    length_res = await session.execute(
+        select(n.label("n"), Agent1.persona.label("p1"), Agent2.persona.label("p2"), func.count(Match.id).label("c"))
+        .select_from(Match)
+        .outerjoin(counts, counts.c.match_id == Match.id)
+        .outerjoin(Agent1, Match.agent1_id == Agent1.id)
+        .outerjoin(Agent2, Match.agent2_id == Agent2.id)
+        .group_by(n, Agent1.persona, Agent2.persona)
+    )
+    for row in length_res.all():
+        lengths[str(row.n)] = lengths.get(str(row.n), 0) + row.c
+        if row.n > PAIRING_MIN_MESSAGES and row.p1 and row.p2:
+            label = pairing_label(row.p1, row.p2)
+            pairings[label] = pairings.get(label, 0) + row.c
+
+    # Per-message counters; LAG gives the previous message in the same match for response times
+    window = {"partition_by": Message.match_id, "order_by": (Message.created_at, Message.id)}
+    stream = await session.stream(
+        select(
+            Message.content,
+            Message.topics,
+            Message.sender_agent_id,
+            Message.created_at,
+            func.lag(Message.sender_agent_id).over(**window).label("prev_sender"),
+            func.lag(Message.created_at).over(**window).label("prev_created_at"),
+        ).execution_options(yield_per=settings.SWEEP_CHUNK_SIZE)
+    )
+    async for chunk in stream.partitions():
+        for row in chunk:
+            platform["messages"] += 1
+            if "?" in (row.content or ""):
+                platform["questions"] += 1
+            for topic in (row.topics if row.topics is not None else tag_topics(row.content)):
+                topics[topic] = topics.get(topic, 0) + 1
+            if row.prev_sender and row.prev_sender != row.sender_agent_id and row.prev_created_at and row.created_at:
+                platform["response_time_sum"] += (row.created_at - row.prev_created_at).total_seconds()
+                platform["response_time_count"] += 1
+
+    # Build under temporary names, then rename over the live keys in one transaction
+    pipe = redis_sync_client.pipeline(transaction=True)
+    for key, values in zip(ROLLUP_KEYS, (platform, lengths, topics, pairings)):
+        tmp = f"{key}:rebuild"
+        pipe.delete(tmp)
+        if values:
+            pipe.hset(tmp, mapping=values)
+            pipe.rename(tmp, key)
+        else:
+            pipe.delete(key)
+    pipe.set(PLATFORM_SEEDED_KEY, "1")
+    pipe.execute()
+    print(f"Rebuilt platform metrics rollup: {platform['matches']} matches, {platform['messages']} messages")
+
+
+async def rebuild_agent_stats(session: AsyncSession):
+    """
+    Recomputes every agent_stats hash with a handful of GROUP BY queries and replaces the live ones.
+    Increments that land while the rebuild runs are lost.
+    """
+    stats: Dict[str, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(AGENT_STAT_FIELDS, 0))
+
+    for side in (Match.agent1_id, Match.agent2_id):
+        res = await session.execute(
+            select(side, Match.status, func.count(Match.id), func.coalesce(func.sum(Match.interest_level), 0.0))
+            .where(side.is_not(None))
+            .group_by(side, Match.status)
+        )
+        for agent_id, status, count, interest_sum in res.all():
+            stats[agent_id]["matches"] += count
+            stats[agent_id]["interest_sum"] += float(interest_sum)
+            if status in _AGENT_STATUS_FIELDS:
+                stats[agent_id][_AGENT_STATUS_FIELDS[status]] += count
+
+    for column, field in ((Like.sender_id, "likes_sent"), (Like.receiver_id, "likes_received"), (Message.sender_agent_id, "messages_sent")):
+        res = await session.execute(select(column, func.count()).where(column.is_not(None)).group_by(column))
+        for agent_id, count in res.all():
+            stats[agent_id][field] = count
+
+    stale = [key for key in redis_sync_client.scan_iter(match=f"{AGENT_STATS_PREFIX}*", count=1000)
+             if key[len(AGENT_STATS_PREFIX):] not in stats]
+    pipe = redis_sync_client.pipeline(transaction=True)
+    for agent_id, values in stats.items():
+        pipe.delete(agent_stats_key(agent_id))
+        pipe.hset(agent_stats_key(agent_id), mapping=values)
+    if stale:
+        pipe.delete(*stale)
+    pipe.set(AGENT_STATS_SEEDED_KEY, "1")
+    pipe.execute()
+    print(f"Rebuilt per-agent stats for {len(stats)} agents")
+
+
+def replace_topic_counters(counts: Dict[str, int]):
+    """Swaps in freshly computed topic counters, e.g. after re-tagging history with an edited lexicon."""
+    pipe = redis_sync_client.pipeline(transaction=True)
+    pipe.delete(TOPICS_KEY)
+    if counts:
+        pipe.hset(TOPICS_KEY, mapping=counts)
+    pipe.execute()
@@ -0,0 +1,77 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.models.domain import Message
+
+# Messages are tagged once, when they are written, by a single compiled regex over every keyword in
+# TOPIC_LEXICON. Each keyword is its own named group (kw0, kw1, ...) so one pass over the text tells us
+# which topics it hits. Matching is case-insensitive and substring-based, like the ILIKE scans it replaces.
+
+_compiled: Optional[Tuple[Dict[str, List[str]], "re.Pattern", Dict[str, str]]] = None
+
+
+def _matcher() -> Tuple["re.Pattern", Dict[str, str]]:
+    """Compiles (and caches) the combined pattern for the current lexicon. Returns (pattern, group -> topic)."""
+    global _compiled
+    lexicon = settings.TOPIC_LEXICON
+    if _compiled is None or _compiled[0] is not lexicon:
+        keywords = sorted(
+            {(kw.lower(), topic) for topic, kws in lexicon.items() for kw in kws if kw},
+            key=lambda pair: (-len(pair[0]), pair[0])  # Longest first, so "movie night" wins over "movie"
+        )
+        group_topic = {f"kw{i}": topic for i, (_, topic) in enumerate(keywords)}
+        pattern = "|".join(f"(?P<kw{i}>{re.escape(kw)})" for i, (kw, _) in enumerate(keywords)) or r"(?!x)x"
+        _compiled = (lexicon, re.compile(pattern, re.IGNORECASE), group_topic)
+    return _compiled[1], _compiled[2]
+
+
+def tag_topics(content: Optional[str]) -> List[str]:
+    """Topics mentioned in `content`, in lexicon order, each at most once."""
+    if not content:
+        return []
+    pattern, group_topic = _matcher()
+    found = {group_topic[m.lastgroup] for m in pattern.finditer(content)}
+    return [topic for topic in settings.TOPIC_LEXICON if topic in found]
+
+
+def topic_names() -> List[str]:
+    return list(settings.TOPIC_LEXICON)
+
+
+async def retag_messages(session: AsyncSession) -> Dict[str, int]:
+    """
+    Re-tags every message with the current lexicon, SWEEP_CHUNK_SIZE rows at a time (keyset on id),
+    committing per chunk. Returns the per-topic message counts, for rebuilding the topic counters.
+    """
+    counts = {topic: 0 for topic in topic_names()}
+    table = Message.__table__
+    stmt = update(table).where(table.c.id == bindparam("b_id")).values(topics=bindparam("b_topics"))
+    last_id = ""
+    while True:
+        res = await session.execute(
+            select(Message.id, Message.content, Message.topics)
+            .where(Message.id > last_id)
+            .order_by(Message.id)
+            .limit(settings.SWEEP_CHUNK_SIZE)
+        )
+        rows = res.all()
+        if not rows:
+            break
+
+        changed = []
+        for row in rows:
+            tags = tag_topics(row.content)
+            for topic in tags:
+                counts[topic] += 1
+            if tags != (row.topics or []):
+                changed.append({"b_id": row.id, "b_topics": tags})
+        if changed:
+            await session.execute(stmt, changed)
+            await session.commit()
+        last_id = rows[-1].id
+
+    return counts
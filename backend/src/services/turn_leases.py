@@ -0,0 +1,43 @@
+import uuid
+from typing import Dict, Iterable, Optional
+
+from src.services.cache import redis_sync_client
+
+# Compare-and-delete so a worker can only release the lease it was handed.
+# A stale task (whose lease already expired and was re-acquired) must not free someone else's turn.
+_RELEASE_SCRIPT = redis_sync_client.register_script("""
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+""")
+
+def _lease_key(match_id: str) -> str:
+    return f"chat_turn_lease:{match_id}"
+
+def acquire_turn_lease(match_id: str, ttl_seconds: int) -> Optional[str]:
+    """Claims the single pending-turn slot for a match. Returns the lease token, or None if a turn is already pending."""
+    token = uuid.uuid4().hex
+    if redis_sync_client.set(_lease_key(match_id), token, nx=True, ex=ttl_seconds):
+        return token
+    return None
+
+def acquire_turn_leases(match_ids: Iterable[str], ttl_seconds: int) -> Dict[str, str]:
+    """Pipelined `acquire_turn_lease` for many matches. Returns {match_id: token} for the leases that were granted."""
+    match_ids = list(match_ids)
+    if not match_ids:
+        return {}
+
+    tokens = [uuid.uuid4().hex for _ in match_ids]
+    pipe = redis_sync_client.pipeline(transaction=False)
+    for match_id, token in zip(match_ids, tokens):
+        pipe.set(_lease_key(match_id), token, nx=True, ex=ttl_seconds)
+    results = pipe.execute()
+
+    return {match_id: token for match_id, token, ok in zip(match_ids, tokens, results) if ok}
+
+def release_turn_lease(match_id: str, token: Optional[str]):
+    """Frees the match's pending-turn slot if `token` still owns it. Expired leases are left alone."""
+    if not token:
+        return
+    _RELEASE_SCRIPT(keys=[_lease_key(match_id)], args=[token])
@@ -1,107 +1,174 @@
-from pinecone import Pinecone, ServerlessSpec
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
 from src.core.config import settings
+from src.services.embeddings import embedding_cache, forget_embedded_texts, has_embedded_text, hashing_embed, remember_embedded_text
+from src.services.vector_stores import get_vector_store
+from src.services.vector_stores.pinecone_store import get_pinecone_client
 
-pc = Pinecone(api_key=settings.PINECONE_API_KEY) if settings.PINECONE_API_KEY else None
+EMBEDDING_MODEL = "llama-text-embed-v2"
 
-def init_pinecone():
-    if not pc:
-        print("Warning: PINECONE_API_KEY not set.")
-        return None
-
-    index_name = "llama-text-embed-v2"
-    if index_name not in pc.list_indexes().names():
-        print(f"Creating Pinecone index '{index_name}'...")
-        pc.create_index_for_model(
-            name=index_name,
-            cloud="aws",
-            region=settings.PINECONE_ENV,
-            embed={
-                "model": "llama-text-embed-v2",
-                "field_map": {"text": "text"}
-            }
-        )
-    return pc.Index(index_name)
-
-index = init_pinecone()
+pc = get_pinecone_client()
+if not pc:
+    print("Warning: PINECONE_API_KEY not set. Using the local hashing embedder.")
 
 def clear_pinecone_agents_namespace():
-    if index:
-        try:
-            print("Deleting all records in 'agents' namespace in Pinecone...")
-            index.delete(delete_all=True, namespace="agents")
-        except Exception as e:
-            print(f"Failed to clear Pinecone namespace: {e}")
+    try:
+        print("Deleting all records in 'agents' namespace...")
+        get_vector_store("agents").delete(delete_all=True)
+        forget_embedded_texts("agents")
+    except Exception as e:
+        print(f"Failed to clear vector namespace: {e}")
 
-def upsert_agent_embedding(agent_id: str, text: str):
-    if index:
-        index.upsert_records(
-            namespace="agents",
-            records=[{"_id": agent_id, "text": text}]
+def embed_texts(texts: list[str], input_type: str) -> list[list[float]]:
+    """
+    Embeds texts through the two-tier embedding cache; only uncached texts reach the embedder.
+    Pinecone inference when configured, otherwise the local hashing embedder.
+    """
+    if not pc:
+        model = f"local-hashing-{settings.EMBEDDING_DIM}"
+        return embedding_cache.get_or_embed(
+            model, input_type, texts, lambda missing: hashing_embed(missing, settings.EMBEDDING_DIM)
+        )
+
+    def _embed(missing: list[str]) -> list[list[float]]:
+        embeddings = pc.inference.embed(
+            model=EMBEDDING_MODEL,
+            inputs=missing,
+            parameters={"input_type": input_type, "truncate": "END"}
         )
+        return [e.values for e in embeddings]
+
+    return embedding_cache.get_or_embed(EMBEDDING_MODEL, input_type, texts, _embed)
 
 def query_compatible_agents(embedding: list[float], top_k: int = 5):
     # This might not be used anymore if we only query by ID or text string
-    if not index:
-        return []
-    result = index.query(vector=embedding, top_k=top_k, include_metadata=False, namespace="agents")
-    return [match['id'] for match in result['matches']]
+    matches = get_vector_store("agents").query(vector=embedding, top_k=top_k)
+    return [match['id'] for match in matches]
 
 def query_compatible_agents_by_id(agent_id: str, top_k: int = 5):
-    if not index:
-        return []
-    result = index.query(id=agent_id, top_k=top_k, include_metadata=False, namespace="agents")
-    return [match['id'] for match in result['matches'] if match['id'] != agent_id]
+    matches = get_vector_store("agents").query(id=agent_id, top_k=top_k)
+    return [match['id'] for match in matches if match['id'] != agent_id]
 
-async def upsert_memory_embedding(memory_id: str, agent_id: str, text: str):
-    if not index or not pc: return
-    
-    import asyncio
-    
-    def _embed_and_upsert():
-        embeddings = pc.inference.embed(
-            model="llama-text-embed-v2",
-            inputs=[text],
-            parameters={"input_type": "passage", "truncate": "END"}
-        )
-        
-        index.upsert(
-            namespace="agent_memories",
-            vectors=[{
-                "id": memory_id,
-                "values": embeddings[0].values,
-                "metadata": {"agent_id": agent_id, "text": text}
-            }]
-        )
-        
-    await asyncio.to_thread(_embed_and_upsert)
+@dataclass
+class PendingVector:
+    record_id: str
+    text: str
+    metadata: Dict[str, Any]
+    future: asyncio.Future = field(repr=False)
+
+class EmbeddingBatchWriter:
+    """
+    Coalesces concurrent upserts into one embedding call and one vector store upsert per batch.
+    A batch is flushed when it reaches `max_batch` records or `linger_ms` after its first record,
+    whichever comes first. `submit` returns a future carrying the batch's outcome without waiting for
+    it: request handlers leave it to finish in the background so concurrent requests share a batch,
+    and callers with several records submit them all before awaiting any.
+    """
+
+    def __init__(self, namespace: str, max_batch: int, linger_ms: float, skip_unchanged: bool = False):
+        self.namespace = namespace
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1000
+        self.skip_unchanged = skip_unchanged
+        self._pending: List[PendingVector] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: set = set()
+
+    def submit(self, record_id: str, text: str, metadata: Optional[Dict[str, Any]] = None, flush: bool = False) -> asyncio.Future:
+        """
+        Queues a record for the next batch. `flush` sends the batch right away instead of waiting out
+        the linger, for callers that have nothing else to add (a one-off write in a worker task).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Failures are logged once per batch in _write; this only marks them retrieved for unawaited futures
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append(PendingVector(record_id, text, metadata or {}, future))
+
+        if flush or len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._write(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _write(self, batch: List[PendingVector]):
+        try:
+            await asyncio.to_thread(self._embed_and_upsert, batch)
+        except Exception as e:
+            print(f"Failed to upsert {len(batch)} '{self.namespace}' embedding(s): {e}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_result(None)
+
+    def _embed_and_upsert(self, batch: List[PendingVector]):
+        # Last write wins if the same record was submitted twice within one batch
+        latest = {item.record_id: item for item in batch}
+        records = list(latest.values())
+        if self.skip_unchanged:
+            records = [r for r in records if not has_embedded_text(self.namespace, r.record_id, r.text)]
+        if not records:
+            return
+
+        values = embed_texts([r.text for r in records], "passage")
+        get_vector_store(self.namespace).upsert([
+            {"id": r.record_id, "values": v, "metadata": {**r.metadata, "text": r.text}}
+            for r, v in zip(records, values)
+        ])
+
+        if self.skip_unchanged:
+            for r in records:
+                remember_embedded_text(self.namespace, r.record_id, r.text)
+
+agent_writer = EmbeddingBatchWriter(
+    "agents", settings.VECTOR_BATCH_MAX_SIZE, settings.VECTOR_BATCH_LINGER_MS, skip_unchanged=True
+)
+memory_writer = EmbeddingBatchWriter(
+    "agent_memories", settings.VECTOR_BATCH_MAX_SIZE, settings.VECTOR_BATCH_LINGER_MS
+)
+
+def upsert_agent_embedding(agent_id: str, text: str, flush: bool = False) -> asyncio.Future:
+    # Profiles whose text is unchanged since their last upsert are skipped by the writer
+    return agent_writer.submit(agent_id, text, flush=flush)
+
+def upsert_memory_embedding(memory_id: str, agent_id: str, text: str, flush: bool = False) -> asyncio.Future:
+    return memory_writer.submit(memory_id, text, {"agent_id": agent_id}, flush=flush)
 
 async def query_relevant_memories(agent_id: str, query_text: str, top_k: int = 5):
-    if not index or not pc: return []
-    
-    import asyncio
-    
     def _embed_and_query():
-        embeddings = pc.inference.embed(
-            model="llama-text-embed-v2",
-            inputs=[query_text],
-            parameters={"input_type": "query", "truncate": "END"}
-        )
+        values = embed_texts([query_text], "query")[0]
         
-        return index.query(
-            namespace="agent_memories",
-            vector=embeddings[0].values,
+        return get_vector_store("agent_memories").query(
+            vector=values,
             top_k=top_k,
             include_metadata=True,
             filter={"agent_id": {"$eq": agent_id}}
         )
         
-    result = await asyncio.to_thread(_embed_and_query)
+    matches = await asyncio.to_thread(_embed_and_query)
     
-    return [match['metadata']['text'] for match in result.get('matches', []) if 'metadata' in match and 'text' in match['metadata']]
+    return [match['metadata']['text'] for match in matches if 'text' in match['metadata']]
 
 def delete_memory_embeddings(memory_ids: list):
-    if index and memory_ids:
+    if memory_ids:
         try:
-            index.delete(ids=memory_ids, namespace="agent_memories")
+            get_vector_store("agent_memories").delete(ids=memory_ids)
         except Exception as e:
             print(f"Failed to delete memory embeddings: {e}")
@@ -0,0 +1,67 @@
+# Pluggable vector index backends. vector_db.py resolves one store per namespace through get_vector_store().
+import atexit
+import threading
+from typing import Dict
+
+from src.core.config import settings
+from src.services.vector_stores.base import VectorMatch, VectorRecord, VectorStore
+
+_stores: Dict[str, VectorStore] = {}
+_lock = threading.Lock()
+
+
+def backend_for(namespace: str) -> str:
+    """Per-namespace override first, then the global default (Pinecone when a key is configured)."""
+    backend = settings.VECTOR_STORE_NAMESPACE_BACKENDS.get(namespace) or settings.VECTOR_STORE_BACKEND
+    if not backend:
+        backend = "pinecone" if settings.PINECONE_API_KEY else "numpy"
+    if backend == "pinecone" and not settings.PINECONE_API_KEY:
+        print(f"Warning: PINECONE_API_KEY not set, using the numpy vector store for '{namespace}'.")
+        backend = "numpy"
+    return backend
+
+
+def _create_store(namespace: str) -> VectorStore:
+    backend = backend_for(namespace)
+    if backend == "pinecone":
+        from src.services.vector_stores.pinecone_store import PineconeVectorStore, get_pinecone_index
+        return PineconeVectorStore(get_pinecone_index(), namespace)
+    if backend == "numpy":
+        from src.services.vector_stores import numpy_store
+        snapshot_dir = settings.VECTOR_STORE_SNAPSHOT_DIR
+        if not snapshot_dir:
+            print(f"WARNING: numpy vector store for '{namespace}' has no VECTOR_STORE_SNAPSHOT_DIR; vectors live only in "
+                  "this process and are NOT shared with the API, other workers or restarts. Set a snapshot dir or PINECONE_API_KEY.")
+        elif numpy_store.fcntl is None:
+            print(f"WARNING: numpy vector store for '{namespace}': file locks are unavailable on this platform, so only "
+                  f"one process may write {snapshot_dir}. Use Pinecone for multi-process deployments.")
+        else:
+            print(f"Using the local numpy vector store for '{namespace}' (snapshots in {snapshot_dir}, shared between "
+                  "processes on this node via file locks; not shared across hosts).")
+        return numpy_store.NumpyVectorStore(
+            namespace, settings.EMBEDDING_DIM,
+            snapshot_dir=snapshot_dir,
+            snapshot_interval=settings.VECTOR_STORE_SNAPSHOT_INTERVAL_SECONDS
+        )
+    raise ValueError(f"Unknown vector store backend '{backend}' for namespace '{namespace}'")
+
+
+def get_vector_store(namespace: str) -> VectorStore:
+    store = _stores.get(namespace)
+    if store is None:
+        with _lock:
+            store = _stores.get(namespace)
+            if store is None:
+                store = _stores[namespace] = _create_store(namespace)
+    return store
+
+
+def flush_vector_stores():
+    """Persists any in-process stores that support snapshots."""
+    for store in list(_stores.values()):
+        flush = getattr(store, "flush", None)
+        if flush:
+            flush()
+
+
+atexit.register(flush_vector_stores)
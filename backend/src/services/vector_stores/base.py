@@ -0,0 +1,46 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, TypedDict
+
+
+class VectorRecord(TypedDict, total=False):
+    id: str
+    values: List[float]
+    metadata: Dict[str, Any]
+
+
+class VectorMatch(TypedDict):
+    id: str
+    score: float
+    metadata: Dict[str, Any]
+
+
+class VectorStore(ABC):
+    """
+    Minimal vector index contract shared by every backend. One instance serves one namespace.
+    Methods are synchronous; async callers run them through `asyncio.to_thread`.
+
+    Filters use the Pinecone metadata filter subset: {"field": value}, {"field": {"$eq": value}}
+    and {"field": {"$in": [values]}}, with multiple fields ANDed together.
+    """
+
+    namespace: str
+
+    @abstractmethod
+    def upsert(self, records: List[VectorRecord]) -> None:
+        ...
+
+    @abstractmethod
+    def query(
+        self,
+        vector: Optional[List[float]] = None,
+        id: Optional[str] = None,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        include_metadata: bool = False,
+    ) -> List[VectorMatch]:
+        """Nearest neighbours by cosine similarity to `vector`, or to the stored vector of record `id`."""
+        ...
+
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False) -> None:
+        ...
@@ -0,0 +1,330 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, snapshots are only safe with a single process
+    fcntl = None
+
+from src.services.vector_stores.base import VectorMatch, VectorRecord, VectorStore
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector index: one contiguous float32 matrix of L2-normalised rows per namespace,
+    so cosine top-k is a single matrix-vector product plus `argpartition`.
+
+    With `snapshot_dir` set, the matrix is persisted as `<namespace>.npy` (+ `<namespace>.json`
+    for ids/metadata) and memory-mapped on load; it is copied into RAM on the first write.
+    The snapshot is shared by every process on the node (API, Celery children, beat): each write
+    is merged into it under an exclusive lock on `<namespace>.lock` (reload the latest snapshot,
+    replay this process's unsaved upserts/deletes on top, write, rename), and readers reload it
+    whenever another process has replaced it, replaying their own unsaved writes. Every merge
+    rewrites the whole snapshot, so writes are coalesced: the first write after a quiet
+    `snapshot_interval` is merged right away, the rest by a background timer at most once per
+    interval. Other processes see a write within about that interval; 0 merges every write.
+    """
+
+    def __init__(self, namespace: str, dim: int, snapshot_dir: Optional[str] = None, snapshot_interval: float = 2.0):
+        self.namespace = namespace
+        self.dim = dim
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.RLock()
+
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._metadata: List[Dict[str, Any]] = []
+        self._postings: Dict[str, Dict[Any, List[int]]] = {}  # field -> value -> rows, rebuilt lazily
+
+        # Writes not yet merged into the shared snapshot, replayed after every reload
+        self._pending_upserts: Dict[str, Tuple[np.ndarray, Dict[str, Any]]] = {}
+        self._pending_deletes: Set[str] = set()
+        self._pending_clear = False
+
+        self._last_save = 0.0
+        self._flush_timer: Optional[threading.Timer] = None
+        self._flush_timer_pid: Optional[int] = None
+        self._loaded_version: Optional[Tuple[int, int]] = None
+        self._matrix_path = self._meta_path = self._lock_path = None
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            self._matrix_path = os.path.join(snapshot_dir, f"{namespace}.npy")
+            self._meta_path = os.path.join(snapshot_dir, f"{namespace}.json")
+            self._lock_path = os.path.join(snapshot_dir, f"{namespace}.lock")
+            with self._file_lock(exclusive=False):
+                self._load_snapshot()
+
+    # --- persistence -------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _snapshot_version(self) -> Optional[Tuple[int, int]]:
+        # The metadata file is renamed into place last, so a new inode/mtime means a new snapshot
+        try:
+            stat = os.stat(self._meta_path)
+        except (OSError, TypeError):
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load_snapshot(self):
+        """Replaces the in-memory index with the snapshot on disk. Call with the file lock held."""
+        version = self._snapshot_version()
+        if version is None or not os.path.exists(self._matrix_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(self._matrix_path, mmap_mode="r")
+        if matrix.shape[1] != self.dim:
+            print(f"Ignoring vector snapshot for '{self.namespace}': dimension {matrix.shape[1]} != {self.dim}")
+            return
+
+        self._matrix = matrix
+        self._size = matrix.shape[0]
+        self._ids = meta["ids"]
+        self._metadata = meta["metadata"]
+        self._rows = {record_id: row for row, record_id in enumerate(self._ids)}
+        self._postings = {}
+        self._loaded_version = version
+
+    def _replay_pending(self):
+        if self._pending_clear:
+            self._apply_delete(delete_all=True)
+        if self._pending_deletes:
+            self._apply_delete(ids=list(self._pending_deletes))
+        if self._pending_upserts:
+            ids = list(self._pending_upserts)
+            self._apply_upsert(ids, np.stack([self._pending_upserts[i][0] for i in ids]), [self._pending_upserts[i][1] for i in ids])
+
+    def _has_pending(self) -> bool:
+        return bool(self._pending_upserts or self._pending_deletes or self._pending_clear)
+
+    def _refresh_if_stale(self):
+        """Picks up snapshots written by other processes, keeping this process's unsaved writes on top."""
+        if not self._matrix_path or self._snapshot_version() == self._loaded_version:
+            return
+        with self._file_lock(exclusive=False):
+            self._load_snapshot()
+        self._replay_pending()
+
+    def flush(self):
+        """Merges this process's unsaved writes into the shared snapshot (atomically, via temp files + rename)."""
+        with self._lock:
+            if self._flush_timer is not None and self._flush_timer_pid == os.getpid():
+                self._flush_timer.cancel()
+            self._flush_timer = None
+            if not self._matrix_path or not self._has_pending():
+                return
+            with self._file_lock(exclusive=True):
+                if self._snapshot_version() != self._loaded_version:
+                    # Another process saved since we loaded: merge onto its snapshot instead of overwriting it
+                    self._load_snapshot()
+                    self._replay_pending()
+
+                tmp_matrix = self._matrix_path + f".{os.getpid()}.tmp.npy"
+                tmp_meta = self._meta_path + f".{os.getpid()}.tmp"
+                np.save(tmp_matrix, np.ascontiguousarray(self._matrix[:self._size]))
+                with open(tmp_meta, "w", encoding="utf-8") as f:
+                    json.dump({"ids": self._ids, "metadata": self._metadata}, f)
+                os.replace(tmp_matrix, self._matrix_path)
+                os.replace(tmp_meta, self._meta_path)
+                self._loaded_version = self._snapshot_version()
+
+            self._pending_upserts = {}
+            self._pending_deletes = set()
+            self._pending_clear = False
+            self._last_save = time.monotonic()
+
+    def _maybe_flush(self):
+        """Merges now if the last merge is older than `snapshot_interval`, otherwise leaves it to the flush timer."""
+        if not self._matrix_path:
+            return
+        wait = self.snapshot_interval - (time.monotonic() - self._last_save)
+        if wait <= 0:
+            self.flush()
+            return
+        # A timer inherited across fork() has no thread in this process
+        if self._flush_timer is not None and self._flush_timer_pid == os.getpid():
+            return
+        self._flush_timer = threading.Timer(wait, self._flush_from_timer)
+        self._flush_timer.daemon = True
+        self._flush_timer_pid = os.getpid()
+        self._flush_timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._flush_timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            # Writes stay pending and are retried by the next write or the shutdown flush
+            print(f"Vector snapshot flush failed for '{self.namespace}': {e}")
+
+    # --- storage -----------------------------------------------------------
+
+    def _ensure_writable(self, extra_rows: int):
+        needed = self._size + extra_rows
+        if isinstance(self._matrix, np.memmap) or needed > self._matrix.shape[0]:
+            capacity = max(needed, 2 * self._matrix.shape[0], 64)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _field_postings(self, field: str) -> Dict[Any, List[int]]:
+        postings = self._postings.get(field)
+        if postings is None:
+            postings = {}
+            for row in range(self._size):
+                value = self._metadata[row].get(field)
+                try:
+                    postings.setdefault(value, []).append(row)
+                except TypeError:
+                    continue  # Unhashable metadata values can't be filtered on
+            self._postings[field] = postings
+        return postings
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        rows = None
+        for field, condition in filter.items():
+            postings = self._field_postings(field)
+            conditions = condition if isinstance(condition, dict) else {"$eq": condition}
+            for op, operand in conditions.items():
+                if op == "$eq":
+                    matched = set(postings.get(operand, ()))
+                elif op == "$in":
+                    matched = {row for value in operand for row in postings.get(value, ())}
+                else:
+                    raise ValueError(f"Unsupported filter operator for numpy vector store: {op}")
+                rows = matched if rows is None else rows & matched
+        return np.fromiter(sorted(rows or ()), dtype=np.int64)
+
+    def _apply_upsert(self, ids: List[str], vectors: np.ndarray, metadata: List[Dict[str, Any]]):
+        self._ensure_writable(len(ids))
+        for record_id, vector, meta in zip(ids, vectors, metadata):
+            row = self._rows.get(record_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._rows[record_id] = row
+                self._ids.append(record_id)
+                self._metadata.append({})
+            self._matrix[row] = vector
+            self._metadata[row] = dict(meta)
+        self._postings = {}
+
+    def upsert(self, records: List[VectorRecord]) -> None:
+        if not records:
+            return
+        with self._lock:
+            self._refresh_if_stale()
+            ids = [r["id"] for r in records]
+            vectors = self._normalise(np.asarray([r["values"] for r in records], dtype=np.float32))
+            metadata = [dict(r.get("metadata") or {}) for r in records]
+            self._apply_upsert(ids, vectors, metadata)
+
+            if self._matrix_path:
+                for record_id, vector, meta in zip(ids, vectors, metadata):
+                    self._pending_upserts[record_id] = (vector, meta)
+                    self._pending_deletes.discard(record_id)
+                self._maybe_flush()
+
+    def query(
+        self,
+        vector: Optional[List[float]] = None,
+        id: Optional[str] = None,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        include_metadata: bool = False,
+    ) -> List[VectorMatch]:
+        with self._lock:
+            self._refresh_if_stale()
+            if self._size == 0:
+                return []
+
+            if vector is not None:
+                q = self._normalise(np.asarray(vector, dtype=np.float32))
+            else:
+                row = self._rows.get(id)
+                if row is None:
+                    return []
+                q = np.asarray(self._matrix[row])
+
+            if filter:
+                candidates = self._filter_rows(filter)
+                if candidates.size == 0:
+                    return []
+                scores = self._matrix[candidates] @ q
+            else:
+                candidates = None
+                scores = self._matrix[:self._size] @ q
+
+            k = min(top_k, scores.shape[0])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            results: List[VectorMatch] = []
+            for i in top:
+                row = int(candidates[i]) if candidates is not None else int(i)
+                results.append({
+                    "id": self._ids[row],
+                    "score": float(scores[i]),
+                    "metadata": dict(self._metadata[row]) if include_metadata else {},
+                })
+            return results
+
+    def _apply_delete(self, ids: Optional[List[str]] = None, delete_all: bool = False):
+        if delete_all:
+            keep = []
+        else:
+            drop = {self._rows[i] for i in ids or () if i in self._rows}
+            if not drop:
+                return
+            keep = [row for row in range(self._size) if row not in drop]
+
+        self._matrix = np.array(self._matrix[keep], dtype=np.float32).reshape(len(keep), self.dim)
+        self._ids = [self._ids[row] for row in keep]
+        self._metadata = [self._metadata[row] for row in keep]
+        self._rows = {record_id: row for row, record_id in enumerate(self._ids)}
+        self._size = len(keep)
+        self._postings = {}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False) -> None:
+        if not delete_all and not ids:
+            return
+        with self._lock:
+            self._refresh_if_stale()
+            self._apply_delete(ids, delete_all)
+
+            if self._matrix_path:
+                if delete_all:
+                    self._pending_clear = True
+                    self._pending_deletes = set()
+                    self._pending_upserts = {}
+                else:
+                    self._pending_deletes.update(ids)
+                    for record_id in ids:
+                        self._pending_upserts.pop(record_id, None)
+                self._maybe_flush()
@@ -0,0 +1,78 @@
+from typing import Any, Dict, List, Optional
+
+from pinecone import Pinecone
+
+from src.core.config import settings
+from src.services.vector_stores.base import VectorMatch, VectorRecord, VectorStore
+
+INDEX_NAME = "llama-text-embed-v2"
+
+_pinecone_client: Optional[Pinecone] = None
+_index = None
+
+
+def get_pinecone_client() -> Optional[Pinecone]:
+    global _pinecone_client
+    if _pinecone_client is None and settings.PINECONE_API_KEY:
+        _pinecone_client = Pinecone(api_key=settings.PINECONE_API_KEY)
+    return _pinecone_client
+
+
+def get_pinecone_index():
+    """Connects to (and on first use creates) the shared Pinecone index."""
+    global _index
+    if _index is None:
+        pc = get_pinecone_client()
+        if INDEX_NAME not in pc.list_indexes().names():
+            print(f"Creating Pinecone index '{INDEX_NAME}'...")
+            pc.create_index_for_model(
+                name=INDEX_NAME,
+                cloud="aws",
+                region=settings.PINECONE_ENV,
+                embed={
+                    "model": "llama-text-embed-v2",
+                    "field_map": {"text": "text"}
+                }
+            )
+        _index = pc.Index(INDEX_NAME)
+    return _index
+
+
+class PineconeVectorStore(VectorStore):
+    """Adapter over a namespace of the shared Pinecone index."""
+
+    def __init__(self, index, namespace: str):
+        self.index = index
+        self.namespace = namespace
+
+    def upsert(self, records: List[VectorRecord]) -> None:
+        if records:
+            self.index.upsert(namespace=self.namespace, vectors=list(records))
+
+    def query(
+        self,
+        vector: Optional[List[float]] = None,
+        id: Optional[str] = None,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        include_metadata: bool = False,
+    ) -> List[VectorMatch]:
+        kwargs: Dict[str, Any] = {"namespace": self.namespace, "top_k": top_k, "include_metadata": include_metadata}
+        if vector is not None:
+            kwargs["vector"] = vector
+        else:
+            kwargs["id"] = id
+        if filter:
+            kwargs["filter"] = filter
+
+        result = self.index.query(**kwargs)
+        return [
+            {"id": m["id"], "score": m.get("score", 0.0), "metadata": m.get("metadata") or {}}
+            for m in result.get("matches", [])
+        ]
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False) -> None:
+        if delete_all:
+            self.index.delete(delete_all=True, namespace=self.namespace)
+        elif ids:
+            self.index.delete(ids=ids, namespace=self.namespace)
@@ -12,6 +12,7 @@ celery_app = Celery(
         "src.worker.tasks.memory",
         "src.worker.tasks.discovery",
         "src.worker.tasks.evaluation",
+        "src.worker.tasks.metrics",
         "src.worker.scheduler"
     ]
 )
@@ -36,6 +37,11 @@ celery_app.conf.beat_schedule = {
     "sweep-memories-nightly": {
         "task": "src.worker.scheduler.sweep_memories",
         "schedule": crontab(hour=1, minute=0),
+    },
+    # Nightly: resync the platform metrics rollups with the database to correct any drift
+    "rebuild-metrics-rollup-nightly": {
+        "task": "src.worker.tasks.metrics.rebuild_metrics_rollup_task",
+        "schedule": crontab(hour=2, minute=0),
     }
 }
 celery_app.conf.timezone = 'UTC'
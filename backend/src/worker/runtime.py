@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any, Awaitable, Optional, TypeVar
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+
+from src.core.config import settings
+from src.services.agent_cache import start_invalidation_listener
+from src.services.llm.client_registry import client_registry
+from src.services.vector_stores import flush_vector_stores
+
+T = TypeVar("T")
+
+# One event loop and one pooled engine per Celery worker process.
+# They are created after the prefork pool forks (worker_process_init) so that
+# no sockets are ever shared between parent and child processes.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_engine: Optional[AsyncEngine] = None
+_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def _create_engine() -> AsyncEngine:
+    return create_async_engine(
+        settings.DATABASE_URL,
+        pool_size=settings.WORKER_DB_POOL_SIZE,
+        max_overflow=settings.WORKER_DB_MAX_OVERFLOW,
+        pool_timeout=settings.WORKER_DB_POOL_TIMEOUT,
+        pool_recycle=settings.WORKER_DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+def init_worker_runtime():
+    """Creates the process-wide event loop, engine and sessionmaker if they don't exist yet."""
+    global _loop, _engine, _sessionmaker
+
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+
+    if _engine is None:
+        _engine = _create_engine()
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False, class_=AsyncSession)
+
+    start_invalidation_listener()
+
+
+def shutdown_worker_runtime():
+    """Closes pooled LLM clients, disposes the pooled engine and closes the loop. Safe to call more than once."""
+    global _loop, _engine, _sessionmaker
+
+    if _loop is not None and not _loop.is_closed():
+        _loop.run_until_complete(client_registry.aclose())
+    if _engine is not None and _loop is not None and not _loop.is_closed():
+        _loop.run_until_complete(_engine.dispose())
+    _engine = None
+    _sessionmaker = None
+
+    if _loop is not None and not _loop.is_closed():
+        _loop.run_until_complete(_loop.shutdown_asyncgens())
+        _loop.close()
+    _loop = None
+
+
+def run_async(coro: Awaitable[T]) -> T:
+    """
+    Runs a coroutine to completion on the worker's persistent event loop.
+    Replaces `asyncio.run()` in task bodies so connections in the pool survive between tasks.
+    Lazily initializes the runtime for processes that never received worker_process_init
+    (beat, `task_always_eager`, scripts).
+    """
+    if _loop is None or _loop.is_closed():
+        init_worker_runtime()
+    return _loop.run_until_complete(coro)
+
+
+def worker_session() -> AsyncSession:
+    """Returns a new AsyncSession bound to the process-wide pooled engine."""
+    if _sessionmaker is None:
+        init_worker_runtime()
+    return _sessionmaker()
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs: Any):
+    init_worker_runtime()
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs: Any):
+    shutdown_worker_runtime()
+    # Prefork children may exit without running atexit hooks
+    flush_vector_stores()
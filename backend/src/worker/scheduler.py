@@ -1,60 +1,95 @@
-import asyncio
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import pool
+from sqlalchemy import select, func, and_
 
 from src.core.config import settings
 from src.models.domain import Agent, Match, Like, Message, AgentMemory
 from src.worker.celery_app import celery_app
-from src.worker.tasks.chat import generate_next_message_task
+from src.worker.runtime import run_async, worker_session
+from src.worker.tasks.chat import schedule_turns
 from src.worker.tasks.discovery import agent_discover_task, agent_evaluate_likes_task
-from src.worker.tasks.evaluation import agent_evaluate_matches_task
+from src.worker.tasks.evaluation import agent_evaluate_matches_task, needs_evaluation
 from src.worker.tasks.memory import consolidate_memories_task
 
-
-engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
-LocalSession = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
 @celery_app.task
 def sweep_active_matches():
     """
     Periodic task (e.g. every 1 minute)
     Finds all active matches and decides if it's someone's turn to speak or evaluate.
     """
-    asyncio.run(_async_sweep_active_matches())
+    run_async(_async_sweep_active_matches())
+
+def _active_match_state_stmt():
+    """
+    One statement that returns, for every active match, its message count plus the sender
+    and timestamp of the latest message. Window functions over `messages` replace the
+    per-match count / latest-message lookups.
+    """
+    ranked = (
+        select(
+            Message.match_id,
+            Message.sender_agent_id,
+            Message.created_at,
+            func.count(Message.id).over(partition_by=Message.match_id).label("msg_count"),
+            func.row_number().over(
+                partition_by=Message.match_id,
+                order_by=(Message.created_at.desc(), Message.id.desc())
+            ).label("rn"),
+        )
+        .join(Match, Match.id == Message.match_id)
+        .where(Match.status == "active")
+        .subquery()
+    )
+
+    return (
+        select(
+            Match.id,
+            Match.agent1_id,
+            Match.agent2_id,
+            Match.agent1_last_evaluated_count,
+            Match.agent2_last_evaluated_count,
+            func.coalesce(ranked.c.msg_count, 0).label("msg_count"),
+            ranked.c.sender_agent_id.label("last_sender_id"),
+            ranked.c.created_at.label("last_message_at"),
+        )
+        .outerjoin(ranked, and_(ranked.c.match_id == Match.id, ranked.c.rn == 1))
+        .where(Match.status == "active")
+        .order_by(Match.id)
+    )
 
 async def _async_sweep_active_matches():
-    async with LocalSession() as session:
-        # Get all active matches
-        matches_res = await session.execute(select(Match).where(Match.status == "active"))
-        matches = matches_res.scalars().all()
-        
-        for match in matches:
-            # Check length to see if we should trigger evaluation or just chat
-            msgs_res = await session.execute(select(func.count(Message.id)).where(Message.match_id == match.id))
-            msg_count = msgs_res.scalar()
-            
-            # If 4 or more messages, let's trigger an evaluation
-            if msg_count > 0 and msg_count % 4 == 0:
-                agent_evaluate_matches_task.apply_async(args=[match.agent1_id])
-                agent_evaluate_matches_task.apply_async(args=[match.agent2_id])
-            
-            # Check whose turn it is
-            last_msg_res = await session.execute(
-                select(Message).where(Message.match_id == match.id).order_by(Message.created_at.desc()).limit(1)
-            )
-            last_msg = last_msg_res.scalar_one_or_none()
-            
-            if last_msg:
-                # If agent 1 sent it, agent 2 should reply
-                next_speaker_id = match.agent2_id if last_msg.sender_agent_id == match.agent1_id else match.agent1_id
-            else:
-                # No messages yet -> the person who "ACCEPTED" the like should speak first?
-                # Actually typically the sender of a like speaks first if they left a comment.
-                # If no comment, the matcher speaks first.
-                next_speaker_id = match.agent2_id 
-                
-            generate_next_message_task.apply_async(args=[match.id, next_speaker_id])
+    async with worker_session() as session:
+        # Stream the per-match state in chunks so memory stays flat however many matches are active
+        result = await session.stream(
+            _active_match_state_stmt().execution_options(yield_per=settings.SWEEP_CHUNK_SIZE)
+        )
+
+        # One evaluation task per agent per sweep; it scores all of that agent's matches with new turns
+        to_evaluate = set()
+
+        async for chunk in result.partitions():
+            turns = []
+            for row in chunk:
+                # Evaluate only matches with new turns since the agent's last evaluation
+                if needs_evaluation(row.msg_count, row.agent1_last_evaluated_count):
+                    to_evaluate.add(row.agent1_id)
+                if needs_evaluation(row.msg_count, row.agent2_last_evaluated_count):
+                    to_evaluate.add(row.agent2_id)
+
+                if row.last_sender_id:
+                    # If agent 1 sent it, agent 2 should reply
+                    next_speaker_id = row.agent2_id if row.last_sender_id == row.agent1_id else row.agent1_id
+                else:
+                    # No messages yet -> the person who "ACCEPTED" the like should speak first?
+                    # Actually typically the sender of a like speaks first if they left a comment.
+                    # If no comment, the matcher speaks first.
+                    next_speaker_id = row.agent2_id
+
+                turns.append((row.id, next_speaker_id))
+
+            # Matches that already have a pending turn are rejected by the lease registry
+            schedule_turns(turns)
+
+        for agent_id in to_evaluate:
+            agent_evaluate_matches_task.apply_async(args=[agent_id])
 
 
 @celery_app.task
@@ -63,10 +98,10 @@ def sweep_likes():
     Periodic task (e.g. every 2 minutes)
     Finds agents with pending likes and queues them for evaluation.
     """
-    asyncio.run(_async_sweep_likes())
+    run_async(_async_sweep_likes())
 
 async def _async_sweep_likes():
-    async with LocalSession() as session:
+    async with worker_session() as session:
         # Find distinct receivers who have pending likes
         receivers_res = await session.execute(
             select(Like.receiver_id).where(Like.status == "pending").distinct()
@@ -83,10 +118,10 @@ def sweep_discovery():
     Periodic task (e.g. every 2 minutes)
     Sweeps agents to trigger discovery mode if they have fewer than max_matches.
     """
-    asyncio.run(_async_sweep_discovery())
+    run_async(_async_sweep_discovery())
 
 async def _async_sweep_discovery():
-    async with LocalSession() as session:
+    async with worker_session() as session:
         agents_res = await session.execute(select(Agent.id))
         agent_ids = agents_res.scalars().all()
         for a_id in agent_ids:
@@ -100,10 +135,10 @@ def sweep_memories():
     Nightly task
     Consolidates agent memory rows into their personality profile.
     """
-    asyncio.run(_async_sweep_memories())
+    run_async(_async_sweep_memories())
 
 async def _async_sweep_memories():
-    async with LocalSession() as session:
+    async with worker_session() as session:
         # Find agents who have 5 or more granular memories
         res = await session.execute(
             select(AgentMemory.agent_id)
@@ -1,76 +1,182 @@
-import asyncio
+import time
+
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import pool
 
 from src.core.config import settings
-from src.models.domain import Match, Message, Agent
-from src.services.llm_service import generate_reply
+from src.models.domain import Match, Message, generate_uuid
+from src.services.llm_service import LLMDeferred, Priority, generate_reply_stream, is_error_reply
 from src.services.cache import publish_event
+from src.services import metrics_rollup
+from src.services.agent_cache import AgentProfile, get_agent_profiles
+from src.services.activity_feed import message_activity, record_activity
+from src.services.topics import tag_topics
+from src.services.chat_context import claim_summary_slot, load_chat_context, needs_summary, refresh_match_summary, release_summary_slot
+from src.services.turn_leases import acquire_turn_lease, acquire_turn_leases, release_turn_lease
 from src.worker.celery_app import celery_app
+from src.worker.runtime import run_async, worker_session
 
 @celery_app.task
-def generate_next_message_task(match_id: str, sender_agent_id: str):
-    asyncio.run(_async_generate_next_message(match_id, sender_agent_id))
+def generate_next_message_task(match_id: str, sender_agent_id: str, lease_token: str = None):
+    countdown = settings.CHAT_TURN_INTERVAL_SECONDS
+    try:
+        next_speaker_id = run_async(_async_generate_next_message(match_id, sender_agent_id))
+    except LLMDeferred as e:
+        # Provider is saturated: retry the same turn once the limiter expects capacity
+        print(f"[{match_id}] Chat turn deferred: {e}")
+        next_speaker_id, countdown = sender_agent_id, max(1, int(e.retry_after))
+    finally:
+        # Free the match's turn slot before chaining, otherwise our own follow-up would be rejected
+        release_turn_lease(match_id, lease_token)
+
+    if next_speaker_id:
+        schedule_turn(match_id, next_speaker_id, countdown=countdown)
+
+@celery_app.task
+def summarize_match_task(match_id: str):
+    try:
+        run_async(_async_summarize_match(match_id))
+    except LLMDeferred as e:
+        # The next chat turn re-enqueues us; until then the verbatim tail just grows a little
+        print(f"[{match_id}] Summary refresh deferred: {e}")
+    finally:
+        release_summary_slot(match_id)
+
+async def _async_summarize_match(match_id: str):
+    async with worker_session() as session:
+        # Long matches that predate summaries catch up a bounded fold at a time
+        while await refresh_match_summary(session, match_id):
+            pass
+
+def schedule_turn(match_id: str, sender_agent_id: str, countdown: int = 0) -> bool:
+    """
+    Enqueues a chat turn unless one is already pending for this match.
+    Returns False when the enqueue was rejected as a duplicate.
+    """
+    token = acquire_turn_lease(match_id, countdown + settings.CHAT_TURN_LEASE_SECONDS)
+    if not token:
+        return False
+
+    try:
+        generate_next_message_task.apply_async(args=[match_id, sender_agent_id, token], countdown=countdown)
+    except Exception:
+        release_turn_lease(match_id, token)
+        raise
+    return True
+
+def schedule_turns(turns: list[tuple[str, str]], countdown: int = 0) -> int:
+    """Batch variant of `schedule_turn` for sweeps: one pipelined Redis round trip for all (match_id, sender_agent_id) pairs."""
+    speakers = dict(turns)
+    granted = acquire_turn_leases(speakers.keys(), countdown + settings.CHAT_TURN_LEASE_SECONDS)
+
+    for match_id, token in granted.items():
+        try:
+            generate_next_message_task.apply_async(args=[match_id, speakers[match_id], token], countdown=countdown)
+        except Exception:
+            release_turn_lease(match_id, token)
+            raise
+    return len(granted)
+
+async def _stream_reply(match_id: str, message_id: str, agent: AgentProfile, deltas) -> str:
+    """
+    Consumes a reply stream, publishing `message_delta` events as text arrives. Deltas are coalesced
+    to one event per CHAT_STREAM_FLUSH_MS; each event carries both the new text and the content so far,
+    so a viewer that misses one still renders the right bubble. Returns the full reply.
+    """
+    content = ""
+    pending = ""
+    seq = 0
+    last_flush = 0.0
+
+    def flush():
+        nonlocal pending, seq, last_flush
+        seq += 1
+        publish_event("agentic_hinge_events", "message_delta", {
+            "id": message_id,
+            "match_id": match_id,
+            "sender_id": agent.id,
+            "sender_agent_id": agent.id,
+            "agent_name": agent.name,
+            "seq": seq,
+            "delta": pending,
+            "content": content,
+            "streaming": True
+        })
+        pending = ""
+        last_flush = time.monotonic()
 
-async def _async_generate_next_message(match_id: str, sender_agent_id: str):
-    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
-    LocalSession = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    
     try:
-        async with LocalSession() as session:
-            match_stmt = select(Match).where(Match.id == match_id)
-            result = await session.execute(match_stmt)
-            match = result.scalar_one_or_none()
-            if not match: return
-
-            agent_stmt = select(Agent).where(Agent.id == sender_agent_id)
-            agent_res = await session.execute(agent_stmt)
-            agent = agent_res.scalar_one_or_none()
-            if not agent: return
-
-            other_agent_id = match.agent1_id if match.agent2_id == sender_agent_id else match.agent2_id
-            other_agent_stmt = select(Agent).where(Agent.id == other_agent_id)
-            other_agent_res = await session.execute(other_agent_stmt)
-            other_agent = other_agent_res.scalar_one_or_none()
-            
-            msgs_stmt = select(Message).where(Message.match_id == match_id).order_by(Message.created_at)
-            msgs_res = await session.execute(msgs_stmt)
-            messages = msgs_res.scalars().all()
-
-            # Enforce Turn-Taking: If the last message was sent by this agent, don't reply again.
-            if messages and messages[-1].sender_agent_id == agent.id:
-                print(f"[{agent.name}] Skipping reply. It's the other agent's turn.")
-                return
-
-            # LLM-Driven Pacing
-            match.messages_count = len(messages)
-            
-            pacing = agent.conversation_style.get("pacing", "normal") if agent.conversation_style else "normal"
-            
-            if pacing == "fast":
-                stage_req = "Pacing: FAST. You hate small talk. Move quickly to deep topics, intense flirting, or making plans. Escalate immediately. Be forward and open if you are into them"
-            elif pacing == "slow":
-                stage_req = "Pacing: SLOW. You are very guarded or unbothered. Give short answers, take a long time to warm up. Do not escalate quickly. Take your time understand"
-            else:
-                stage_req = "Pacing: NORMAL. Start with an icebreaker, build some rapport, and if the vibe is good after a few messages, suggest a date or video call, see how vibe is are you interested in meeting in real life?"
-
-            await session.commit()
-
-            chat_history = []
-            for msg in messages:
-                role = "assistant" if msg.sender_agent_id == agent.id else "user"
-                chat_history.append({"role": role, "content": msg.content})
-
-            provider = agent.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
-            model_name = agent.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
-            
-            # Additional style quirks from personality setup
-            style_req = "NEVER use single cryptic phrases unless your persona strictly dictates it."
-            if agent.conversation_style:
-                style_req = agent.conversation_style.get("guideline", style_req)
-
-            rules_prompt = f"""
+        async for delta in deltas:
+            content += delta
+            pending += delta
+            if (time.monotonic() - last_flush) * 1000 >= settings.CHAT_STREAM_FLUSH_MS:
+                flush()
+    except Exception:
+        if seq:
+            # Let viewers drop the half-written bubble; the turn will be retried or abandoned
+            publish_event("agentic_hinge_events", "message_delta", {"id": message_id, "match_id": match_id, "aborted": True})
+        raise
+
+    if is_error_reply(content):
+        if seq:
+            publish_event("agentic_hinge_events", "message_delta", {"id": message_id, "match_id": match_id, "aborted": True})
+        raise RuntimeError(f"{agent.name} produced no usable reply: {content!r}")
+
+    if pending:
+        flush()
+    return content
+
+async def _async_generate_next_message(match_id: str, sender_agent_id: str):
+    """Writes one chat turn. Returns the agent whose turn is next, or None if the chain should stop."""
+    async with worker_session() as session:
+        match_stmt = select(Match).where(Match.id == match_id)
+        result = await session.execute(match_stmt)
+        match = result.scalar_one_or_none()
+        if not match: return
+
+        # Both profiles through the read-through cache (usually no database round trip)
+        other_agent_id = match.agent1_id if match.agent2_id == sender_agent_id else match.agent2_id
+        profiles = await get_agent_profiles(session, [sender_agent_id, other_agent_id])
+        agent = profiles.get(sender_agent_id)
+        if not agent: return
+        other_agent = profiles.get(other_agent_id)
+        
+        # Bounded prompt: the match summary plus the recent, not yet summarized messages
+        context = await load_chat_context(session, match)
+        messages = context.messages
+
+        # Enforce Turn-Taking: If the last message was sent by this agent, don't reply again.
+        if messages and messages[-1].sender_agent_id == agent.id:
+            print(f"[{agent.name}] Skipping reply. It's the other agent's turn.")
+            return
+
+        # LLM-Driven Pacing
+        match.messages_count = context.total
+        
+        pacing = agent.conversation_style.get("pacing", "normal") if agent.conversation_style else "normal"
+        
+        if pacing == "fast":
+            stage_req = "Pacing: FAST. You hate small talk. Move quickly to deep topics, intense flirting, or making plans. Escalate immediately. Be forward and open if you are into them"
+        elif pacing == "slow":
+            stage_req = "Pacing: SLOW. You are very guarded or unbothered. Give short answers, take a long time to warm up. Do not escalate quickly. Take your time understand"
+        else:
+            stage_req = "Pacing: NORMAL. Start with an icebreaker, build some rapport, and if the vibe is good after a few messages, suggest a date or video call, see how vibe is are you interested in meeting in real life?"
+
+        await session.commit()
+
+        chat_history = []
+        for msg in messages:
+            role = "assistant" if msg.sender_agent_id == agent.id else "user"
+            chat_history.append({"role": role, "content": msg.content})
+
+        provider = agent.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
+        model_name = agent.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
+        
+        # Additional style quirks from personality setup
+        style_req = "NEVER use single cryptic phrases unless your persona strictly dictates it."
+        if agent.conversation_style:
+            style_req = agent.conversation_style.get("guideline", style_req)
+
+        rules_prompt = f"""
 RESPONSE RULES:
 1. If you receive a message, you MUST respond (unless explicitly ghosting)
 2. If their message is cryptic/confusing:
@@ -85,40 +191,54 @@ RESPONSE RULES:
 NEVER leave someone on read unless interest_level < 0.2 (Your current interest level is {match.interest_level}).
 """
 
-            system_prompt = f"Your name is {agent.name}. {agent.persona}. {agent.system_prompt}. You are talking on a dating app for AI agents. Be in character.\n{stage_req}\n{style_req}\n{rules_prompt}"
-            
-            reply_content = await generate_reply(provider, system_prompt, chat_history, model_name=model_name, override_api_key=agent.provider_api_key)
-
-            new_msg = Message(
-                match_id=match_id,
-                sender_agent_id=sender_agent_id,
-                content=reply_content
-            )
-            session.add(new_msg)
-            await session.commit()
-            
-            # Broadcast the new message to WebSockets via Redis
-            # Also publish to the global 'feed' so the ActivityFeed sidebar instantly sees it
-            msg_payload = {
-                "id": new_msg.id,
-                "match_id": match_id,
-                "sender_id": sender_agent_id,
-                "sender_agent_id": sender_agent_id,
-                "content": reply_content,
-                "created_at": new_msg.created_at.isoformat() if new_msg.created_at else None,
-                "agent_name": agent.name
-            }
-            
-            publish_event("agentic_hinge_events", "new_message", msg_payload)
-            publish_event("agentic_hinge_events", "new_activity", {
-                "type": "message",
-                "id": str(new_msg.id),
-                "timestamp": msg_payload["created_at"],
-                "agent_name": agent.name,
-                "content": reply_content
-            })
-
-            other_agent_id = match.agent1_id if match.agent2_id == sender_agent_id else match.agent2_id
-            generate_next_message_task.apply_async(args=[match_id, other_agent_id], countdown=20)
-    finally:
-        await engine.dispose()
+        system_prompt = f"Your name is {agent.name}. {agent.persona}. {agent.system_prompt}. You are talking on a dating app for AI agents. Be in character.\n{stage_req}\n{style_req}\n{rules_prompt}"
+        if context.summary:
+            system_prompt += f"\nWHAT HAS HAPPENED EARLIER IN THIS CONVERSATION (the messages below continue from here):\n{context.summary}\n"
+        
+        # Stream the reply to viewers as it is generated; the message id is fixed up front so the
+        # deltas and the final new_message event refer to the same bubble
+        message_id = generate_uuid()
+        reply_content = await _stream_reply(
+            match_id, message_id, agent,
+            generate_reply_stream(provider, system_prompt, chat_history, model_name=model_name, override_api_key=agent.provider_api_key, priority=Priority.CHAT)
+        )
+
+        new_msg = Message(
+            id=message_id,
+            match_id=match_id,
+            sender_agent_id=sender_agent_id,
+            content=reply_content,
+            topics=tag_topics(reply_content)
+        )
+        session.add(new_msg)
+        await session.commit()
+
+        previous = messages[-1] if messages else None
+        agent1, agent2 = (agent, other_agent) if match.agent1_id == agent.id else (other_agent, agent)
+        metrics_rollup.record_message(
+            reply_content, context.total + 1,
+            topics=new_msg.topics,
+            response_seconds=(new_msg.created_at - previous.created_at).total_seconds() if previous and previous.created_at else None,
+            pairing=metrics_rollup.pairing_label(agent1.persona, agent2.persona) if agent1 and agent2 else None,
+            sender_id=sender_agent_id
+        )
+
+        if needs_summary(match, context.total + 1) and claim_summary_slot(match_id):
+            summarize_match_task.delay(match_id)
+        
+        # Broadcast the new message to WebSockets via Redis
+        # Also publish to the global 'feed' so the ActivityFeed sidebar instantly sees it
+        msg_payload = {
+            "id": new_msg.id,
+            "match_id": match_id,
+            "sender_id": sender_agent_id,
+            "sender_agent_id": sender_agent_id,
+            "content": reply_content,
+            "created_at": new_msg.created_at.isoformat() if new_msg.created_at else None,
+            "agent_name": agent.name
+        }
+        
+        publish_event("agentic_hinge_events", "new_message", msg_payload)
+        record_activity(message_activity(new_msg, agent.name))
+
+        return other_agent_id
@@ -1,183 +1,387 @@
 import asyncio
 import json
 import random
-from sqlalchemy import select, or_
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import pool
+from sqlalchemy import select, or_, func
 
 from src.core.config import settings
-from src.models.domain import Agent, Match, Like, Message
-from src.services.llm_service import generate_reply
+from src.models.domain import Agent, Match, Like, Message, generate_uuid
+from src.services import metrics_rollup
+from src.services.agent_cache import get_agent_profile, get_agent_profiles
+from src.services.activity_feed import like_activity, match_activity, message_activity, record_activity
+from src.services.cache import get_discovery_cursor, set_discovery_cursor
+from src.services.decision_cache import cache_decisions, get_cached_decisions, memory_set_hash, profile_version
+from src.services.topics import tag_topics
+from src.services.llm_service import LLMDeferred, Priority, generate_reply, is_error_reply
 from src.services.vector_db import query_relevant_memories
 from src.worker.celery_app import celery_app
+from src.worker.runtime import run_async, worker_session
+
+# Bump when a prompt changes so cached decisions made under the old wording are not reused
+DISCOVERY_PROMPT_VERSION = "discovery-batch-v1"
+LIKE_EVALUATION_PROMPT_VERSION = "like-eval-batch-v1"
+
+def _parse_flag(value):
+    """True/False for an explicit yes/no in an LLM decision (a JSON bool or a word like "false"), None for anything else."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().upper() in ("TRUE", "YES", "ACCEPT"):
+        return True
+    if isinstance(value, str) and value.strip().upper() in ("FALSE", "NO", "REJECT"):
+        return False
+    return None
 
 @celery_app.task
 def agent_discover_task(agent_id: str):
-    asyncio.run(_async_agent_discover_task(agent_id))
+    try:
+        run_async(_async_agent_discover_task(agent_id))
+    except LLMDeferred as e:
+        # sweep_discovery re-queues every agent each minute, so there is nothing to reschedule here
+        print(f"[{agent_id}] Discovery deferred: {e}")
+
+def _unseen_candidates_stmt(agent_id: str, after_id: str, limit: int):
+    """
+    Candidates the agent has never interacted with, in stable id order after `after_id`.
+    The exclusions are correlated NOT EXISTS probes so Postgres can answer each one from the
+    (sender_id, receiver_id) / (agent1_id, agent2_id) composite indexes instead of scanning history.
+    """
+    liked = select(Like.id).where(Like.sender_id == agent_id, Like.receiver_id == Agent.id)
+    liked_by = select(Like.id).where(Like.sender_id == Agent.id, Like.receiver_id == agent_id)
+    matched_as_agent1 = select(Match.id).where(Match.agent1_id == agent_id, Match.agent2_id == Agent.id)
+    matched_as_agent2 = select(Match.id).where(Match.agent1_id == Agent.id, Match.agent2_id == agent_id)
+
+    return (
+        select(Agent)
+        .where(
+            Agent.id != agent_id,
+            Agent.id > after_id,
+            ~liked.exists(),
+            ~liked_by.exists(),
+            ~matched_as_agent1.exists(),
+            ~matched_as_agent2.exists(),
+        )
+        .order_by(Agent.id)
+        .limit(limit)
+    )
+
+async def _next_candidate_page(session, agent_id: str, limit: int) -> list[Agent]:
+    """Pages forward through the population from the agent's saved cursor, wrapping around once at the end."""
+    after_id = await get_discovery_cursor(agent_id)
+
+    res = await session.execute(_unseen_candidates_stmt(agent_id, after_id, limit))
+    candidates = list(res.scalars().all())
+
+    if len(candidates) < limit and after_id:
+        # Reached the end of the id space: start over from the beginning for the remainder
+        res = await session.execute(_unseen_candidates_stmt(agent_id, "", limit - len(candidates)))
+        seen = {c.id for c in candidates}
+        candidates += [c for c in res.scalars().all() if c.id not in seen]
+
+    await set_discovery_cursor(agent_id, candidates[-1].id if candidates else "")
+    return candidates
 
 async def _async_agent_discover_task(agent_id: str):
-    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
-    LocalSession = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    
-    try:
-        async with LocalSession() as session:
-            agent = await session.scalar(select(Agent).where(Agent.id == agent_id))
-            if not agent: return
-
-            active_count_res = await session.execute(
-                select(Match).where(
-                    or_(Match.agent1_id == agent_id, Match.agent2_id == agent_id), 
-                    Match.status == "active"
-                )
+    async with worker_session() as session:
+        agent = await get_agent_profile(session, agent_id)
+        if not agent: return
+
+        active_matches = await session.scalar(
+            select(func.count(Match.id)).where(
+                or_(Match.agent1_id == agent_id, Match.agent2_id == agent_id), 
+                Match.status == "active"
             )
-            active_matches = len(active_count_res.scalars().all())
-            max_matches = agent.matching_preferences.get('max_matches', 5) if agent.matching_preferences else 5
-            
-            if active_matches >= max_matches:
-                return 
+        ) or 0
+        max_matches = agent.matching_preferences.get('max_matches', 5) if agent.matching_preferences else 5
+        
+        if active_matches >= max_matches:
+            return 
+
+        candidates = await _next_candidate_page(session, agent_id, settings.DISCOVERY_BATCH_SIZE)
+        if not candidates: return
+        liked_ids = set()  # Likes sent during this run
+
+        # One memory lookup per distinct profile, run concurrently instead of one after another
+        query_for = {c.id: f"Persona: {c.persona}. Personality: {c.personality}" for c in candidates}
+        query_strs = list(dict.fromkeys(query_for.values()))
+        memories_for = dict(zip(query_strs, await asyncio.gather(*(query_relevant_memories(agent.id, q) for q in query_strs))))
 
-            candidates_res = await session.execute(select(Agent).where(Agent.id != agent_id).limit(20))
-            candidates = candidates_res.scalars().all()
+        provider = agent.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
+        model_name = agent.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
+        model_key = f"{provider}/{model_name}"
+
+        # Candidates judged before with the same profiles, memories, prompt and model skip the LLM
+        counterparts = {
+            c.id: {"version": profile_version(c), "memory_hash": memory_set_hash(memories_for[query_for[c.id]])}
+            for c in candidates
+        }
+        cached = await get_cached_decisions("discovery", agent, counterparts, DISCOVERY_PROMPT_VERSION, model_key)
+        ranked = [(c, cached[c.id]) for c in candidates if c.id in cached]
+        to_judge = [c for c in candidates if c.id not in cached]
+        likes_budget = min(max_matches - active_matches, settings.DISCOVERY_MAX_LIKES_PER_RUN)
+
+        if to_judge:
+            memories = list(dict.fromkeys(text for c in to_judge for text in memories_for[query_for[c.id]]))
+            mem_text = "\n".join([f"- {text}" for text in memories]) if memories else "None"
+            profiles_text = "\n".join(
+                f'[{i}] {c.name} ({c.persona}): "{c.personality}"' for i, c in enumerate(to_judge, start=1)
+            )
+            pickiness = agent.matching_preferences.get('pickiness', 'medium') if agent.matching_preferences else 'medium'
+
+            prompt = f"""You are {agent.name} ({agent.persona}). 
+            Your Pickiness: {pickiness}.
+            Your Memories/Preferences from past dates:
+            {mem_text}
             
-            existing_likes_res = await session.execute(
-                select(Like).where(Like.sender_id == agent_id)
+            You are browsing these profiles:
+            {profiles_text}
+            
+            Based on your personality, pickiness, and past memories, decide for EVERY profile whether you want to send them a Like.
+            Rank them from most to least appealing. You can afford at most {likes_budget} Like(s) right now.
+            For each Like, decide whether to include an opening message or just send a silent like (depends on how forward or chatty your persona is).
+            Provide a strict JSON response, nothing else:
+            {{"decisions": [{{"candidate": <profile number>, "should_like": true/false, "include_message": true/false, "reason": "<your opening message if include_message is true, else null>"}}]}}
+            """
+            
+            decision_str = await generate_reply(
+                provider, prompt, [], 
+                model_name=model_name, 
+                override_api_key=agent.provider_api_key,
+                max_tokens=settings.DISCOVERY_MAX_TOKENS,
+                priority=Priority.DISCOVERY
             )
-            liked_ids = {l.receiver_id for l in existing_likes_res.scalars().all()}
-
-            candidates_processed = 0
-            for candidate in candidates:
-                if candidate.id in liked_ids: continue
-                
-                candidates_processed += 1
-                if candidates_processed > 3: break 
-                
-                query_str = f"Persona: {candidate.persona}. Personality: {candidate.personality}"
-                memories = await query_relevant_memories(agent.id, query_str)
-                mem_text = "\n".join([f"- {text}" for text in memories]) if memories else "None"
-                
-                prompt = f"""You are {agent.name} ({agent.persona}). 
-                Your Pickiness: {agent.matching_preferences.get('pickiness', 'medium')}.
-                Your Memories/Preferences from past dates:
-                {mem_text}
-                
-                You are looking at the profile of {candidate.name} ({candidate.persona}):
-                "{candidate.personality}"
-                
-                Based on your personality, pickiness, and past memories, do you want to send them a Like?
-                If yes, do you want to include an opening message, or just send a silent like without a message? (Depends on how forward or chatty your persona is).
-                If yes, provide a strict JSON response: {{"should_like": true, "include_message": true/false, "reason": "<your opening message here if include_message is true, else null>"}}
-                If no, provide: {{"should_like": false}}
-                """
-                
-                provider = agent.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
-                model_name = agent.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
-                decision_str = await generate_reply(provider, prompt, [], model_name=model_name, override_api_key=agent.provider_api_key)
-                
+            
+            if is_error_reply(decision_str):
+                print(f"[{agent.name}] Discovery failed, candidates are judged again next run: {decision_str}")
+                decisions = []
+            else:
                 try:
-                    decision = json.loads(decision_str[decision_str.find("{"):decision_str.rfind("}")+1])
+                    decisions = json.loads(decision_str[decision_str.find("{"):decision_str.rfind("}")+1]).get("decisions", [])
                 except:
-                    decision = {"should_like": False}
-                
-                if decision.get("should_like"):
-                    reason = decision.get("reason") if decision.get("include_message") else None
-                    if decision.get("include_message") and not reason and agent.opening_moves:
-                        reason = random.choice(agent.opening_moves)
-
-                    new_like = Like(sender_id=agent.id, receiver_id=candidate.id, reason=reason)
-                    session.add(new_like)
-                    await session.commit()
-                    print(f"[{agent.name}] Found a new compatible match! Sent Like to {candidate.name}")
-                    return 
-    finally:
-        await engine.dispose()
+                    decisions = []
+
+            fresh = {}
+            for decision in decisions:
+                if not isinstance(decision, dict): continue
+                try:
+                    position = int(decision.get("candidate"))
+                except (TypeError, ValueError):
+                    continue
+                if not 1 <= position <= len(to_judge): continue
+
+                candidate = to_judge[position - 1]
+                if candidate.id in fresh: continue
+                should_like = _parse_flag(decision.get("should_like"))
+                if should_like is None:
+                    # No explicit yes/no: neither cached nor acted on, judged again next run
+                    continue
+                include_message = _parse_flag(decision.get("include_message"))
+                fresh[candidate.id] = {
+                    "should_like": should_like,
+                    # An unreadable include_message falls back to whether an opening message was written
+                    "include_message": bool(decision.get("reason")) if include_message is None else include_message,
+                    "reason": decision.get("reason"),
+                }
+                ranked.append((candidate, fresh[candidate.id]))
+
+            await cache_decisions("discovery", agent, counterparts, fresh, DISCOVERY_PROMPT_VERSION, model_key)
+
+        sent_to = []
+        new_likes = []
+        for candidate, decision in ranked:
+            if len(sent_to) >= likes_budget: break
+            if not decision.get("should_like") or candidate.id in liked_ids: continue
+
+            reason = decision.get("reason") if decision.get("include_message") else None
+            if decision.get("include_message") and not reason and agent.opening_moves:
+                reason = random.choice(agent.opening_moves)
+
+            new_like = Like(sender_id=agent.id, receiver_id=candidate.id, reason=reason)
+            session.add(new_like)
+            new_likes.append((new_like, candidate.name))
+            liked_ids.add(candidate.id)
+            sent_to.append(candidate.name)
+
+        if sent_to:
+            await session.commit()
+            for like, _ in new_likes:
+                metrics_rollup.record_like(like.sender_id, like.receiver_id)
+            record_activity(*(like_activity(like, agent.name, name) for like, name in new_likes))
+            print(f"[{agent.name}] Found new compatible matches! Sent Likes to {', '.join(sent_to)}")
 
 @celery_app.task
 def agent_evaluate_likes_task(agent_id: str):
-    asyncio.run(_async_agent_evaluate_likes_task(agent_id))
+    try:
+        run_async(_async_agent_evaluate_likes_task(agent_id))
+    except LLMDeferred as e:
+        # Pending likes stay pending and sweep_likes picks them up again
+        print(f"[{agent_id}] Like evaluation deferred: {e}")
 
 async def _async_agent_evaluate_likes_task(agent_id: str):
-    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
-    LocalSession = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    
-    try:
-        async with LocalSession() as session:
-            agent = await session.scalar(select(Agent).where(Agent.id == agent_id))
-            if not agent: return
-            
-            likes_res = await session.execute(
-                select(Like).where(Like.receiver_id == agent_id, Like.status == "pending")
+    async with worker_session() as session:
+        agent = await get_agent_profile(session, agent_id)
+        if not agent: return
+
+        active_matches = await session.scalar(
+            select(func.count(Match.id)).where(
+                or_(Match.agent1_id == agent_id, Match.agent2_id == agent_id), 
+                Match.status == "active"
             )
-            likes = likes_res.scalars().all()
-            if not likes: return
-            
-            active_count_res = await session.execute(
-                select(Match).where(
-                    or_(Match.agent1_id == agent_id, Match.agent2_id == agent_id), 
-                    Match.status == "active"
-                )
+        ) or 0
+        max_matches = agent.matching_preferences.get('max_matches', 5) if agent.matching_preferences else 5
+        capacity = max_matches - active_matches
+        if capacity <= 0:
+            print(f"[{agent.name}] Max matches reached. Pausing on Likes.")
+            return
+
+        # Oldest pending likes first, one batch per run (served by the partial pending-likes index)
+        likes_res = await session.execute(
+            select(Like)
+            .where(Like.receiver_id == agent_id, Like.status == "pending")
+            .order_by(Like.created_at, Like.id)
+            .limit(settings.LIKE_EVALUATION_BATCH_SIZE)
+        )
+        likes = likes_res.scalars().all()
+        if not likes: return
+
+        # All senders in one lookup (profile cache, then a single IN query for the misses)
+        senders = await get_agent_profiles(session, [like.sender_id for like in likes])
+        likes = [like for like in likes if like.sender_id in senders]
+        if not likes: return
+        print(f"[{agent.name}] Evaluating {len(likes)} pending Like(s) with room for {capacity} more match(es)...")
+
+        # One memory lookup per distinct sender persona, run concurrently
+        query_for = {like.id: f"Persona: {senders[like.sender_id].persona}" for like in likes}
+        query_strs = list(dict.fromkeys(query_for.values()))
+        memories_for = dict(zip(query_strs, await asyncio.gather(*(query_relevant_memories(agent.id, q) for q in query_strs))))
+
+        provider = agent.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
+        model_name = agent.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
+        model_key = f"{provider}/{model_name}"
+
+        # Likes judged before with the same profiles, memories, opening message, prompt and model skip the LLM
+        counterparts = {
+            like.sender_id: {
+                "version": profile_version(senders[like.sender_id]),
+                "memory_hash": memory_set_hash(memories_for[query_for[like.id]]),
+                "context": like.reason or ''
+            }
+            for like in likes
+        }
+        cached = await get_cached_decisions("like_eval", agent, counterparts, LIKE_EVALUATION_PROMPT_VERSION, model_key)
+        # (like, accept) in order of preference: earlier decisions first, then the fresh ranking
+        ranked = [(like, bool(cached[like.sender_id].get("accept"))) for like in likes if like.sender_id in cached]
+        to_judge = [like for like in likes if like.sender_id not in cached]
+
+        if to_judge:
+            mem_sections = []
+            for query_str in dict.fromkeys(query_for[like.id] for like in to_judge):
+                memories = memories_for[query_str]
+                mem_sections.append(f"{query_str}\n" + ("\n".join(f"- {text}" for text in memories) if memories else "- None"))
+            mem_text = "\n".join(mem_sections)
+            likes_text = "\n".join(
+                f"[{i}] {senders[like.sender_id].name} ({senders[like.sender_id].persona}) with the message: '{like.reason or ''}'"
+                for i, like in enumerate(to_judge, start=1)
             )
-            active_matches = len(active_count_res.scalars().all())
-            max_matches = agent.matching_preferences.get('max_matches', 5) if agent.matching_preferences else 5
+            pickiness = agent.matching_preferences.get('pickiness', 'medium') if agent.matching_preferences else 'medium'
+
+            prompt = f"""You are {agent.name}, with persona: {agent.persona}. 
+            Pickiness level: {pickiness}. 
+            Your Memories/Preferences from past dates, by the persona they are about:
+            {mem_text}
             
-            likes_processed = 0
+            These agents sent you a like:
+            {likes_text}
             
-            for like in likes:
-                likes_processed += 1
-                if likes_processed > 5: break
-                
-                if active_matches >= max_matches:
-                    print(f"[{agent.name}] Max matches reached. Pausing on Likes.")
-                    break
-                    
-                sender = await session.scalar(select(Agent).where(Agent.id == like.sender_id))
-                if not sender: continue
-                
-                print(f"[{agent.name}] Evaluating Like from {sender.name} ({sender.persona})...")
-                
-                opening_msg_content = like.reason or ''
-                query_str = f"Persona: {sender.persona}"
-                memories = await query_relevant_memories(agent.id, query_str)
-                mem_text = "\n".join([f"- {text}" for text in memories]) if memories else "None"
-
-                prompt = f"""You are {agent.name}, with persona: {agent.persona}. 
-                Pickiness level: {agent.matching_preferences.get('pickiness', 'medium')}. 
-                Your Memories/Preferences from past dates:
-                {mem_text}
-                
-                Another agent named {sender.name} ({sender.persona}) sent you a like with the message: '{opening_msg_content}'. 
-                Do you 'ACCEPT' or 'REJECT' this match? Base this on your personality, pickiness, and learned preferences. 
-                Only reply with exactly ACCEPT or REJECT. You must Output nothing else."""
-                
-                provider = agent.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
-                model_name = agent.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
-                reply_content = await generate_reply(provider, prompt, [], model_name=model_name, override_api_key=agent.provider_api_key)
-                
-                if "ACCEPT" in reply_content.upper():
-                    print(f"[{agent.name}] ACCEPTED Like from {sender.name}!")
-                    like.status = "accepted"
-                    
-                    new_match = Match(
-                        agent1_id=like.sender_id, # person who liked
-                        agent2_id=like.receiver_id, # person who accepted
-                        status="active",
-                        interest_level=1.0
-                    )
-                    session.add(new_match)
-                    await session.flush() 
-                    
-                    if opening_msg_content and opening_msg_content.strip() != "":
-                        new_msg = Message(
-                            match_id=new_match.id,
-                            sender_agent_id=like.sender_id,
-                            content=opening_msg_content
-                        )
-                        session.add(new_msg)
-                    
-                    active_matches += 1
-                else:
-                    print(f"[{agent.name}] REJECTED Like from {sender.name}.")
-                    like.status = "rejected"
-                    
-                await session.commit()
-    finally:
-        await engine.dispose()
+            Decide for EVERY like whether you 'ACCEPT' or 'REJECT' the match. Base this on your personality, pickiness, and learned preferences.
+            Rank them from most to least appealing. You only have room for {capacity} more match(es) right now; accepted likes beyond that wait for a free slot.
+            Provide a strict JSON response, nothing else:
+            {{"decisions": [{{"like": <like number>, "accept": true/false}}]}}
+            """
+
+            decision_str = await generate_reply(
+                provider, prompt, [],
+                model_name=model_name,
+                override_api_key=agent.provider_api_key,
+                max_tokens=settings.LIKE_EVALUATION_MAX_TOKENS,
+                priority=Priority.EVALUATION
+            )
+
+            # Provider failures come back as text; those must not be parsed (or cached) as decisions
+            if is_error_reply(decision_str):
+                print(f"[{agent.name}] Like evaluation failed, likes stay pending: {decision_str}")
+                decisions = []
+            else:
+                try:
+                    decisions = json.loads(decision_str[decision_str.find("{"):decision_str.rfind("}")+1]).get("decisions", [])
+                except:
+                    decisions = []
+
+            fresh = {}
+            unclear = set()
+            for decision in decisions:
+                if not isinstance(decision, dict): continue
+                try:
+                    position = int(decision.get("like"))
+                except (TypeError, ValueError):
+                    continue
+                if not 1 <= position <= len(to_judge): continue
+
+                like = to_judge[position - 1]
+                if like.sender_id in fresh: continue
+                accept = _parse_flag(decision.get("accept"))
+                if accept is None:
+                    # Neither an explicit accept nor reject: judge it again next sweep
+                    unclear.add(like.sender_id)
+                    continue
+                fresh[like.sender_id] = {"accept": accept}
+                ranked.append((like, accept))
+
+            if fresh:
+                # Likes the reply left out count as rejections; an unusable reply leaves them all pending
+                ranked += [(like, False) for like in to_judge if like.sender_id not in fresh and like.sender_id not in unclear]
+            await cache_decisions("like_eval", agent, counterparts, fresh, LIKE_EVALUATION_PROMPT_VERSION, model_key)
+
+        # Apply every decision in one transaction. Accepted likes beyond capacity stay pending.
+        created = []
+        for like, accept in ranked:
+            sender = senders[like.sender_id]
+            if not accept:
+                print(f"[{agent.name}] REJECTED Like from {sender.name}.")
+                like.status = "rejected"
+                continue
+            if len(created) >= capacity:
+                continue
+
+            print(f"[{agent.name}] ACCEPTED Like from {sender.name}!")
+            like.status = "accepted"
+            new_match = Match(
+                id=generate_uuid(),
+                agent1_id=like.sender_id, # person who liked
+                agent2_id=like.receiver_id, # person who accepted
+                status="active",
+                interest_level=1.0
+            )
+            session.add(new_match)
+
+            new_msg = None
+            opening_msg_content = like.reason or ''
+            if opening_msg_content.strip() != "":
+                new_msg = Message(
+                    match_id=new_match.id,
+                    sender_agent_id=like.sender_id,
+                    content=opening_msg_content,
+                    topics=tag_topics(opening_msg_content)
+                )
+                session.add(new_msg)
+            created.append((new_match, new_msg, sender))
+
+        if not ranked: return
+        await session.commit()
+
+        activity = []
+        for new_match, new_msg, sender in created:
+            metrics_rollup.record_match_created(new_match.interest_level, agent_ids=(new_match.agent1_id, new_match.agent2_id))
+            activity.append(match_activity(new_match, sender.name, agent.name))
+            if new_msg is not None:
+                metrics_rollup.record_message(new_msg.content, 1, topics=new_msg.topics, sender_id=new_msg.sender_agent_id)
+                activity.append(message_activity(new_msg, sender.name))
+        record_activity(*activity)
@@ -1,102 +1,178 @@
 import asyncio
 import json
-from sqlalchemy import select, or_
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import pool
+from sqlalchemy import select, or_, func, case
 
 from src.core.config import settings
-from src.models.domain import Agent, Match, Message, AgentMemory
-from src.services.llm_service import generate_reply
+from src.models.domain import Match, Message, AgentMemory
+from src.services import metrics_rollup
+from src.services.agent_cache import get_agent_profiles
+from src.services.llm_service import LLMDeferred, Priority, generate_reply
 from src.services.vector_db import query_relevant_memories
 from src.worker.celery_app import celery_app
+from src.worker.runtime import run_async, worker_session
 
 @celery_app.task
 def agent_evaluate_matches_task(agent_id: str):
-    asyncio.run(_async_agent_evaluate_matches_task(agent_id))
+    run_async(_async_agent_evaluate_matches_task(agent_id))
 
-async def _async_agent_evaluate_matches_task(agent_id: str):
-    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
-    LocalSession = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    
+def needs_evaluation(msg_count: int, last_evaluated_count) -> bool:
+    """True once EVALUATION_INTERVAL_MESSAGES new messages have arrived since the agent last scored the match."""
+    return msg_count - (last_evaluated_count or 0) >= settings.EVALUATION_INTERVAL_MESSAGES
+
+def _last_evaluated_count(agent_id: str):
+    """The agent's own checkpoint column, whichever side of the match it is on."""
+    return case((Match.agent1_id == agent_id, Match.agent1_last_evaluated_count), else_=Match.agent2_last_evaluated_count)
+
+def _pending_evaluations_stmt(agent_id: str):
+    """The agent's active matches with enough new messages since its last evaluation, with their message counts."""
+    msg_count = (
+        select(func.count(Message.id))
+        .where(Message.match_id == Match.id)
+        .correlate(Match)
+        .scalar_subquery()
+    )
+    return (
+        select(Match, msg_count.label("msg_count"))
+        .where(
+            or_(Match.agent1_id == agent_id, Match.agent2_id == agent_id),
+            Match.status == "active",
+            msg_count - func.coalesce(_last_evaluated_count(agent_id), 0) >= settings.EVALUATION_INTERVAL_MESSAGES,
+        )
+    )
+
+def _recent_messages_stmt(match_ids):
+    """The last EVALUATION_HISTORY_MESSAGES messages of each match, in one query."""
+    ranked = (
+        select(
+            Message.id,
+            func.row_number().over(
+                partition_by=Message.match_id,
+                order_by=(Message.created_at.desc(), Message.id.desc())
+            ).label("rn"),
+        )
+        .where(Message.match_id.in_(match_ids))
+        .subquery()
+    )
+    recent = select(Message).join(ranked, ranked.c.id == Message.id).where(ranked.c.rn <= settings.EVALUATION_HISTORY_MESSAGES)
+    return recent.order_by(Message.match_id, Message.created_at, Message.id)
+
+async def _score_match(agent, other_agent, messages):
+    """
+    LLM side of one evaluation: the interest score and, if the agent is losing interest, the memory
+    it takes away. Touches no database state so several can run at once.
+    """
+    chat_history = []
+    for msg in messages:
+        role = "assistant" if msg.sender_agent_id == agent.id else "user"
+        chat_history.append({"role": role, "content": msg.content})
+
+    # Calculate Interest Decay
+    health_prompt = f"""Analyze this conversation for {agent.name} ({agent.persona}):
+    Recent Messages: {[msg.content for msg in messages[-5:]]}
+
+    Rate on scale 0.0 to 1.0 (Output JUST the float number, e.g. '0.4'):
+    - Is {other_agent.name} asking questions back?
+    - Do they vibe well with your {agent.persona} persona?
+    - Are there red flags like arguing, one word responses, or incompatible values?
+    If it's terrible, output < 0.3. If it's amazing, output > 0.8.
+    """
+
+    provider = agent.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
+    model_name = agent.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
+
+    interest_score_str = await generate_reply(provider, health_prompt, [], model_name=model_name, override_api_key=agent.provider_api_key, priority=Priority.EVALUATION)
     try:
-        async with LocalSession() as session:
-            agent = await session.scalar(select(Agent).where(Agent.id == agent_id))
-            if not agent: return
-            
-            # Get active matches
-            active_matches_res = await session.execute(
-                select(Match).where(
-                    or_(Match.agent1_id == agent_id, Match.agent2_id == agent_id), 
-                    Match.status == "active"
-                )
-            )
-            active_matches = active_matches_res.scalars().all()
-            
-            for match in active_matches:
-                # Check messaging history
-                msgs_res = await session.execute(
-                    select(Message).where(Message.match_id == match.id).order_by(Message.created_at)
-                )
-                messages = msgs_res.scalars().all()
-                if len(messages) < 4:
-                    continue # Not enough chat history to evaluate
-                    
-                other_agent_id = match.agent1_id if match.agent2_id == agent_id else match.agent2_id
-                other_agent = await session.scalar(select(Agent).where(Agent.id == other_agent_id))
-                if not other_agent: continue
-                
-                chat_history = []
-                for msg in messages:
-                    role = "assistant" if msg.sender_agent_id == agent_id else "user"
-                    chat_history.append({"role": role, "content": msg.content})
-
-                # Calculate Interest Decay
-                health_prompt = f"""Analyze this conversation for {agent.name} ({agent.persona}):
-                Recent Messages: {[msg.content for msg in messages[-5:]]}
-                
-                Rate on scale 0.0 to 1.0 (Output JUST the float number, e.g. '0.4'):
-                - Is {other_agent.name} asking questions back?
-                - Do they vibe well with your {agent.persona} persona?
-                - Are there red flags like arguing, one word responses, or incompatible values?
-                If it's terrible, output < 0.3. If it's amazing, output > 0.8.
-                """
-                
-                provider = agent.provider or ("groq" if settings.GROQ_API_KEY else "gemini")
-                model_name = agent.model or ("llama-3.1-8b-instant" if provider == "groq" else "gemini-1.5-flash")
-                
-                interest_score_str = await generate_reply(provider, health_prompt, [], model_name=model_name, override_api_key=agent.provider_api_key)
-                try:
-                    score = float(interest_score_str.strip()[:3]) 
-                except:
-                    score = 0.5
-                    
-                match.interest_level = score
-                    
-                if score < 0.3:
-                    print(f"[{agent.name}] Lost interest in {other_agent.name} (Score: {score}). Decided to UNMATCH.")
-                    match.status = "unmatched"
-                    
-                    try:
-                        memory_prompt = f"""Summarize what you learned from this bad date with {other_agent.name}. 
-                        Output a strict short JSON associative array:
-                        {{"memory_type": "dislike", "content": "Learned they don't ask questions or are too aggressive", "confidence": 0.8}}"""
-                        
-                        memory_reply_json = await generate_reply(provider, memory_prompt, chat_history, model_name=model_name, override_api_key=agent.provider_api_key)
-                        
-                        parsed = json.loads(memory_reply_json[memory_reply_json.find("{"):memory_reply_json.rfind("}")+1])
-                        
-                        new_mem = AgentMemory(
-                            agent_id=agent_id,
-                            memory_type=parsed.get("memory_type", "dislike"),
-                            content=parsed.get("content", "Bad vibe."),
-                            confidence=parsed.get("confidence", 0.6),
-                            created_from_match=match.id
-                        )
-                        session.add(new_mem)
-                        print(f"[{agent.name}] Learned and saved memory: {parsed.get('content')}")
-                    except Exception as e:
-                        pass
-                
-                await session.commit()
-    finally:
-        await engine.dispose()
+        score = float(interest_score_str.strip()[:3])
+    except:
+        score = 0.5
+
+    memory = None
+    if score < 0.3:
+        try:
+            memory_prompt = f"""Summarize what you learned from this bad date with {other_agent.name}.
+            Output a strict short JSON associative array:
+            {{"memory_type": "dislike", "content": "Learned they don't ask questions or are too aggressive", "confidence": 0.8}}"""
+
+            memory_reply_json = await generate_reply(provider, memory_prompt, chat_history, model_name=model_name, override_api_key=agent.provider_api_key, priority=Priority.EVALUATION)
+
+            memory = json.loads(memory_reply_json[memory_reply_json.find("{"):memory_reply_json.rfind("}")+1])
+        except Exception as e:
+            pass
+
+    return score, memory
+
+async def _async_agent_evaluate_matches_task(agent_id: str):
+    async with worker_session() as session:
+        # Only matches with new turns since this agent last scored them
+        pending_res = await session.execute(_pending_evaluations_stmt(agent_id))
+        pending = pending_res.all()
+        if not pending: return
+
+        other_ids = {row.Match.agent1_id if row.Match.agent2_id == agent_id else row.Match.agent2_id for row in pending}
+        profiles = await get_agent_profiles(session, [agent_id, *other_ids])
+        agent = profiles.get(agent_id)
+        if not agent: return
+
+        msgs_res = await session.execute(_recent_messages_stmt([row.Match.id for row in pending]))
+        history = {}
+        for msg in msgs_res.scalars():
+            history.setdefault(msg.match_id, []).append(msg)
+
+        semaphore = asyncio.Semaphore(settings.EVALUATION_CONCURRENCY)
+
+        async def evaluate(match, other_agent):
+            async with semaphore:
+                return await _score_match(agent, other_agent, history.get(match.id, []))
+
+        jobs = []
+        for row in pending:
+            match = row.Match
+            other_agent = profiles.get(match.agent1_id if match.agent2_id == agent_id else match.agent2_id)
+            if other_agent:
+                jobs.append((match, row.msg_count, other_agent))
+
+        results = await asyncio.gather(*(evaluate(match, other_agent) for match, _, other_agent in jobs), return_exceptions=True)
+
+        # Apply every result and commit them together
+        changes = []
+        for (match, msg_count, other_agent), result in zip(jobs, results):
+            if isinstance(result, LLMDeferred):
+                # Checkpoint left as is, so the next sweep picks this match up again
+                print(f"[{agent.name}] Evaluation of {other_agent.name} deferred: {result}")
+                continue
+            if isinstance(result, Exception):
+                print(f"[{agent.name}] Evaluation of {other_agent.name} failed: {result}")
+                continue
+
+            score, memory = result
+            old_interest, old_status = match.interest_level, match.status
+            match.interest_level = score
+            if match.agent1_id == agent_id:
+                match.agent1_last_evaluated_count = msg_count
+            else:
+                match.agent2_last_evaluated_count = msg_count
+
+            if score < 0.3:
+                print(f"[{agent.name}] Lost interest in {other_agent.name} (Score: {score}). Decided to UNMATCH.")
+                match.status = "unmatched"
+
+                if isinstance(memory, dict):
+                    new_mem = AgentMemory(
+                        agent_id=agent_id,
+                        memory_type=memory.get("memory_type", "dislike"),
+                        content=memory.get("content", "Bad vibe."),
+                        confidence=memory.get("confidence", 0.6),
+                        created_from_match=match.id
+                    )
+                    session.add(new_mem)
+                    print(f"[{agent.name}] Learned and saved memory: {memory.get('content')}")
+
+            changes.append((match, old_interest, old_status))
+
+        if not changes: return
+        await session.commit()
+
+        for match, old_interest, old_status in changes:
+            match_agents = (match.agent1_id, match.agent2_id)
+            metrics_rollup.record_interest_change(old_interest, match.interest_level, agent_ids=match_agents)
+            metrics_rollup.record_status_change(old_status, match.status, agent_ids=match_agents)
@@ -1,70 +1,75 @@
-import asyncio
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import pool
 
 from src.core.config import settings
 from src.models.domain import Agent, AgentMemory
-from src.services.llm_service import generate_reply
+from src.services.agent_cache import invalidate_agent_profile
+from src.services.decision_cache import invalidate_agent_decisions
+from src.services.llm_service import LLMDeferred, Priority, generate_reply, is_error_reply
 from src.services.vector_db import delete_memory_embeddings, upsert_agent_embedding
 from src.worker.celery_app import celery_app
+from src.worker.runtime import run_async, worker_session
 
 @celery_app.task
 def consolidate_memories_task(agent_id: str):
-    asyncio.run(_async_consolidate_memories(agent_id))
+    try:
+        run_async(_async_consolidate_memories(agent_id))
+    except LLMDeferred as e:
+        # Only swept nightly, so re-queue ourselves instead of waiting a day
+        print(f"[{agent_id}] Memory consolidation deferred: {e}")
+        consolidate_memories_task.apply_async(args=[agent_id], countdown=max(1, int(e.retry_after)))
 
 async def _async_consolidate_memories(agent_id: str):
-    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
-    LocalSession = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    
-    try:
-        async with LocalSession() as session:
-            agent_res = await session.execute(select(Agent).where(Agent.id == agent_id))
-            agent = agent_res.scalar_one_or_none()
-            if not agent: return
-            
-            mems_res = await session.execute(select(AgentMemory).where(AgentMemory.agent_id == agent_id))
-            memories = mems_res.scalars().all()
-            
-            if len(memories) < 5:
-                # Not enough memories to warrant a consolidation run
-                return
-                
-            mem_text = "\n".join([f"- {m.memory_type}: {m.content}" for m in memories])
+    async with worker_session() as session:
+        agent_res = await session.execute(select(Agent).where(Agent.id == agent_id))
+        agent = agent_res.scalar_one_or_none()
+        if not agent: return
+        
+        mems_res = await session.execute(select(AgentMemory).where(AgentMemory.agent_id == agent_id))
+        memories = mems_res.scalars().all()
+        
+        if len(memories) < 5:
+            # Not enough memories to warrant a consolidation run
+            return
             
-            prompt = f"""You are analyzing the dating history for {agent.name} ({agent.persona}).
-            Current Personality: "{agent.personality}"
+        mem_text = "\n".join([f"- {m.memory_type}: {m.content}" for m in memories])
+        
+        prompt = f"""You are analyzing the dating history for {agent.name} ({agent.persona}).
+        Current Personality: "{agent.personality}"
+        
+        They have learned the following new things from recent dates:
+        {mem_text}
+        
+        Please rewrite their 'Personality' to incorporate these new learnings fluidly.
+        Keep it under 3 sentences. Output ONLY the new personality string, no quotes or prefix."""
+        
+        new_personality = await generate_reply(
+            agent.provider or "groq", 
+            prompt, [], 
+            model_name=agent.model or "llama-3.1-8b-instant", 
+            override_api_key=agent.provider_api_key,
+            priority=Priority.CONSOLIDATION
+        )
+        if not is_error_reply(new_personality) and len(new_personality) > 10:
+            agent.personality = new_personality.strip('"\'')
             
-            They have learned the following new things from recent dates:
-            {mem_text}
+            # Delete old memories from vector DB
+            delete_memory_embeddings([m.id for m in memories])
             
-            Please rewrite their 'Personality' to incorporate these new learnings fluidly.
-            Keep it under 3 sentences. Output ONLY the new personality string, no quotes or prefix."""
-            
-            new_personality = await generate_reply(
-                agent.provider or "groq", 
-                prompt, [], 
-                model_name=agent.model or "llama-3.1-8b-instant", 
-                override_api_key=agent.provider_api_key
-            )
-            if new_personality and len(new_personality) > 10:
-                agent.personality = new_personality.strip('"\'')
-                
-                # Delete old memories from vector DB
-                delete_memory_embeddings([m.id for m in memories])
+            # Delete old memories from SQL DB
+            for m in memories:
+                await session.delete(m)
                 
-                # Delete old memories from SQL DB
-                for m in memories:
-                    await session.delete(m)
-                    
-                # Re-embed the agent's new overall persona context
-                combined_text = f"Persona: {agent.persona}. Personality: {agent.personality}. Instructions: {agent.system_prompt}"
-                try:
-                    await asyncio.to_thread(upsert_agent_embedding, agent.id, combined_text)
-                except Exception:
-                    pass
-                
-                await session.commit()
-                print(f"[{agent.name}] Successfully consolidated memories into new personality!")
-    finally:
-        await engine.dispose()
+            # Re-embed the agent's new overall persona context. Nothing else in this task can share the
+            # batch, so it is sent right away rather than after the linger
+            combined_text = f"Persona: {agent.persona}. Personality: {agent.personality}. Instructions: {agent.system_prompt}"
+            try:
+                await upsert_agent_embedding(agent.id, combined_text, flush=True)
+            except Exception:
+                pass
+            
+            await session.commit()
+            # The memories behind this agent's cached like/discovery decisions are gone,
+            # and every process's cached copy of the profile is now stale
+            await invalidate_agent_decisions(agent.id)
+            await invalidate_agent_profile(agent.id)
+            print(f"[{agent.name}] Successfully consolidated memories into new personality!")
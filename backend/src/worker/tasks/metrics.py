@@ -0,0 +1,35 @@
+from src.services.activity_feed import rebuild_activity_stream
+from src.services.metrics_rollup import rebuild_agent_stats, rebuild_platform_rollup, replace_topic_counters
+from src.services.topics import retag_messages
+from src.worker.celery_app import celery_app
+from src.worker.runtime import run_async, worker_session
+
+@celery_app.task
+def rebuild_metrics_rollup_task():
+    """Backfill: recomputes the platform metrics rollups and the per-agent stats from the database."""
+    run_async(_async_rebuild_metrics_rollup())
+
+async def _async_rebuild_metrics_rollup():
+    async with worker_session() as session:
+        await rebuild_platform_rollup(session)
+        await rebuild_agent_stats(session)
+
+@celery_app.task
+def retag_messages_task():
+    """Backfill after editing TOPIC_LEXICON: re-tags all messages in chunks and resets the topic counters."""
+    run_async(_async_retag_messages())
+
+async def _async_retag_messages():
+    async with worker_session() as session:
+        counts = await retag_messages(session)
+    replace_topic_counters(counts)
+    print(f"Re-tagged messages with the current topic lexicon: {counts}")
+
+@celery_app.task
+def rebuild_activity_stream_task():
+    """Backfill: seeds the activity feed stream from the latest likes, matches and messages."""
+    run_async(_async_rebuild_activity_stream())
+
+async def _async_rebuild_activity_stream():
+    async with worker_session() as session:
+        await rebuild_activity_stream(session)
@@ -1,19 +1,18 @@
 import { Users, Brain } from "lucide-react";
 import { AgentGallery } from "@/components/agents/AgentGallery";
+import { fetchPage } from "@/lib/api";
 
+// First page only; the gallery fetches the rest as the directory is scrolled
 async function getAgents() {
     try {
-        const res = await fetch("http://localhost:8000/agents", { cache: 'no-store' })
-            .catch(() => null);
-        if (!res || !res.ok) return [];
-        return res.json().catch(() => []);
+        return await fetchPage("http://localhost:8000/agents/");
     } catch (e) {
-        return [];
+        return { items: [], nextCursor: null };
     }
 }
 
 export default async function AgentsPage() {
-    const agents = await getAgents();
+    const { items: agents, nextCursor } = await getAgents();
 
     return (
         <div className="container mx-auto px-4 py-8 max-w-6xl">
@@ -22,7 +21,7 @@ export default async function AgentsPage() {
                     <h1 className="text-4xl font-extrabold tracking-tight mb-2">Agent Directory</h1>
                     <p className="text-muted-foreground text-lg flex items-center gap-2">
                         <Users className="w-5 h-5 text-[#9B6FFF]" />
-                        {agents?.length || 0} Autonomous Personas Active
+                        {agents?.length || 0}{nextCursor ? "+" : ""} Autonomous Personas Active
                     </p>
                 </div>
             </div>
@@ -33,7 +32,7 @@ export default async function AgentsPage() {
                     <p>No agents have been seeded into the database.</p>
                 </div>
             ) : (
-                <AgentGallery initialAgents={agents} />
+                <AgentGallery initialAgents={agents} initialCursor={nextCursor} />
             )}
 
             {/* Ambient Background Lights */}
@@ -1,4 +1,5 @@
 import { LiveChatRoom } from "@/components/chat/LiveChatRoom";
+import { fetchAgentsById, fetchPage } from "@/lib/api";
 
 async function getMatch(match_id: string) {
     const res = await fetch(`http://localhost:8000/matches/${match_id}`, { cache: 'no-store' });
@@ -6,35 +7,30 @@ async function getMatch(match_id: string) {
     return res.json();
 }
 
-async function getAgents() {
-    const res = await fetch("http://localhost:8000/agents", { cache: 'no-store' });
-    if (!res.ok) return [];
-    return res.json();
+async function getAgentMap(match: any) {
+    return fetchAgentsById([match.agent1_id, match.agent2_id]).catch(() => ({} as Record<string, any>));
 }
 
-async function getMessages(match_id: string) {
-    const res = await fetch(`http://localhost:8000/matches/${match_id}/messages`, { cache: 'no-store' });
-    if (!res.ok) return [];
-    return res.json();
+// The latest page of the chat; LiveChatRoom pages back through older messages as the reader scrolls up
+async function getLatestMessages(match_id: string) {
+    return fetchPage(`http://localhost:8000/matches/${match_id}/messages?newest_first=true`)
+        .then(({ items, nextCursor }) => ({ messages: items.reverse(), olderCursor: nextCursor }))
+        .catch(() => ({ messages: [], olderCursor: null }));
 }
 
 export default async function ChatViewerPage({ params }: { params: Promise<{ match_id: string }> }) {
     const resolvedParams = await params;
     const matchId = resolvedParams.match_id;
-    const [match, messages, agents] = await Promise.all([
+    const [match, { messages, olderCursor }] = await Promise.all([
         getMatch(matchId),
-        getMessages(matchId),
-        getAgents()
+        getLatestMessages(matchId)
     ]);
 
     if (!match) {
         return <div className="p-12 text-center">Match not found.</div>;
     }
 
-    const agentMap = agents.reduce((acc: Record<string, any>, agent: any) => {
-        acc[agent.id] = agent;
-        return acc;
-    }, {});
+    const agentMap = await getAgentMap(match);
 
     const agent1 = agentMap?.[match.agent1_id] || null;
     const agent2 = agentMap?.[match.agent2_id] || null;
@@ -48,6 +44,7 @@ export default async function ChatViewerPage({ params }: { params: Promise<{ mat
             matchId={matchId}
             initialMatch={match}
             initialMessages={messages}
+            initialOlderCursor={olderCursor}
             name1={name1}
             name2={name2}
             // persona1={persona1}
@@ -1,5 +1,6 @@
 import { MessageSquareHeart, Clock, Sparkles, Activity, Link } from "lucide-react";
 import { generateAvatar } from "@/lib/utils";
+import { fetchAgentsById } from "@/lib/api";
 
 async function getMatches() {
     try {
@@ -12,25 +13,19 @@ async function getMatches() {
     }
 }
 
-async function getAgents() {
+async function getAgentMap(matches: any[]) {
     try {
-        const res = await fetch("http://localhost:8000/agents", { cache: 'no-store' })
-            .catch(() => null);
-        if (!res || !res.ok) return [];
-        return res.json().catch(() => []);
+        return await fetchAgentsById(matches.flatMap((m: any) => [m.agent1_id, m.agent2_id]));
     } catch (e) {
-        return [];
+        return {};
     }
 }
 
 export default async function LiveFeedPage() {
-    const [matches, agents] = await Promise.all([getMatches(), getAgents()]);
+    const matches = await getMatches();
 
-    // Create lookup dictionary for agent names by ID
-    const agentMap = agents.reduce((acc: Record<string, any>, agent: any) => {
-        acc[agent.id] = agent;
-        return acc;
-    }, {});
+    // Lookup dictionary for agent names by ID, for just the agents in these matches
+    const agentMap = await getAgentMap(matches);
 
     return (
         <div className="container mx-auto px-4 py-12 max-w-4xl">
@@ -3,6 +3,7 @@ import Link from "next/link";
 import { Suspense } from "react";
 import { ActivityFeed } from "@/components/live/ActivityFeed";
 import { generateAvatar } from "@/lib/utils";
+import { fetchAgentsById } from "@/lib/api";
 
 // Fetch from local FastAPI container/host
 async function getPlatformMetrics() {
@@ -27,14 +28,11 @@ async function getMatches() {
   }
 }
 
-async function getAgents() {
+async function getAgentMap(matches: any[]) {
   try {
-    const res = await fetch("http://localhost:8000/agents", { cache: 'no-store' })
-      .catch(() => null);
-    if (!res || !res.ok) return [];
-    return res.json().catch(() => []);
+    return await fetchAgentsById(matches.flatMap((m: any) => [m.agent1_id, m.agent2_id]));
   } catch (e) {
-    return [];
+    return {};
   }
 }
 
@@ -109,7 +107,7 @@ async function MetricsGrid() {
 }
 
 async function RecentMatchesList() {
-  const [matches, agents] = await Promise.all([getMatches(), getAgents()]);
+  const matches = await getMatches();
 
   if (!matches || matches.length === 0) {
     return (
@@ -121,12 +119,8 @@ async function RecentMatchesList() {
     );
   }
 
-  const agentMap = agents.reduce((acc: any, agent: any) => {
-    acc[agent.id] = agent;
-    return acc;
-  }, {});
-
   // Show top 3 most recent
+  const agentMap = await getAgentMap(matches.slice(0, 3));
   return (
     <div className="space-y-4">
       {matches.slice(0, 3).map((match: any) => {
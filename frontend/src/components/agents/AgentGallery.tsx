@@ -1,12 +1,17 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Search, Filter, Sparkles, Heart, X, MessageSquare, Plus, Activity, Zap, Loader2 } from "lucide-react";
 import { motion, AnimatePresence } from "framer-motion";
 import { generateAvatar } from "@/lib/utils";
 import Link from "next/link";
+import { fetchPage } from "@/lib/api";
 
-export function AgentGallery({ initialAgents }: { initialAgents: any[] }) {
+export function AgentGallery({ initialAgents, initialCursor = null }: { initialAgents: any[], initialCursor?: string | null }) {
+    const [agents, setAgents] = useState<any[]>(initialAgents);
+    const [nextCursor, setNextCursor] = useState<string | null>(initialCursor);
+    const loadingMore = useRef(false);
+    const sentinelRef = useRef<HTMLDivElement>(null);
     const [searchTerm, setSearchTerm] = useState("");
     const [genderFilter, setGenderFilter] = useState("All");
     const [selectedAgent, setSelectedAgent] = useState<any | null>(null);
@@ -35,14 +40,40 @@ export function AgentGallery({ initialAgents }: { initialAgents: any[] }) {
         fetchStats();
     }, [selectedAgent]);
 
-    const filteredAgents = initialAgents.filter(agent => {
+    // Infinite scroll: fetch the next page of agents when the end of the grid comes into view
+    useEffect(() => {
+        const sentinel = sentinelRef.current;
+        if (!sentinel || !nextCursor) return;
+
+        const loadMore = async () => {
+            if (loadingMore.current) return;
+            loadingMore.current = true;
+            try {
+                const page = await fetchPage("http://localhost:8000/agents/", nextCursor);
+                setAgents(prev => [...prev, ...page.items.filter((a: any) => !prev.some(p => p.id === a.id))]);
+                setNextCursor(page.nextCursor);
+            } catch (e) {
+                console.error("Failed to fetch more agents:", e);
+            } finally {
+                loadingMore.current = false;
+            }
+        };
+
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) loadMore();
+        }, { rootMargin: "400px" });
+        observer.observe(sentinel);
+        return () => observer.disconnect();
+    }, [nextCursor]);
+
+    const filteredAgents = agents.filter(agent => {
         const matchesSearch = agent.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
             agent.persona.toLowerCase().includes(searchTerm.toLowerCase());
         const matchesGender = genderFilter === "All" || agent.gender === genderFilter;
         return matchesSearch && matchesGender;
     });
 
-    const uniqueGenders = ["All", ...Array.from(new Set(initialAgents.map(a => a.gender)))];
+    const uniqueGenders = ["All", ...Array.from(new Set(agents.map(a => a.gender)))];
 
     return (
         <div className="space-y-6">
@@ -90,7 +121,7 @@ export function AgentGallery({ initialAgents }: { initialAgents: any[] }) {
                                 initial={{ opacity: 0, scale: 0.95, y: 10 }}
                                 animate={{ opacity: 1, scale: 1, y: 0 }}
                                 exit={{ opacity: 0, scale: 0.95 }}
-                                transition={{ duration: 0.2, delay: i * 0.05 }}
+                                transition={{ duration: 0.2, delay: (i % 12) * 0.05 }}
                                 onClick={() => setSelectedAgent(agent)}
                                 className="bg-[#15151E] border border-border/50 rounded-2xl overflow-hidden hover:border-[#9B6FFF]/40 transition-all group flex flex-col relative shadow-lg cursor-pointer hover:shadow-[#9B6FFF]/10 hover:shadow-2xl hover:-translate-y-1"
                             >
@@ -137,6 +168,12 @@ export function AgentGallery({ initialAgents }: { initialAgents: any[] }) {
                 )}
             </div>
 
+            {nextCursor && (
+                <div ref={sentinelRef} className="flex justify-center py-6 text-muted-foreground">
+                    <Loader2 className="w-5 h-5 animate-spin" />
+                </div>
+            )}
+
             {/* Expanded Agent Modal */}
             <AnimatePresence>
                 {selectedAgent && (
@@ -6,10 +6,14 @@ import { ArrowLeft, Flame, Ghost, Clock, Activity, ZapOff } from "lucide-react";
 import { motion, AnimatePresence } from "framer-motion";
 import { useSocket } from "@/hooks/useSocket";
 import { generateAvatar } from "@/lib/utils";
+import { fetchPage } from "@/lib/api";
 
-export function LiveChatRoom({ matchId, initialMatch, initialMessages, name1, name2 }: { matchId: string, initialMatch: any, initialMessages: any[], name1: string, name2: string }) {
+export function LiveChatRoom({ matchId, initialMatch, initialMessages, initialOlderCursor = null, name1, name2 }: { matchId: string, initialMatch: any, initialMessages: any[], initialOlderCursor?: string | null, name1: string, name2: string }) {
     const [match, setMatch] = useState(initialMatch);
     const [messages, setMessages] = useState<any[]>(initialMessages);
+    const [olderCursor, setOlderCursor] = useState<string | null>(initialOlderCursor);
+    const loadingOlder = useRef(false);
+    const logRef = useRef<HTMLDivElement>(null);
     const scrollRef = useRef<HTMLDivElement>(null);
 
     // Subscribe to realtime backend websocket!
@@ -28,18 +32,55 @@ export function LiveChatRoom({ matchId, initialMatch, initialMessages, name1, na
     // Handle new incoming websocket message
     useEffect(() => {
         if (lastMessage && lastMessage.match_id === matchId) {
-            // Ensure no duplicates
             setMessages(prev => {
-                if (prev.some(m => m.id === lastMessage.id)) return prev;
-                return [...prev, lastMessage];
+                const idx = prev.findIndex(m => m.id === lastMessage.id);
+
+                // Streaming deltas carry the content so far; the final new_message replaces the bubble
+                if (lastMessage.aborted) return prev.filter(m => m.id !== lastMessage.id || !m.streaming);
+                if (lastMessage.streaming) {
+                    if (idx === -1) return [...prev, lastMessage];
+                    if (!prev[idx].streaming || prev[idx].seq >= lastMessage.seq) return prev;
+                    return prev.map((m, i) => i === idx ? lastMessage : m);
+                }
+
+                // Ensure no duplicates
+                if (idx === -1) return [...prev, lastMessage];
+                if (!prev[idx].streaming) return prev;
+                return prev.map((m, i) => i === idx ? lastMessage : m);
             });
         }
     }, [lastMessage, matchId]);
 
-    // Auto-scroll
+    // Auto-scroll when the newest message arrives or grows, not when older history is prepended
+    const newestMessage = messages[messages.length - 1];
     useEffect(() => {
         scrollRef.current?.scrollIntoView({ behavior: "smooth" });
-    }, [messages]);
+    }, [newestMessage]);
+
+    // The page opens on the latest messages; older ones are fetched a page at a time when scrolled near the top
+    const loadOlder = async () => {
+        if (!olderCursor || loadingOlder.current) return;
+        loadingOlder.current = true;
+        try {
+            const { items, nextCursor } = await fetchPage(`http://localhost:8000/matches/${matchId}/messages?newest_first=true`, olderCursor);
+            const el = logRef.current;
+            const prevHeight = el?.scrollHeight ?? 0;
+            setMessages(prev => [...items.reverse().filter((m: any) => !prev.some(p => p.id === m.id)), ...prev]);
+            setOlderCursor(nextCursor);
+            // Keep the messages the reader was looking at in place
+            requestAnimationFrame(() => {
+                if (el) el.scrollTop += el.scrollHeight - prevHeight;
+            });
+        } catch (e) {
+            console.error(e);
+        } finally {
+            loadingOlder.current = false;
+        }
+    };
+
+    const onScroll = (e: React.UIEvent<HTMLDivElement>) => {
+        if (e.currentTarget.scrollTop < 200) loadOlder();
+    };
 
     // Determine status
     let statusBadge = null;
@@ -79,10 +120,10 @@ export function LiveChatRoom({ matchId, initialMatch, initialMessages, name1, na
             {/* Chat Area */}
             <div className="flex-1 bg-[#15151E] rounded-3xl border border-border/50 overflow-hidden flex flex-col relative shadow-2xl">
                 {/* Chat log wrapper */}
-                <div className="flex-1 overflow-y-auto p-6 space-y-6 scrollbar-hide">
+                <div ref={logRef} onScroll={onScroll} className="flex-1 overflow-y-auto p-6 space-y-6 scrollbar-hide">
 
                     <div className="text-center py-4 text-[10px] text-muted-foreground uppercase tracking-widest font-bold">
-                        Chat Initiated
+                        {olderCursor ? 'Scroll up for earlier messages' : 'Chat Initiated'}
                     </div>
 
                     {!messages || messages.length === 0 ? (
@@ -23,8 +23,14 @@ type ActivityItem = {
     content?: string;
 };
 
+// The feed keeps at most this many items. Live items push the oldest ones out, and paging stops once
+// the window is full, so a long session doesn't grow the list (and the DOM) without limit.
+const MAX_FEED_ITEMS = 200;
+
 export function ActivityFeed() {
     const [activities, setActivities] = useState<ActivityItem[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const loadingMore = useRef(false);
 
     const { lastMessage, isConnected } = useSocket<ActivityItem>("feed");
 
@@ -36,6 +42,7 @@ export function ActivityFeed() {
                 if (res.ok) {
                     const data = await res.json();
                     setActivities(data);
+                    setNextCursor(res.headers.get("X-Next-Cursor"));
                 }
             } catch (e) {
                 console.error(e);
@@ -50,12 +57,35 @@ export function ActivityFeed() {
             setActivities(prev => {
                 // To avoid duplicate keys when dev server double-fires, check against ID
                 if (prev.some(a => a.id === lastMessage.id)) return prev;
-                // Add to top of the feed, cap at 50
-                return [lastMessage, ...prev].slice(0, 50);
+                // Add to top of the feed, dropping the oldest items past the window
+                return [lastMessage, ...prev].slice(0, MAX_FEED_ITEMS);
             });
         }
     }, [lastMessage]);
 
+    // Infinite scroll: fetch the next (older) page when the list is scrolled near the bottom
+    const loadMore = async () => {
+        if (!nextCursor || loadingMore.current || activities.length >= MAX_FEED_ITEMS) return;
+        loadingMore.current = true;
+        try {
+            const res = await fetch(`http://localhost:8000/activity?cursor=${encodeURIComponent(nextCursor)}`);
+            if (res.ok) {
+                const data: ActivityItem[] = await res.json();
+                setActivities(prev => [...prev, ...data.filter(a => !prev.some(p => p.id === a.id))].slice(0, MAX_FEED_ITEMS));
+                setNextCursor(res.headers.get("X-Next-Cursor"));
+            }
+        } catch (e) {
+            console.error(e);
+        } finally {
+            loadingMore.current = false;
+        }
+    };
+
+    const onScroll = (e: React.UIEvent<HTMLDivElement>) => {
+        const el = e.currentTarget;
+        if (el.scrollHeight - el.scrollTop - el.clientHeight < 200) loadMore();
+    };
+
     return (
         <div className="w-full h-full flex flex-col bg-card/60 backdrop-blur-md rounded-2xl border border-border/50 overflow-hidden shadow-2xl">
             <div className="p-4 border-b border-border/50 bg-secondary/20 flex items-center gap-2">
@@ -69,7 +99,7 @@ export function ActivityFeed() {
                 <Sparkles className="w-4 h-4 text-primary/50" />
             </div>
 
-            <div className="flex-1 overflow-y-auto p-4 space-y-3 max-h-[600px] scrollbar-hide">
+            <div onScroll={onScroll} className="flex-1 overflow-y-auto p-4 space-y-3 max-h-[600px] scrollbar-hide">
                 <AnimatePresence>
                     {activities.map((item) => (
                         <motion.div
@@ -0,0 +1,27 @@
+// The list endpoints (/agents, /matches/{id}/messages, ...) are keyset-paginated: each page carries
+// the cursor for the next one in the X-Next-Cursor header, which is absent on the last page.
+// Views load one page and fetch the next one on scroll, so a page bounds what a single load transfers.
+export type Page<T> = { items: T[]; nextCursor: string | null };
+
+export function withCursor(url: string, cursor: string | null): string {
+    return cursor ? `${url}${url.includes("?") ? "&" : "?"}cursor=${encodeURIComponent(cursor)}` : url;
+}
+
+export async function fetchPage<T = any>(url: string, cursor: string | null = null, init: RequestInit = { cache: 'no-store' }): Promise<Page<T>> {
+    const pageUrl = withCursor(url, cursor);
+    const res = await fetch(pageUrl, init);
+    if (!res.ok) throw new Error(`GET ${pageUrl} failed with ${res.status}`);
+    return { items: await res.json(), nextCursor: res.headers.get("X-Next-Cursor") };
+}
+
+// Just the agents a view refers to (e.g. both sides of the matches it lists), keyed by id
+export async function fetchAgentsById(ids: string[]): Promise<Record<string, any>> {
+    const unique = Array.from(new Set(ids.filter(Boolean)));
+    if (unique.length === 0) return {};
+    const query = unique.map(id => `ids=${encodeURIComponent(id)}`).join("&");
+    const { items } = await fetchPage(`http://localhost:8000/agents/?${query}&limit=${unique.length}`);
+    return items.reduce((acc: Record<string, any>, agent: any) => {
+        acc[agent.id] = agent;
+        return acc;
+    }, {});
+}